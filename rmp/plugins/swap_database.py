@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Switch to a newly published risk-management-plans.db without a restart.
+
+script/rmp_publish.py renames the new database over the served file. The connections
+Datasette already has keep reading the old file (its inode lives on until they are
+closed), so on the next requests this plugin notices that the file changed, checks that
+the new one opens, and replaces the database with one reading the new file. Requests
+already running finish on the old connections, which are closed a minute later.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from datasette import hookimpl
+from datasette.database import Database, connections
+
+check_interval = 1.0  # Seconds between two checks of the database files
+close_after = 60.0  # Seconds before the connections to a replaced file are closed
+
+logger = logging.getLogger(__name__)
+
+# Per Datasette instance: {"versions": {database name: file version}, "checked": time of the last check}
+states = {}
+
+
+# Function to identify the file at a path: a rename puts a different inode there
+def file_version(path):
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class PublishedDatabase(Database):
+    """A database whose read connections are kept per published file, not per database name."""
+
+    def __init__(self, ds, path, version, is_mutable=True):
+        super().__init__(ds, path=path, is_mutable=is_mutable)
+        self.version = version
+
+    async def execute_fn(self, fn):
+        if self.ds.executor is None:
+            return await super().execute_fn(fn)
+
+        # Datasette keeps one connection per thread under the database name, which now
+        # reads the old file: use a key of this version instead
+        key = f"{self.name}:{self.version}"
+
+        def in_thread():
+            conn = getattr(connections, key, None)
+            if not conn:
+                conn = self.connect()
+                self.ds._prepare_connection(conn, self.name)
+                setattr(connections, key, conn)
+            return fn(conn)
+
+        return await asyncio.get_event_loop().run_in_executor(self.ds.executor, in_thread)
+
+
+# Function to check that a published file opens and has a schema, before serving it
+def can_open(path):
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            conn.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning("Not switching to %s: %s", path, e)
+        return False
+    return True
+
+
+# Function to replace the databases whose file was republished; returns their names
+async def swap_changed_databases(datasette):
+    versions = states[id(datasette)]["versions"]
+    swapped = []
+    for name, db in list(datasette.databases.items()):
+        if name not in versions:
+            continue
+        try:
+            version = file_version(db.path)
+        except OSError:
+            continue  # Between an unlink and a rename: check again on a later request
+        if version == versions[name] or not can_open(db.path):
+            continue
+        new_db = PublishedDatabase(datasette, db.path, version, is_mutable=db.is_mutable)
+        new_db.name = db.name
+        new_db.route = db.route
+        # Replaced in place to keep the order of the databases; don't mutate, as add_database
+        new_databases = datasette.databases.copy()
+        new_databases[name] = new_db
+        datasette.databases = new_databases
+        versions[name] = version
+        # The tables and columns catalog is refreshed when the schema version changed; the new
+        # file may well have the same one, so forget it
+        await datasette.databases["_internal"].execute_write("DELETE FROM databases WHERE database_name = ?", [name])
+        asyncio.get_event_loop().call_later(close_after, db.close)
+        logger.info("Switched %s to the file published at %s", name, db.path)
+        swapped.append(name)
+    return swapped
+
+
+@hookimpl
+def startup(datasette):
+    states[id(datasette)] = {
+        "versions": {name: file_version(db.path) for name, db in datasette.databases.items()
+                     if db.path and not db.is_memory and name != "_internal"},
+        "checked": time.monotonic()
+    }
+
+
+@hookimpl
+def asgi_wrapper(datasette):
+    def wrap_with_swap(app):
+        async def swap_then_serve(scope, receive, send):
+            state = states.get(id(datasette))
+            if state is not None and scope["type"] == "http" and time.monotonic() - state["checked"] >= check_interval:
+                state["checked"] = time.monotonic()
+                await swap_changed_databases(datasette)
+            await app(scope, receive, send)
+
+        return swap_then_serve
+
+    return wrap_with_swap
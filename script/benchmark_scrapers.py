@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the scraper scripts on synthetic corpora.
+
+For every corpus size (default 100, 1,000 and 20,000 reports) a corpus is generated
+with generate_synthetic_rmp_pdfs.py (and reused on later runs), then each scraper is
+run on it in a fresh working directory, so the text cache starts cold. The scrapers
+are configured through module-level paths, so each run uses a copy of the script
+with those paths pointed at the corpus. Reported per run: wall time, docs/sec,
+MB/sec and peak memory. On Linux that is the peak of the scraper's resident memory
+plus that of its worker processes (--workers, --doc-timeout), sampled from /proc
+every memory_sample_seconds, or the scraper's max RSS if higher. Elsewhere only the
+scraper process's max RSS can be read, so runs with worker processes, and every run
+on Windows, leave it empty. Results are printed as a table and saved as JSON.
+
+scrap_single_pdf_to_csv.py handles one PDF per process, so it is run on the first
+--single-limit reports of each corpus only. "batch" runs the same reports through
+one scrap_single_pdf_to_csv.py --serve process.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import generate_synthetic_rmp_pdfs
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+memory_sample_seconds = 0.05
+# Scraper options that start worker processes, whose memory only /proc lets us add up
+worker_options = ("--workers", "--doc-timeout", "--doc-memory-mb")
+
+# Scraper name -> (script, function giving the module paths to override for a corpus and working directory)
+SCRAPERS = {
+    "main": ("scrap_pdf_rmp_reports_to_csv.py", lambda corpus, work: {"input_dir": corpus}),
+    "details": ("scrap_accidents_details_to_csv.py", lambda corpus, work: {
+        "pdf_dir": corpus,
+        "rmp_accident_history_csv": os.path.join(corpus, "rmp_accident_history.csv"),
+        "output_csv": os.path.join(work, "rmp_accident_history_detailed.csv"),
+        "error_log": os.path.join(work, "error_log.txt")
+    }),
+    "single": ("scrap_single_pdf_to_csv.py", lambda pdf_file, work: {
+        "pdf_file": pdf_file,
+        "output_csv": os.path.join(work, os.path.basename(pdf_file).replace(".pdf", ".csv"))
+    }),
+    # The same script in batch mode (--serve), fed every path on stdin by one process
+    "batch": ("scrap_single_pdf_to_csv.py", lambda corpus, work: {})
+}
+
+
+# Function to write a copy of a scraper script with some module-level assignments replaced
+def patched_script(script, overrides, path):
+    with open(os.path.join(script_dir, script), encoding="utf-8") as f:
+        source = f.read()
+    for name, value in overrides.items():
+        source, count = re.subn(rf"^{name} = .*$", lambda m: f"{name} = {value!r}", source, count=1, flags=re.MULTILINE)
+        if count != 1:
+            raise ValueError(f"{script} has no module-level '{name} = ...' to override")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+    return path
+
+# Function to add up the resident memory in MB of a process and all its descendants, from /proc (Linux only)
+def tree_rss_mb(pid):
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as f:
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])  # The command name in (...) may contain spaces
+        except (OSError, ValueError, IndexError):
+            continue  # Exited meanwhile
+        children.setdefault(parent, []).append(int(entry))
+    total_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status", encoding="utf-8") as f:
+                total_kb += next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+        except OSError:
+            continue
+    return total_kb / 1024
+
+# Function to sample the memory of a process tree until stop is set, keeping the peak in peak["mb"]
+def sample_tree_memory(pid, stop, peak):
+    while True:
+        peak["mb"] = max(peak["mb"], tree_rss_mb(pid))
+        if stop.wait(memory_sample_seconds):
+            return
+
+# Function to run a script to completion; returns (seconds, peak memory in MB or None)
+def run_script(path, args, work_dir, log, stdin=None):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [script_dir, os.environ.get("PYTHONPATH")])))
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, path, *args], cwd=work_dir, env=env, stdin=stdin, stdout=log, stderr=subprocess.STDOUT)
+    # ru_maxrss below only covers the scraper process itself, not the workers it starts
+    sampler = None
+    if os.path.isdir("/proc"):
+        stop, tree_peak = threading.Event(), {"mb": 0.0}
+        sampler = threading.Thread(target=sample_tree_memory, args=(proc.pid, stop, tree_peak), daemon=True)
+        sampler.start()
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        peak_mb = usage.ru_maxrss / 1024  # KiB on Linux
+        if sys.platform == "darwin":
+            peak_mb /= 1024  # bytes on macOS
+    else:
+        proc.wait()
+        peak_mb = None
+    seconds = time.perf_counter() - start
+    if sampler is not None:
+        stop.set()
+        sampler.join()
+        peak_mb = max(peak_mb or 0.0, tree_peak["mb"])
+    elif any(arg.split("=")[0] in worker_options for arg in args):
+        peak_mb = None  # The workers' memory can't be read here, and the scraper's alone would understate it
+    if proc.returncode != 0:
+        raise RuntimeError(f"{os.path.basename(path)} exited with {proc.returncode}, see {log.name}")
+    return seconds, peak_mb
+
+# Function to generate the corpus for a size unless it already exists
+def ensure_corpus(corpus_root, size, seed, workers):
+    corpus = os.path.abspath(os.path.join(corpus_root, f"n{size}"))
+    pdf_files = glob.glob(os.path.join(corpus, "**", "*.pdf"), recursive=True)
+    if len(pdf_files) != size:
+        print(f"Generating {size} synthetic reports in {corpus}")
+        options = generate_synthetic_rmp_pdfs.parse_args([corpus, "--count", str(size), "--seed", str(seed), "--workers", str(workers)])
+        generate_synthetic_rmp_pdfs.generate_corpus(options)
+        pdf_files = glob.glob(os.path.join(corpus, "**", "*.pdf"), recursive=True)
+    return corpus, sorted(pdf_files)
+
+# Function to benchmark one scraper on one corpus
+def benchmark(name, corpus, pdf_files, work_dir, main_args, single_limit):
+    script, overrides = SCRAPERS[name]
+    os.makedirs(work_dir, exist_ok=True)
+    with open(os.path.join(work_dir, "benchmark_output.txt"), "w", encoding="utf-8") as log:
+        if name == "single":
+            pdf_files = pdf_files[:single_limit]
+            seconds, peak_mb = 0.0, None
+            for pdf_file in pdf_files:
+                path = patched_script(script, overrides(pdf_file, work_dir), os.path.join(work_dir, script))
+                run_seconds, run_peak_mb = run_script(path, [], work_dir, log)
+                seconds += run_seconds
+                peak_mb = run_peak_mb if peak_mb is None else max(peak_mb, run_peak_mb or 0)
+        elif name == "batch":
+            pdf_files = pdf_files[:single_limit]
+            requests = os.path.join(work_dir, "batch_requests.txt")
+            with open(requests, "w", encoding="utf-8") as f:
+                f.write("".join(f"{pdf_file}\n" for pdf_file in pdf_files))
+            path = patched_script(script, overrides(corpus, work_dir), os.path.join(work_dir, script))
+            with open(requests, encoding="utf-8") as stdin:
+                seconds, peak_mb = run_script(path, ["--serve"], work_dir, log, stdin=stdin)
+        else:
+            path = patched_script(script, overrides(corpus, work_dir), os.path.join(work_dir, script))
+            seconds, peak_mb = run_script(path, main_args if name == "main" else [], work_dir, log)
+    megabytes = sum(os.path.getsize(f) for f in pdf_files) / 1e6
+    return {
+        "scraper": name,
+        "docs": len(pdf_files),
+        "megabytes": round(megabytes, 3),
+        "seconds": round(seconds, 3),
+        "docs_per_sec": round(len(pdf_files) / seconds, 2),
+        "mb_per_sec": round(megabytes / seconds, 3),
+        "peak_memory_mb": round(peak_mb, 1) if peak_mb is not None else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RMP scrapers on synthetic corpora.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 20000], help="Corpus sizes (default: 100 1000 20000)")
+    parser.add_argument("--scrapers", nargs="+", choices=list(SCRAPERS), default=list(SCRAPERS), help="Scrapers to run (default: all)")
+    parser.add_argument("--corpus-dir", default="benchmark_corpus", help="Where the generated corpora are kept (default: benchmark_corpus)")
+    parser.add_argument("--work-dir", default="benchmark_runs", help="Where each run writes its outputs (default: benchmark_runs)")
+    parser.add_argument("--seed", type=int, default=1, help="Corpus random seed (default: 1)")
+    parser.add_argument("--gen-workers", type=int, default=os.cpu_count() or 1, help="Processes generating the corpora (default: all CPUs)")
+    parser.add_argument("--main-args", default="--no-progress",
+                        help="Extra arguments for scrap_pdf_rmp_reports_to_csv.py, e.g. \"--workers 4\" (default: --no-progress)")
+    parser.add_argument("--single-limit", type=int, default=100, help="Reports run through scrap_single_pdf_to_csv.py (single and batch) per size (default: 100)")
+    parser.add_argument("--output", default="benchmark_report.json", help="JSON file for the results (default: benchmark_report.json)")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        corpus, pdf_files = ensure_corpus(args.corpus_dir, size, args.seed, args.gen_workers)
+        for name in args.scrapers:
+            work_dir = os.path.abspath(os.path.join(args.work_dir, f"{name}-n{size}"))
+            result = benchmark(name, corpus, pdf_files, work_dir, args.main_args.split(), args.single_limit)
+            result["corpus_size"] = size
+            results.append(result)
+            print(f"{name:>8} n={size:<6} {result['docs']:>6} docs {result['seconds']:>9.2f} s {result['docs_per_sec']:>9.2f} docs/s "
+                  f"{result['mb_per_sec']:>8.3f} MB/s  peak {result['peak_memory_mb'] if result['peak_memory_mb'] is not None else '?'} MB")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"created": time.strftime("%Y-%m-%d %H:%M:%S"), "python": sys.version.split()[0],
+                   "main_args": args.main_args, "results": results}, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Learn where the running header and footer sit on an RMP report page.
+
+Every page of a report repeats the facility header ("Facility Name:", "EPA Facility
+Identifier:", "Plan Sequence Number:") at the top and the "Data displayed is accurate
+as of ..." / "Page N of M" footer at the bottom. This script samples reports, finds
+those lines by position, and writes the heights of the two bands to a JSON file.
+pdf_text_cache then clips the bands away when it extracts a page, so the header and
+footer never become text and filter_header_footer is no longer needed.
+
+A line only counts as header or footer if a matching line sits at the same height on
+at least --min-share of the sampled pages, so a "Facility Name:" inside Section 1 is
+not mistaken for the header. Each band edge is placed halfway between the lowest
+header (highest footer) line and the nearest body line; if the two overlap anywhere in
+the sample the script refuses to write a calibration.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import time
+from collections import Counter
+import fitz  # PyMuPDF
+
+input_dir = r"C:\MS Data Science - WMU\EDGI\epa-risk-management-plans\reports"
+output_file = "page_bands.json"
+
+# Same lines filter_header_footer in scrap_pdf_rmp_reports_to_csv.py drops
+header_pattern = re.compile(r"Facility Name:|EPA Facility Identifier:|Plan Sequence Number:")
+footer_pattern = re.compile(r"Data displayed is accurate as of|Page \d+ of \d+")
+
+# Function to list the text lines of a page as (y0, y1, text), measured from the top of the page
+def page_lines(page):
+    top = page.rect.y0
+    lines = []
+    for block in page.get_text("dict")["blocks"]:
+        for line in block.get("lines", []):
+            text = "".join(span["text"] for span in line["spans"]).strip()
+            if text:
+                lines.append((line["bbox"][1] - top, line["bbox"][3] - top, text))
+    return lines
+
+# Function to measure the header and footer bands over a sample of reports
+def calibrate(pdf_files, min_share=0.5):
+    pages = []
+    header_rows = Counter()  # Rounded y0 of header-looking lines -> number of pages
+    footer_rows = Counter()
+    for pdf_file in pdf_files:
+        with fitz.open(pdf_file) as doc:
+            for page in doc:
+                lines = page_lines(page)
+                height = page.rect.height
+                pages.append((height, lines))
+                header_rows.update({round(y0) for y0, y1, text in lines if header_pattern.search(text)})
+                footer_rows.update({round(height - y0) for y0, y1, text in lines if footer_pattern.search(text)})
+    if not pages:
+        raise ValueError("No pages to calibrate on")
+
+    # Only positions repeated on most pages are the running header/footer
+    header_ys = {y for y, count in header_rows.items() if count >= min_share * len(pages)}
+    footer_ys = {y for y, count in footer_rows.items() if count >= min_share * len(pages)}
+    if not header_ys or not footer_ys:
+        raise ValueError(f"No header/footer line repeats on {min_share:.0%} of the {len(pages)} sampled pages")
+
+    header_bottom = footer_top = 0.0  # Deepest extent of the bands, from the top and from the bottom
+    body_top = body_bottom = float("inf")  # Nearest body line to the top and to the bottom
+    for height, lines in pages:
+        header = [(y0, y1) for y0, y1, text in lines if round(y0) in header_ys and header_pattern.search(text)]
+        footer = [(y0, y1) for y0, y1, text in lines if round(height - y0) in footer_ys and footer_pattern.search(text)]
+        for y0, y1, text in lines:
+            # Lines sharing a row with a header/footer label (e.g. its value) belong to the band
+            if any(y0 < h1 and y1 > h0 for h0, h1 in header):
+                header_bottom = max(header_bottom, y1)
+            elif any(y0 < f1 and y1 > f0 for f0, f1 in footer):
+                footer_top = max(footer_top, height - y0)
+            else:
+                body_top = min(body_top, y0)
+                body_bottom = min(body_bottom, height - y1)
+    if header_bottom >= body_top or footer_top >= body_bottom:
+        raise ValueError(f"Header/footer bands overlap the body text (header ends {header_bottom:.2f}pt, body starts {body_top:.2f}pt; "
+                         f"footer starts {footer_top:.2f}pt, body ends {body_bottom:.2f}pt from the bottom)")
+
+    return {
+        "header_height": round((header_bottom + body_top) / 2, 2),
+        "footer_height": round((footer_top + body_bottom) / 2, 2),
+        "header_bottom": round(header_bottom, 2),
+        "body_top": round(body_top, 2),
+        "footer_top": round(footer_top, 2),
+        "body_bottom": round(body_bottom, 2),
+        "sampled_pdfs": len(pdf_files),
+        "sampled_pages": len(pages),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Learn the header/footer bands of the RMP reports for clipped text extraction.")
+    parser.add_argument("--input-dir", default=input_dir, help="Directory holding the RMP PDF reports")
+    parser.add_argument("--output", default=output_file, help=f"JSON file to write the bands to (default: {output_file})")
+    parser.add_argument("--sample", type=int, default=200, help="Number of reports to sample (default: 200)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the sample (default: 0)")
+    parser.add_argument("--min-share", type=float, default=0.5,
+                        help="Share of pages a header/footer position must repeat on (default: 0.5)")
+    args = parser.parse_args()
+
+    pdf_files = sorted(glob.glob(os.path.join(args.input_dir, "**", "*.pdf"), recursive=True))
+    sample = random.Random(args.seed).sample(pdf_files, min(args.sample, len(pdf_files)))
+    bands = calibrate(sample, args.min_share)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(bands, f, indent=2)
+    print(f"Header band: {bands['header_height']}pt, footer band: {bands['footer_height']}pt "
+          f"({bands['sampled_pages']} pages from {bands['sampled_pdfs']} PDFs), saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
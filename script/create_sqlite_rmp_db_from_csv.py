@@ -6,8 +6,16 @@ Created on Fri May  9 12:13:35 2025
 """
 import sqlite3
 import pandas as pd
+import csv
 import os
+import time
 from datetime import datetime
+from itertools import islice
+import rmp_indexes
+import rmp_publish
+import rmp_schema
+import rmp_views
+import scraper_sinks
 
 # Define the database file and CSV file paths
 db_file = r"C:\MS Data Science - WMU\EDGI\datasette-spatialite\risk-management-plans.db"
@@ -21,6 +29,38 @@ csv_files = {
     "rmp_facility_accidents": os.path.join(csv_dir, "rmp_facility_accidents.csv"),
     "rmp_accident_chemicals": os.path.join(csv_dir, "rmp_accident_chemicals.csv")
 }
+# False when the scraper already wrote its six tables (scrap_pdf_rmp_reports_to_csv.py --sqlite); then only
+# rmp_facility is imported from CSV, into the scraper's copy of db_file when there is one (rmp_publish.scraped_path)
+import_scraped_csvs = True
+# Directory of <table>.parquet files (scrap_pdf_rmp_reports_to_csv.py --parquet, export_rmp_parquet.py);
+# a table with a Parquet file there is loaded from it instead of its CSV. None to always use the CSVs
+parquet_dir = None
+# Bulk load: read the files in chunks and insert them with executemany, one transaction per table,
+# with relaxed durability while the database is built. False for the original pandas import
+bulk_load = True
+bulk_chunk_rows = 50000  # Rows read and inserted at a time in bulk load
+# Build in a staging copy of db_file and swap it in when it's done (rmp_publish.py), so Datasette never
+# sees missing tables or half-built views. False to build db_file in place
+atomic_publish = True
+
+# Column names of rmp_facility.csv, which uses the EPA headers, in the database schema
+facility_csv_columns = {
+    "EPA Facility ID": "epa_facility_id",
+    "Report": "report",
+    "Facility Name": "facility_name",
+    "Facility Address": "facility_address",
+    "City": "city",
+    "State": "state",
+    "County": "county",
+    "Zip": "zip",
+    "Facility DUNS": "facility_duns",
+    "Latitude": "latitude",
+    "Longitude": "longitude",
+    "Report Received Date": "receipt_date",
+    "Report Created Date": "report_created_date"
+}
+# Strings pandas.read_csv reads as missing values; bulk load reads them as NULL too, as do the Parquet loads
+csv_na_values = scraper_sinks.MISSING_VALUES
 
 # Function to convert date to Month Year format
 def convert_to_mm_yyyy(date_str):
@@ -40,98 +80,35 @@ def convert_to_mm_yyyy(date_str):
             print(f"Warning: Could not convert date '{date_str}' to Month Year format, returning None.")
             return None
 
-# Create a connection to the SQLite database
-conn = sqlite3.connect(db_file)
+# Create a connection to the SQLite database. The staging copy keeps the tables built by the other
+# scripts, as building in place did, and starts from the scraper's copy when it wrote the six tables
+source_file = db_file if import_scraped_csvs else rmp_publish.build_source(db_file)
+if atomic_publish:
+    build_file = rmp_publish.start_staging(db_file, copy_from=source_file)
+else:
+    if source_file != db_file:
+        os.replace(source_file, db_file)
+    build_file = db_file
+conn = sqlite3.connect(build_file)
 cursor = conn.cursor()
+build_start = time.time()
 
-# Enable foreign key constraints
-cursor.execute("PRAGMA foreign_keys = ON;")
-
-# Create indexes to improve subquery performance
-try:
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rmp_facility_naics_facility_id ON rmp_facility_naics(facility_id);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rmp_facility_chemicals_facility_id ON rmp_facility_chemicals(facility_id);")
-    print("Created indexes on facility_id for performance.")
-except sqlite3.Error as e:
-    print(f"Error creating indexes: {e}")
-
-# Create tables
-cursor.executescript("""
-    DROP TABLE IF EXISTS rmp_facility;
-    CREATE TABLE rmp_facility (
-        epa_facility_id TEXT PRIMARY KEY,
-        report TEXT,
-        facility_name TEXT,
-        facility_address TEXT,
-        city TEXT,
-        state TEXT,
-        county TEXT,
-        zip TEXT,
-        facility_duns TEXT,
-        latitude REAL,
-        longitude REAL,
-        receipt_date TEXT,
-        report_created_date TEXT
-    );
-
-    DROP TABLE IF EXISTS rmp_chemical;
-    CREATE TABLE rmp_chemical (
-        chemical_id INTEGER PRIMARY KEY,
-        chemical_name TEXT,
-        cas_number TEXT,
-        flammable_toxic TEXT
-    );
-
-    DROP TABLE IF EXISTS rmp_facility_chemicals;
-    CREATE TABLE rmp_facility_chemicals (
-        facility_chemical_id INTEGER PRIMARY KEY,
-        facility_id TEXT,
-        chemical_id INTEGER,
-        program_level TEXT,
-        FOREIGN KEY (facility_id) REFERENCES rmp_facility(epa_facility_id),
-        FOREIGN KEY (chemical_id) REFERENCES rmp_chemical(chemical_id)
-    );
-
-    DROP TABLE IF EXISTS rmp_naics;
-    CREATE TABLE rmp_naics (
-        naics_code TEXT PRIMARY KEY,
-        naics_description TEXT
-    );
+if bulk_load:
+    # A failed build is simply run again, so nothing has to survive a crash halfway through.
+    # The journal is kept in memory (not off), so a failed insert still rolls back cleanly.
+    cursor.execute("PRAGMA journal_mode = MEMORY;")
+    cursor.execute("PRAGMA synchronous = OFF;")
+    cursor.execute("PRAGMA cache_size = -65536;")  # 64 MB
 
-    DROP TABLE IF EXISTS rmp_facility_naics;
-    CREATE TABLE rmp_facility_naics (
-        facility_naics_id INTEGER PRIMARY KEY,
-        facility_id TEXT,
-        naics_code TEXT,
-        FOREIGN KEY (facility_id) REFERENCES rmp_facility(epa_facility_id),
-        FOREIGN KEY (naics_code) REFERENCES rmp_naics(naics_code)
-    );
+# Create tables. The six scraped tables are only recreated when they are imported from CSV;
+# scrap_pdf_rmp_reports_to_csv.py --sqlite writes them into its copy of the database itself.
+tables = [table for table in csv_files if import_scraped_csvs or table == "rmp_facility"]
+rmp_schema.recreate_tables(conn, tables)
 
-    DROP TABLE IF EXISTS rmp_facility_accidents;
-    CREATE TABLE rmp_facility_accidents (
-        facility_accident_id TEXT PRIMARY KEY,
-        accident_id TEXT,
-        facility_id TEXT,
-        date_of_accident TEXT,
-        time_accident_began TEXT,
-        release_duration TEXT,
-        naics_code TEXT,
-        FOREIGN KEY (facility_id) REFERENCES rmp_facility(epa_facility_id),
-        FOREIGN KEY (naics_code) REFERENCES rmp_naics(naics_code)
-    );
-
-    DROP TABLE IF EXISTS rmp_accident_chemicals;
-    CREATE TABLE rmp_accident_chemicals (
-        accident_chemical_id INTEGER PRIMARY KEY,
-        facility_accident_chemical_id TEXT,
-        facility_accident_id TEXT,
-        quantity_released_lbs TEXT,
-        percent_weight TEXT,
-        chemical_id INTEGER,
-        FOREIGN KEY (facility_accident_id) REFERENCES rmp_facility_accidents(facility_accident_id),
-        FOREIGN KEY (chemical_id) REFERENCES rmp_chemical(chemical_id)
-    );
-""")
+# Enable foreign key constraints. Only now: dropping rmp_facility while the scraped
+# tables still reference it would fail with them on. Bulk load checks them once after loading instead.
+if not bulk_load:
+    cursor.execute("PRAGMA foreign_keys = ON;")
 
 # Function to import CSV data into a table with type enforcement and column renaming
 def import_csv_to_table(csv_file, table_name):
@@ -173,21 +150,7 @@ def import_csv_to_table(csv_file, table_name):
             df["Report Received Date"] = df["Report Received Date"].apply(convert_to_mm_yyyy)
             
             # Rename columns to match the database schema
-            df = df.rename(columns={
-                "EPA Facility ID": "epa_facility_id",
-                "Report": "report",
-                "Facility Name": "facility_name",
-                "Facility Address": "facility_address",
-                "City": "city",
-                "State": "state",
-                "County": "county",
-                "Zip": "zip",
-                "Facility DUNS": "facility_duns",
-                "Latitude": "latitude",
-                "Longitude": "longitude",
-                "Report Received Date": "receipt_date",
-                "Report Created Date": "report_created_date"
-            })
+            df = df.rename(columns=facility_csv_columns)
 
         # Import the data into the table
         df.to_sql(table_name, conn, if_exists='append', index=False)
@@ -195,228 +158,116 @@ def import_csv_to_table(csv_file, table_name):
     else:
         print(f"Warning: {csv_file} not found, skipping import for {table_name}")
 
-# Import data from CSV files
-for table_name, csv_file in csv_files.items():
-    import_csv_to_table(csv_file, table_name)
-
-print(f"Database {db_file} created and populated successfully.")
+# Function to import a Parquet file into a table. Its columns already have the table's names and
+# types, so unlike the CSVs nothing is parsed, forced to a dtype or renamed.
+def import_parquet_to_table(parquet_file, table_name):
+    df = pd.read_parquet(parquet_file)
+    df = df.mask(df.isin(csv_na_values))  # "N/A" in files written before the sinks stored it as missing
+    df.to_sql(table_name, conn, if_exists='append', index=False)
+    print(f"Imported data into {table_name} from {parquet_file}")
 
-# Creating facility_view table.
-cursor.execute("DROP TABLE IF EXISTS facility_view;")
+# Function to yield the rows of a CSV file in chunks of bulk_chunk_rows, as tuples in the table's column order.
+# The values come out as the pandas import would have them: missing values are NULL, IDs are stripped, and
+# rmp_facility gets its renames and Month Year receipt date. Numbers keep their text, so a quantity of 4034
+# is not turned into 4034.0, and a zip or DUNS number keeps its leading zeros (01033, where pandas gave 1033).
+def read_csv_chunks(csv_file, table_name, columns):
+    with open(csv_file, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        if table_name == "rmp_facility":
+            header = [facility_csv_columns.get(name, name) for name in header]
+        positions = [header.index(column) if column in header else None for column in columns]
+        strip = [i for i, column in enumerate(columns) if column in ("epa_facility_id", "facility_id")]
+        floats = [i for i, column in enumerate(columns) if column in ("latitude", "longitude")]
+        dates = [i for i, column in enumerate(columns) if column == "receipt_date"]
+        converted_dates = {}  # Most facilities share a receipt date with others
 
-cursor.execute("""
-CREATE TABLE facility_view (
-    epa_facility_id TEXT PRIMARY KEY,
-    report TEXT,
-    facility_name TEXT,
-    facility_address TEXT,
-    city TEXT,
-    state TEXT,
-    county TEXT,
-    zip TEXT,
-    facility_duns TEXT,
-    receipt_date TEXT,
-    report_created_date TEXT,
-    naics_codes TEXT,
-    chemical_names TEXT,
-    latitude REAL,
-    longitude REAL
-);
-""")
+        def values(row):
+            values = [None if i is None or i >= len(row) or row[i] in csv_na_values else row[i] for i in positions]
+            for i in strip:
+                if values[i] is not None:
+                    values[i] = values[i].strip()
+            for i in floats:
+                if values[i] is not None:
+                    values[i] = float(values[i])
+            for i in dates:
+                if values[i] not in converted_dates:
+                    converted_dates[values[i]] = convert_to_mm_yyyy(values[i])
+                values[i] = converted_dates[values[i]]
+            return values
 
-# 2. Insert data into the table
-cursor.execute("""
-INSERT INTO facility_view
-SELECT 
-    rmp_facility.epa_facility_id,
-    rmp_facility.report,
-    rmp_facility.facility_name,
-    rmp_facility.facility_address,
-    rmp_facility.city,
-    rmp_facility.state,
-    rmp_facility.county,
-    rmp_facility.zip,
-    rmp_facility.facility_duns,
-    rmp_facility.receipt_date,
-    rmp_facility.report_created_date,
-    (
-        SELECT GROUP_CONCAT(DISTINCT naics_code)
-        FROM rmp_facility_naics
-        WHERE rmp_facility_naics.facility_id = rmp_facility.epa_facility_id
-    ) AS naics_codes,
-    (
-        SELECT GROUP_CONCAT(chemical_name, ', ')
-        FROM (
-            SELECT DISTINCT rc.chemical_name
-            FROM rmp_facility_chemicals rfc
-            JOIN rmp_chemical rc ON rfc.chemical_id = rc.chemical_id
-            WHERE rfc.facility_id = rmp_facility.epa_facility_id
-        )
-    ) AS chemical_names,
-    rmp_facility.latitude,
-    rmp_facility.longitude
-FROM rmp_facility
-GROUP BY 
-    rmp_facility.epa_facility_id,
-    rmp_facility.report,
-    rmp_facility.facility_name,
-    rmp_facility.facility_address,
-    rmp_facility.city,
-    rmp_facility.state,
-    rmp_facility.county,
-    rmp_facility.zip,
-    rmp_facility.facility_duns,
-    rmp_facility.receipt_date,
-    rmp_facility.report_created_date;
-""")
+        rows = map(values, reader)
+        for chunk in iter(lambda: list(islice(rows, bulk_chunk_rows)), []):
+            yield chunk
 
-# Commit changes and close the connection
-conn.commit()
+# Function to yield the rows of a Parquet file in chunks of bulk_chunk_rows, missing values as NULL as from the CSVs
+def read_parquet_chunks(parquet_file, columns):
+    import pyarrow.parquet
+    for batch in pyarrow.parquet.ParquetFile(parquet_file).iter_batches(batch_size=bulk_chunk_rows, columns=columns):
+        yield [scraper_sinks.normalize_missing(row) for row in zip(*(column.to_pylist() for column in batch.columns))]
 
-# Create the facility_accidents_view table with primary key
-cursor.execute("DROP TABLE IF EXISTS facility_accidents_view;")
+# Function to bulk load a table from its Parquet or CSV file with executemany, in a single transaction
+def bulk_import_table(table_name, parquet_file=None):
+    start = time.time()
+    columns = [column for column, _ in rmp_schema.table_columns(table_name)]
+    if parquet_file:
+        source, chunks = parquet_file, read_parquet_chunks(parquet_file, columns)
+    elif os.path.exists(csv_files[table_name]):
+        source, chunks = csv_files[table_name], read_csv_chunks(csv_files[table_name], table_name, columns)
+    else:
+        print(f"Warning: {csv_files[table_name]} not found, skipping import for {table_name}")
+        return
+    sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    rows = 0
+    for chunk in chunks:
+        cursor.executemany(sql, chunk)
+        rows += len(chunk)
+    conn.commit()
+    print(f"Imported {rows} rows into {table_name} from {source} in {time.time() - start:.2f} seconds")
 
-cursor.execute("""
-CREATE TABLE facility_accidents_view (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    facility_accident_id TEXT,
-    accident_id TEXT,
-    facility_id TEXT,
-    facility_name TEXT,
-    facility_address TEXT,
-    city TEXT,
-    state TEXT,
-    county TEXT,
-    date_of_accident TEXT,
-    time_accident_began TEXT,
-    release_duration TEXT,
-    naics_code TEXT,
-    chemical_names TEXT,
-    latitude REAL,
-    longitude REAL
-);
-""")
+# Import data from the Parquet files where there are any, else from the CSV files
+for table_name in tables:
+    parquet_file = os.path.join(parquet_dir, f"{table_name}.parquet") if parquet_dir else None
+    if parquet_file and not os.path.exists(parquet_file):
+        parquet_file = None
+    if bulk_load:
+        bulk_import_table(table_name, parquet_file)
+    elif parquet_file:
+        import_parquet_to_table(parquet_file, table_name)
+    else:
+        import_csv_to_table(csv_files[table_name], table_name)
 
-# 2. Insert data into the table (omit 'id' to let SQLite auto-generate)
-cursor.execute("""
-INSERT INTO facility_accidents_view (
-    facility_accident_id,
-    accident_id,
-    facility_id,
-    facility_name,
-    facility_address,
-    city,
-    state,
-    county,
-    date_of_accident,
-    time_accident_began,
-    release_duration,
-    naics_code,
-    chemical_names,
-    latitude,
-    longitude
-)
-SELECT 
-    rfa.facility_accident_id,
-    rfa.accident_id,
-    rfa.facility_id,
-    rf.facility_name,
-    rf.facility_address,
-    rf.city,
-    rf.state,
-    rf.county,
-    rfa.date_of_accident,
-    rfa.time_accident_began,
-    rfa.release_duration,
-    rfa.naics_code,
-    (
-        SELECT GROUP_CONCAT(chemical_name, ', ')
-        FROM (
-            SELECT DISTINCT rc.chemical_name
-            FROM rmp_facility_chemicals rfc
-            JOIN rmp_chemical rc ON rfc.chemical_id = rc.chemical_id
-            WHERE rfc.facility_id = rfa.facility_id
-        )
-    ) AS chemical_names,
-    rf.latitude,
-    rf.longitude
-FROM rmp_facility_accidents rfa
-JOIN rmp_facility rf ON rfa.facility_id = rf.epa_facility_id
-GROUP BY 
-    rfa.facility_accident_id,
-    rfa.accident_id,
-    rfa.facility_id,
-    rf.facility_name,
-    rf.facility_address,
-    rf.city,
-    rf.state,
-    rf.county,
-    rfa.date_of_accident,
-    rfa.time_accident_began,
-    rfa.release_duration,
-    rfa.naics_code,
-    rf.latitude,
-    rf.longitude;
-""")
+if bulk_load:
+    # Same guarantee as loading with foreign keys on, checked once for all rows
+    violations = cursor.execute("PRAGMA foreign_key_check;").fetchall()
+    if violations:
+        for table_name, rowid, parent, _ in violations[:10]:
+            print(f"Foreign key violation: {table_name} row {rowid} has no matching row in {parent}")
+        raise sqlite3.IntegrityError(f"{len(violations)} rows violate a foreign key; see above for the first ones")
+    cursor.execute("PRAGMA foreign_keys = ON;")
 
-conn.commit()
-print("facility_accidents_view table with integer primary key created successfully.")
+# Create the indexes of the base tables (rmp_indexes.INDEX_PLAN) now that they are loaded
+created = rmp_indexes.apply_index_plan(conn, list(rmp_schema.TABLE_SCHEMAS))
+print(f"Created {len(created)} indexes on the base tables.")
 
-# Creating accident_chemicals_view
-cursor.execute("DROP TABLE IF EXISTS accident_chemicals_view;")
-# Create accident_chemicals_view
-cursor.execute("""
-CREATE TABLE accident_chemicals_view (
-    accident_chemical_id INTEGER PRIMARY KEY,
-    accident_id TEXT,
-    facility_id TEXT,
-    facility_name TEXT,
-    facility_address TEXT,
-    city TEXT,
-    state TEXT,
-    county TEXT,
-    date_of_accident TEXT,
-    chemical_name TEXT,
-    quantity_released_lbs TEXT,
-    percent_weight TEXT
-);
-""")
+print(f"Database {db_file} created and populated successfully.")
 
-# 2. Insert data into the table with LEFT JOINs
-cursor.execute("""
-INSERT INTO accident_chemicals_view
-SELECT 
-    rac.accident_chemical_id,
-    rfa.accident_id,
-    rfa.facility_id,
-    rf.facility_name,
-    rf.facility_address,
-    rf.city,
-    rf.state,
-    rf.county,
-    rfa.date_of_accident,
-    rc.chemical_name,
-    rac.quantity_released_lbs,
-    rac.percent_weight
-FROM rmp_accident_chemicals rac
-LEFT JOIN rmp_facility_accidents rfa ON rac.facility_accident_id = rfa.facility_accident_id
-LEFT JOIN rmp_facility rf ON rfa.facility_id = rf.epa_facility_id
-LEFT JOIN rmp_chemical rc ON rac.chemical_id = rc.chemical_id
-GROUP BY 
-    rac.accident_chemical_id,
-    rfa.accident_id,
-    rfa.facility_id,
-    rf.facility_name,
-    rf.facility_address,
-    rf.city,
-    rf.state,
-    rf.county,
-    rfa.date_of_accident,
-    rc.chemical_name,
-    rac.quantity_released_lbs,
-    rac.percent_weight;
-""")
+# Build the materialized views (facility_view, facility_accidents_view, accident_chemicals_view)
+rmp_views.materialize_views(conn)
+# The full-text indexes read their text from the views just rebuilt, so they are rebuilt too: the staging
+# copy still has those of the previous build, which would no longer match the views
+for fts_table in rmp_views.FTS_TABLES:
+    rmp_views.create_fts_table(conn, fts_table)
 
-conn.commit()
-conn.close()
-print("accident_chemicals_view table with primary key created successfully.")
+# Index the views, refresh the query planner statistics and check the plans of the key page queries
+# (fails the build when one of them scans a whole table), then compact the file
+rmp_indexes.apply_and_check(conn)
+if atomic_publish:
+    conn.close()
+    rmp_publish.publish(build_file, db_file)  # Also VACUUMs and checks the integrity before the swap
+    if source_file != db_file:
+        os.remove(source_file)  # Its tables are published now
+else:
+    cursor.execute("VACUUM;")
+    conn.close()
+print(f"Database {db_file} built in {time.time() - build_start:.2f} seconds.")
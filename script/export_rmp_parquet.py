@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Export tables of risk-management-plans.db as Parquet files.
+
+Writes <table>.parquet for each table into a directory, for analysts who would rather
+query the data with pandas or DuckDB than through SQLite, e.g.
+
+    python export_rmp_parquet.py rmp/risk-management-plans.db --output-dir parquet
+    duckdb -c "SELECT state, count(*) FROM 'parquet/rmp_facility.parquet' GROUP BY state"
+
+Column types follow the declared types of the table (TEXT, INTEGER, REAL), so the
+materialized views such as facility_view can be exported too. The base tables can be
+loaded back by create_sqlite_rmp_db_from_csv.py (parquet_dir), which is how
+rmp_facility gets a Parquet file next to the six scraped tables
+(scrap_pdf_rmp_reports_to_csv.py --parquet).
+"""
+import argparse
+import os
+import sqlite3
+import time
+import rmp_schema
+import scraper_sinks
+
+default_tables = list(rmp_schema.TABLE_SCHEMAS)
+row_group_rows = 100000
+
+
+# Function to list the (column, declared type) pairs of a table
+def table_columns(conn, table):
+    columns = [(row[1], row[2]) for row in conn.execute(f"PRAGMA table_info({table})")]
+    if not columns:
+        raise ValueError(f"No table {table} in the database")
+    return columns
+
+# Function to export one table; returns the number of rows written
+def export_table(conn, table, path):
+    columns = table_columns(conn, table)
+    cursor = conn.execute(f"SELECT {', '.join(column for column, _ in columns)} FROM {table}")
+    with scraper_sinks.ParquetSink(path, scraper_sinks.arrow_schema(columns), batch_size=row_group_rows) as sink:
+        for row in cursor:
+            sink.write(row)
+    return sink.rows_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export tables of risk-management-plans.db as Parquet files.")
+    parser.add_argument("db_file", help="Database to export, e.g. rmp/risk-management-plans.db")
+    parser.add_argument("--output-dir", default="parquet", help="Directory for the <table>.parquet files (default: parquet)")
+    parser.add_argument("--tables", nargs="+", default=default_tables,
+                        help="Tables to export (default: the seven base tables)")
+    args = parser.parse_args()
+    try:
+        scraper_sinks.import_pyarrow()
+    except ImportError as e:
+        parser.error(str(e))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    conn = sqlite3.connect(args.db_file)
+    for table in args.tables:
+        start = time.time()
+        path = os.path.join(args.output_dir, f"{table}.parquet")
+        rows = export_table(conn, table, path)
+        print(f"Exported {rows} rows of {table} to {path} ({os.path.getsize(path) / 1e6:.2f} MB) in {time.time() - start:.2f} seconds")
+    conn.close()
+
+if __name__ == "__main__":
+    main()
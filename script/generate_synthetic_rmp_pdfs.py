@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Generate a synthetic corpus of RMP-style PDF reports for testing and benchmarking.
+
+The reports are laid out the way the scrapers expect: a running header and footer
+on every page, "Process Chemicals" / "Process NAICS" blocks with the label on one
+line and the value on the next, and a "Section 6. Accident History" with one
+"Label: value" line per field followed by "Chemicals in Accident History". Counts of
+chemicals, NAICS codes, accidents, flammable mixtures and filler pages (release
+scenarios before Section 6, executive summary after Section 9) are configurable. Files are written to <output>/<STATE>/<facility_id>.pdf like the EDGI
+archive, together with an rmp_accident_history.csv listing the accident counts (the
+input of scrap_accidents_details_to_csv.py). Every report is generated from
+(seed, index), so a corpus is reproducible and --workers doesn't change it.
+"""
+import argparse
+import csv
+import os
+import random
+from multiprocessing import Pool
+import fitz  # PyMuPDF
+
+STATES = ["AK", "AL", "AR", "AZ", "CA", "CO", "CT", "DE", "FL", "GA", "IA", "ID", "IL", "IN", "KS", "KY", "LA", "MA", "MD",
+          "MI", "MN", "MO", "MS", "MT", "NC", "ND", "NE", "NJ", "NM", "NV", "NY", "OH", "OK", "OR", "PA", "SC", "TN", "TX",
+          "UT", "VA", "WA", "WI", "WV"]
+CHEMICALS = [
+    ("Ammonia (anhydrous)", "7664-41-7", "Toxic"), ("Chlorine", "7782-50-5", "Toxic"), ("Propane", "74-98-6", "Flammable"),
+    ("Sulfur dioxide (anhydrous)", "7446-09-5", "Toxic"), ("Butane", "106-97-8", "Flammable"), ("Isobutane [Propane, 2-methyl]", "75-28-5", "Flammable"),
+    ("Hydrogen fluoride/Hydrofluoric acid (conc 50% or greater) [Hydrofluoric acid]", "7664-39-3", "Toxic"),
+    ("Formaldehyde (solution)", "50-00-0", "Toxic"), ("Methane", "74-82-8", "Flammable"), ("Ethylene [Ethene]", "74-85-1", "Flammable"),
+    ("Pentane", "109-66-0", "Flammable"), ("Ammonia (conc 20% or greater)", "7664-41-7", "Toxic"), ("Hydrogen", "1333-74-0", "Flammable"),
+    ("Vinyl chloride [Ethene, chloro-]", "75-01-4", "Flammable"), ("Anhydrous Hydrogen chloride", "7647-01-0", "Toxic")
+]
+MIXTURE = ("Flammable Mixture", "00-11-11", "Flammable")
+NAICS = [
+    ("31171", "Seafood Product Preparation and Packaging"), ("22131", "Water Supply and Irrigation Systems"),
+    ("42491", "Farm Supplies Merchant Wholesalers"), ("32511", "Petrochemical Manufacturing"),
+    ("211112", "Natural Gas Liquid Extraction"), ("221320", "Sewage Treatment Facilities"),
+    ("325311", "Nitrogenous Fertilizer Manufacturing"), ("424720", "Petroleum and Petroleum Products Merchant Wholesalers (except Bulk Stations and Terminals)"),
+    ("311615", "Poultry Processing"), ("493120", "Refrigerated Warehousing and Storage"), ("324110", "Petroleum Refineries")
+]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
+YES_NO_NA = ["Yes", "No", "N/A", "N/A", "N/A"]
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # US Letter
+BODY_TOP, BODY_BOTTOM, LINE_HEIGHT = 54, 740, 14
+LINES_PER_PAGE = (BODY_BOTTOM - BODY_TOP) // LINE_HEIGHT
+
+
+# Function to parse a "MIN-MAX" or "N" command line range
+def int_range(value):
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
+# Function to split a long value over several lines like the EPA reports do
+def wrap(text, width=60):
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    return lines + ([line] if line else [])
+
+# Function to build the body lines of one report and the number of accidents in it
+def report_lines(rng, facility_id, options):
+    lines = ["Section 1. Registration Information", "Facility Name:", f"Synthetic Facility {facility_id}",
+             "EPA Facility Identifier:", facility_id, "Process Chemicals"]
+    for _ in range(rng.randint(*options.chemicals)):
+        chemical = MIXTURE if rng.random() < options.mixture_rate else rng.choice(CHEMICALS)
+        lines += ["Program Level:", f"Program Level {rng.randint(1, 3)} process", "Chemical Name:", *wrap(chemical[0]),
+                  "CAS Number:", chemical[1], "Flammable/Toxic:", chemical[2]]
+        if chemical is MIXTURE:
+            lines.append("Flammable Mixture Chemical Components")
+            for component in rng.sample([c for c in CHEMICALS if c[2] == "Flammable"], 2):
+                lines += ["Chemical Name:", *wrap(component[0]), "CAS Number:", component[1], "Flammable/Toxic:", component[2]]
+    lines.append("Process NAICS")
+    for code, description in rng.sample(NAICS, min(rng.randint(*options.naics), len(NAICS))):
+        lines += ["NAICS Code:", code, "NAICS Description:", *wrap(description)]
+    lines += ["Section 2. Toxics: Worst-case", "Toxic Name: Ammonia (anhydrous)", "Section 3. Toxics: Alternative Release",
+              "Section 4. Flammables: Worst-case", "Section 5. Flammables: Alternative Release"]
+    if options.scenario_pages[1]:
+        # Only drawn when asked for, so corpora generated without it stay the same
+        lines += [f"Release scenario detail line {k}" for k in range(rng.randint(*options.scenario_pages) * LINES_PER_PAGE)]
+    lines.append("Section 6. Accident History")
+
+    accidents = rng.randint(*options.accidents)
+    if not accidents:
+        lines.append("No records found")
+    for number in range(1, accidents + 1):
+        code, description = rng.choice(NAICS)
+        lines += [f"Accident History ID: Accident {number}",
+                  f"Date of Accident: {rng.choice(MONTHS)} {rng.randint(1995, 2023)}",
+                  f"Time Accident Began (HH:MM): {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+                  f"NAICS Code of Process Involved: {code}", f"NAICS Description: {description}",
+                  f"Release Duration: {rng.randint(0, 48):03d} Hours {rng.randint(0, 59):02d} Minutes"]
+        lines += [f"{label}: {rng.choice(YES_NO_NA)}" for label in
+                  ["Gas Release", "Liquid Spill/Evaporation", "Fire", "Explosion", "Uncontrolled/Runaway Reaction",
+                   "Storage Vessel", "Piping", "Process Vessel", "Transfer Hose", "Valve", "Pump", "Joint"]]
+        lines += ["Other Release Source: Relief valve discharge line",
+                  f"Wind Speed: {rng.randint(0, 30)}", "Units: Miles/h", f"Direction: {rng.choice(['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW'])}",
+                  f"Temperature: {rng.randint(-10, 100)}", f"Atmospheric Stability Class: {rng.choice('ABCDEF')}",
+                  f"Precipitation Present: {rng.choice(YES_NO_NA)}", f"Unknown Weather Conditions: {rng.choice(YES_NO_NA)}"]
+        lines += [f"{label}: {rng.choice([0, 0, 0, 1, 2])}" for label in
+                  ["Employee or Contractor Deaths", "Public Responder Deaths", "Public Deaths", "Employee or Contractor Injuries",
+                   "Public Responder Injuries", "Public Injuries"]]
+        lines.append(f"On-Site Property Damage ($): {rng.randint(0, 250000)}")
+        lines += [f"{label}: {rng.choice([0, 0, 0, 3, 40])}" for label in
+                  ["Deaths", "Hospitalizations", "Other Medical Treatments", "Evacuated", "Sheltered-in-Place"]]
+        lines.append(f"Off-Site Property Damage ($): {rng.randint(0, 5000)}")
+        lines += [f"{label}: {rng.choice(YES_NO_NA)}" for label in
+                  ["Fish or Animal Kills", "Tree, Lawn, Shrub, or Crop Damage", "Water Contamination", "Soil Contamination"]]
+        lines += ["Other Environmental Damage:", f"Initiating Event: {rng.choice(['Human Error', 'Equipment Failure', 'Unknown'])}"]
+        lines += [f"{label}: {rng.choice(YES_NO_NA)}" for label in
+                  ["Equipment Failure", "Human Error", "Improper Procedures", "Overpressurization", "Upset Condition",
+                   "By-Pass Condition", "Maintenance Activity/Inactivity", "Process Design Failure", "Unsuitable Equipment",
+                   "Unusual Weather Condition", "Management Error"]]
+        lines += ["Other Contributing Factor: none", "Off-Site Responders Notified: Notified and Responded"]
+        lines += [f"{label}: {rng.choice(YES_NO_NA)}" for label in
+                  ["Improved or Upgraded Equipment", "Revised Maintenance", "Revised Training", "Revised Operating Procedures",
+                   "New Process Controls", "New Mitigation Systems", "Revised Emergency Response Plan", "Changed Process",
+                   "Reduced Inventory", "None"]]
+        lines += ["Other Changes Introduced: Equipment inspections", "Chemicals in Accident History"]
+        for _ in range(rng.randint(1, 3)):
+            chemical = MIXTURE if rng.random() < options.mixture_rate else rng.choice(CHEMICALS)
+            lines += [f"Quantity Released (lbs): {rng.randint(1, 50000)}", f"Percent Weight: {rng.choice([100, 100, 50, 25.5])}",
+                      f"Chemical Name: {chemical[0]}", f"CAS Number: {chemical[1]}", f"Flammable/Toxic: {chemical[2]}"]
+            if chemical is MIXTURE:
+                lines.append("Flammable Mixture Chemical Components")
+                for component in rng.sample([c for c in CHEMICALS if c[2] == "Flammable"], 2):
+                    lines += [f"Chemical Name: {component[0]}", f"CAS Number: {component[1]}", f"Flammable/Toxic: {component[2]}"]
+
+    lines.append("Section 7. Prevention Program 3")
+    lines += [f"Prevention Program detail line {k}" for k in range(rng.randint(20, 60))]
+    lines += ["Section 8. Prevention Program 2", "Safety Information: Yes", "Section 9. Emergency Response",
+              "Written Emergency Response (ER) Plan: Yes", "Executive Summary"]
+    lines += [f"Executive summary text line {k}" for k in range(rng.randint(*options.extra_pages) * LINES_PER_PAGE)]
+    return lines, accidents
+
+# Function to write one report; returns (state, facility_id, accident count, bytes)
+def generate_report(args):
+    index, options = args
+    rng = random.Random(f"{options.seed}-{index}")
+    facility_id = f"1000{index:08d}"
+    state = rng.choice(STATES)
+    lines, accidents = report_lines(rng, facility_id, options)
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)]
+    with fitz.open() as doc:
+        for page_no, chunk in enumerate(pages, 1):
+            page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            # One insert_text call per block of lines; drawing line by line is several times slower
+            page.insert_text((36, 20), f"Facility Name: Synthetic Facility {facility_id}\nEPA Facility Identifier: {facility_id}\n"
+                             f"Plan Sequence Number: {1000000 + index}", fontsize=7, lineheight=9 / 7)
+            page.insert_text((36, BODY_TOP), "\n".join(chunk), fontsize=9, lineheight=LINE_HEIGHT / 9)
+            page.insert_text((36, 772), "Data displayed is accurate as of 5/1/2025 4:31:02 PM", fontsize=7)
+            page.insert_text((500, 772), f"Page {page_no} of {len(pages)}", fontsize=7)
+        path = os.path.join(options.output, state, f"{facility_id}.pdf")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        doc.save(path, garbage=3, deflate=True)
+    return state, facility_id, accidents, os.path.getsize(path)
+
+# Function to generate a whole corpus; returns the per-report tuples of generate_report
+def generate_corpus(options):
+    os.makedirs(options.output, exist_ok=True)
+    tasks = [(index, options) for index in range(options.count)]
+    if options.workers > 1:
+        with Pool(options.workers) as pool:
+            reports = pool.map(generate_report, tasks, chunksize=16)
+    else:
+        reports = [generate_report(task) for task in tasks]
+    with open(os.path.join(options.output, "rmp_accident_history.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["EPA Facility ID", "Has Accident", "Accident Count"])
+        for state, facility_id, accidents, size in reports:
+            writer.writerow([facility_id, "Yes" if accidents else "No", accidents])
+    return reports
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic RMP-style PDF reports.")
+    parser.add_argument("output", help="Directory to write <STATE>/<facility_id>.pdf files to")
+    parser.add_argument("--count", type=int, default=100, help="Number of reports (default: 100)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (default: 1)")
+    parser.add_argument("--chemicals", type=int_range, default=(1, 4), help="Process chemicals per report, MIN-MAX (default: 1-4)")
+    parser.add_argument("--naics", type=int_range, default=(1, 2), help="NAICS codes per report, MIN-MAX (default: 1-2)")
+    parser.add_argument("--accidents", type=int_range, default=(0, 3), help="Accidents per report, MIN-MAX (default: 0-3)")
+    parser.add_argument("--mixture-rate", type=float, default=0.1, help="Chance that a chemical is a flammable mixture (default: 0.1)")
+    parser.add_argument("--extra-pages", type=int_range, default=(1, 6),
+                        help="Executive summary pages after Section 9, MIN-MAX (default: 1-6)")
+    parser.add_argument("--scenario-pages", type=int_range, default=(0, 0),
+                        help="Release scenario pages in Sections 2-5, before Section 6, MIN-MAX (default: 0)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes generating reports (default: 1)")
+    return parser.parse_args(argv)
+
+def main():
+    options = parse_args()
+    reports = generate_corpus(options)
+    total_bytes = sum(report[3] for report in reports)
+    print(f"Generated {len(reports)} reports ({total_bytes / 1e6:.1f} MB, {sum(report[2] for report in reports)} accidents) in {options.output}")
+
+if __name__ == "__main__":
+    main()
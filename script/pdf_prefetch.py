@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Read-ahead of the PDF archive on background threads.
+
+PrefetchReader reads the upcoming PDFs of a list into memory on a small thread pool
+while the caller decodes the current one, and yields (path, bytes) in list order.
+The bytes go to pdf_text_cache.iter_page_texts(path, data=...), which opens them
+with fitz.open(stream=...), so on a network share or a cold disk the reads overlap
+with the decoding instead of stalling it.
+
+Two limits keep the read-ahead bounded: queue_depth, the number of PDFs read but not
+yet released, and max_bytes, their total size. A PDF counts until it is released:
+by default when the caller asks for the next one, or, with release_on_next=False,
+when the caller calls release(path), e.g. once a worker process has handed back its
+result. A PDF larger than max_bytes is still read, on its own. A PDF that can't be
+read is yielded with None, so the caller opens the path itself and reports the error
+the usual way.
+
+    for pdf_file, data in PrefetchReader(pdf_files, threads=4):
+        texts = list(pdf_text_cache.iter_page_texts(pdf_file, data=data))
+"""
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+default_threads = 4
+default_queue_depth = 16
+default_max_mb = 256
+
+
+# Function to read a whole file, run on the pool threads
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class PrefetchReader:
+    """Yields (path, bytes) for a list of PDFs, reading ahead on background threads."""
+
+    def __init__(self, paths, threads=default_threads, queue_depth=default_queue_depth, max_mb=default_max_mb, release_on_next=True):
+        self.paths = list(paths)
+        self.threads = max(1, threads)
+        self.queue_depth = max(1, queue_depth)
+        self.max_bytes = max_mb * (1 << 20)
+        self.release_on_next = release_on_next
+        self.in_flight = {}  # path -> bytes counted against max_bytes, from submit until release
+        self.in_flight_bytes = 0
+        self.peak_bytes = 0
+        self._changed = threading.Condition()
+
+    # Function to tell whether one more PDF of the given size fits in the limits
+    def _fits(self, size):
+        if not self.in_flight:
+            return True
+        return len(self.in_flight) < self.queue_depth and self.in_flight_bytes + size <= self.max_bytes
+
+    # Function to stop counting a PDF against the limits; safe to call from any thread, and more than once
+    def release(self, path):
+        with self._changed:
+            size = self.in_flight.pop(path, None)
+            if size is not None:
+                self.in_flight_bytes -= size
+                self._changed.notify_all()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __iter__(self):
+        pending = deque()  # (path, future) in list order
+        next_path = 0
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="pdf-prefetch") as pool:
+            try:
+                while next_path < len(self.paths) or pending:
+                    # Start as many reads as the limits allow; with nothing pending, wait for a release
+                    with self._changed:
+                        while next_path < len(self.paths):
+                            path = self.paths[next_path]
+                            try:
+                                size = os.path.getsize(path)
+                            except OSError:
+                                size = 0
+                            if not self._fits(size):
+                                if pending:
+                                    break
+                                self._changed.wait()
+                                continue
+                            self.in_flight[path] = size
+                            self.in_flight_bytes += size
+                            self.peak_bytes = max(self.peak_bytes, self.in_flight_bytes)
+                            pending.append((path, pool.submit(read_file, path)))
+                            next_path += 1
+                    path, future = pending.popleft()
+                    try:
+                        data = future.result()
+                    except OSError:
+                        data = None
+                    yield path, data
+                    if self.release_on_next:
+                        self.release(path)
+            finally:
+                # Stopped early: drop the reads not started yet and forget everything still counted
+                for _, future in pending:
+                    future.cancel()
+                with self._changed:
+                    self.in_flight.clear()
+                    self.in_flight_bytes = 0
+                    self._changed.notify_all()
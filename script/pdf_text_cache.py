@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Shared on-disk cache of the text PyMuPDF extracts from each RMP PDF page.
+
+Pages are keyed by the SHA-256 of the PDF bytes plus EXTRACTOR_VERSION and stored
+zlib-compressed in a single SQLite file, so every scraper reads the same cache and a
+parser change can be re-run over the whole archive without decoding the PDFs again.
+Pages are cached (and committed) one at a time, which lets a scraper stop reading a
+document early and still reuse whatever it decoded, and keeps the write lock short
+while several worker processes share the cache.
+
+Optionally the page header and footer bands measured by calibrate_page_bands.py are
+clipped away during extraction, so they are never turned into text at all. The bands
+are part of the extractor version, so clipped and unclipped text are cached separately.
+"""
+import fitz  # PyMuPDF
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+# Bump the suffix whenever the way text is pulled out of a page changes
+EXTRACTOR_VERSION = f"pymupdf-{fitz.VersionBind}-text-1"
+
+# Cache location; set to None (or call configure(None)) to always decode the PDFs
+cache_file = "pdf_text_cache.sqlite"
+
+# (header_height, footer_height) in points to clip from every page, or None to keep the whole page
+page_bands = None
+
+cache_stats = {"hits": 0, "misses": 0}
+# Seconds spent hashing, looking up and opening documents in this process, for the run metrics
+stage_times = {"open": 0.0}
+
+_conn = None
+_conn_pid = None
+
+# Function to point the cache at another file and set the clip bands (also used as a Pool initializer)
+def configure(path, bands=None):
+    global cache_file, page_bands, _conn, _conn_pid
+    cache_file = path
+    page_bands = tuple(bands) if bands else None
+    _conn = None
+    _conn_pid = None
+
+# Function to read the header/footer bands written by calibrate_page_bands.py
+def load_page_bands(path):
+    with open(path, encoding="utf-8") as f:
+        bands = json.load(f)
+    return bands["header_height"], bands["footer_height"]
+
+# Function to get the version string the cache is keyed on for the current settings
+def extractor_version():
+    if page_bands is None:
+        return EXTRACTOR_VERSION
+    return f"{EXTRACTOR_VERSION}-clip-{page_bands[0]:.2f}-{page_bands[1]:.2f}"
+
+# Function to pull the text out of one page, leaving out the header and footer bands if set
+def extract_page_text(page):
+    if page_bands is None:
+        return page.get_text("text")
+    rect = page.rect
+    clip = fitz.Rect(rect.x0, rect.y0 + page_bands[0], rect.x1, rect.y1 - page_bands[1])
+    return page.get_text("text", clip=clip)
+
+# Function to open the cache once per process
+def _connect():
+    global _conn, _conn_pid
+    if cache_file is None:
+        return None
+    # A connection inherited through fork must not be shared with the parent
+    if _conn is None or _conn_pid != os.getpid():
+        _conn = sqlite3.connect(cache_file, timeout=60)
+        _conn_pid = os.getpid()
+        _conn.execute("PRAGMA journal_mode = WAL;")
+        _conn.execute("PRAGMA synchronous = NORMAL;")
+        _conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                pdf_hash TEXT
+            );
+            CREATE TABLE IF NOT EXISTS documents (
+                pdf_hash TEXT,
+                extractor_version TEXT,
+                page_count INTEGER,
+                PRIMARY KEY (pdf_hash, extractor_version)
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                pdf_hash TEXT,
+                extractor_version TEXT,
+                page_no INTEGER,
+                text BLOB,
+                PRIMARY KEY (pdf_hash, extractor_version, page_no)
+            ) WITHOUT ROWID;
+        """)
+    return _conn
+
+# Function to hash the PDF bytes, reusing the last hash while path, size and mtime are unchanged
+def file_hash(pdf_path):
+    path = os.path.abspath(str(pdf_path))
+    st = os.stat(path)
+    conn = _connect()
+    if conn is not None:
+        row = conn.execute("SELECT size, mtime_ns, pdf_hash FROM files WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    pdf_hash = digest.hexdigest()
+    if conn is not None:
+        conn.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, pdf_hash) VALUES (?, ?, ?, ?)",
+                     (path, st.st_size, st.st_mtime_ns, pdf_hash))
+        conn.commit()
+    return pdf_hash
+
+# Function to open a PDF from its path, or from its bytes when the caller already has them
+def open_document(pdf_path, data=None):
+    if data is not None:
+        return fitz.open(stream=data, filetype="pdf")
+    return fitz.open(pdf_path)
+
+# Function to yield the text of each page, decoding and caching only the pages not cached yet.
+# Pass data (the PDF bytes) when they have been read already; pdf_path then only names the file.
+def iter_page_texts(pdf_path, page_numbers=None, data=None):
+    start = time.perf_counter()
+    conn = _connect()
+    if conn is None:
+        with open_document(pdf_path, data) as doc:
+            stage_times["open"] += time.perf_counter() - start
+            for page_no in (range(len(doc)) if page_numbers is None else page_numbers):
+                yield extract_page_text(doc[page_no])
+        return
+
+    pdf_hash = file_hash(pdf_path) if data is None else hashlib.sha256(data).hexdigest()
+    version = extractor_version()
+    doc = None
+    try:
+        row = conn.execute("SELECT page_count FROM documents WHERE pdf_hash = ? AND extractor_version = ?",
+                           (pdf_hash, version)).fetchone()
+        if row:
+            page_count = row[0]
+        else:
+            doc = open_document(pdf_path, data)
+            page_count = len(doc)
+            conn.execute("INSERT OR REPLACE INTO documents (pdf_hash, extractor_version, page_count) VALUES (?, ?, ?)",
+                         (pdf_hash, version, page_count))
+            conn.commit()
+        stage_times["open"] += time.perf_counter() - start
+
+        for page_no in (range(page_count) if page_numbers is None else page_numbers):
+            cached = conn.execute("SELECT text FROM pages WHERE pdf_hash = ? AND extractor_version = ? AND page_no = ?",
+                                  (pdf_hash, version, page_no)).fetchone()
+            if cached:
+                cache_stats["hits"] += 1
+                yield zlib.decompress(cached[0]).decode("utf-8")
+                continue
+            cache_stats["misses"] += 1
+            if doc is None:
+                start = time.perf_counter()
+                doc = open_document(pdf_path, data)
+                stage_times["open"] += time.perf_counter() - start
+            text = extract_page_text(doc[page_no])
+            conn.execute("INSERT OR REPLACE INTO pages (pdf_hash, extractor_version, page_no, text) VALUES (?, ?, ?, ?)",
+                         (pdf_hash, version, page_no, zlib.compress(text.encode("utf-8"))))
+            # Committed before the page is handed over: the write lock must not be held while the caller
+            # parses it, or the other workers could not cache their own pages meanwhile (cheap in WAL mode)
+            conn.commit()
+            yield text
+    finally:
+        if doc is not None:
+            doc.close()
+
+# Function to get the text of every page of a PDF as a list
+def get_page_texts(pdf_path):
+    return list(iter_page_texts(pdf_path))
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Index plan of risk-management-plans.db, and the query plan check that goes with it.
+
+INDEX_PLAN lists every index of the database: the join keys of the base tables, and
+the facet, filter, lookup and sort columns of the tables Datasette serves (see the
+facets in rmp/metadata.json). The build applies it once the tables are loaded and the
+views materialized, as both drop and recreate the tables and, with them, their
+indexes:
+
+    rmp_indexes.apply_index_plan(conn)
+
+KEY_QUERIES are the queries behind the pages people use most: a facet, a filtered
+table page, a sorted page, a row page and the related-row counts Datasette shows on
+it. check_query_plans runs EXPLAIN QUERY PLAN on each and reports those where SQLite
+reads a whole table instead of going through an index, so a dropped index or a new
+page that needs one fails the build instead of timing out in production:
+
+    python rmp_indexes.py rmp/risk-management-plans.db --apply
+"""
+import argparse
+import re
+import sqlite3
+import sys
+
+# (table, columns, why) of every index; named idx_<table>_<columns>
+INDEX_PLAN = [
+    # Join keys of the base tables, used by the views and the related-row counts of the row pages
+    ("rmp_facility_chemicals", ("facility_id",), "join"),
+    ("rmp_facility_chemicals", ("chemical_id",), "join"),
+    ("rmp_facility_naics", ("facility_id",), "join"),
+    ("rmp_facility_naics", ("naics_code",), "join"),
+    ("rmp_facility_accidents", ("facility_id",), "join"),
+    ("rmp_facility_accidents", ("naics_code",), "join"),
+    ("rmp_accident_chemicals", ("facility_accident_id",), "join"),
+    ("rmp_accident_chemicals", ("chemical_id",), "join"),
+    ("rmp_chemical", ("chemical_name",), "sort"),
+    # facility_view: facets state, county, naics_codes; sorted by name; range filtered by receipt month
+    ("facility_view", ("state",), "facet"),
+    ("facility_view", ("county",), "facet"),
+    ("facility_view", ("naics_codes",), "facet"),
+    ("facility_view", ("facility_name",), "sort"),
+    ("facility_view", ("receipt_month",), "range"),
+    # facility_accidents_view: facets state, county, date_of_accident, naics_code; linked by accident and facility;
+    # range filtered and sorted by the typed columns (see rmp_views)
+    ("facility_accidents_view", ("state",), "facet"),
+    ("facility_accidents_view", ("county",), "facet"),
+    ("facility_accidents_view", ("date_of_accident",), "facet"),
+    ("facility_accidents_view", ("naics_code",), "facet"),
+    ("facility_accidents_view", ("facility_accident_id",), "lookup"),
+    ("facility_accidents_view", ("facility_id",), "lookup"),
+    ("facility_accidents_view", ("accident_month",), "range"),
+    ("facility_accidents_view", ("release_duration_minutes",), "range"),
+    # accident_chemicals_view: facets state, county, date_of_accident, chemical_name; linked by accident and facility;
+    # range filtered and sorted by the typed columns
+    ("accident_chemicals_view", ("state",), "facet"),
+    ("accident_chemicals_view", ("county",), "facet"),
+    ("accident_chemicals_view", ("date_of_accident",), "facet"),
+    ("accident_chemicals_view", ("chemical_name",), "facet"),
+    ("accident_chemicals_view", ("accident_id",), "lookup"),
+    ("accident_chemicals_view", ("facility_id",), "lookup"),
+    ("accident_chemicals_view", ("accident_month",), "range"),
+    ("accident_chemicals_view", ("quantity_released_lbs_num",), "range"),
+    ("accident_chemicals_view", ("percent_weight_num",), "range")
+]
+
+# (page, SQL) of the key page queries, as Datasette runs them; "?" stands for any value
+KEY_QUERIES = [
+    ("facility_view filtered by state", "SELECT * FROM facility_view WHERE state = ? ORDER BY epa_facility_id LIMIT 101"),
+    ("facility_view county facet within a state",
+     "SELECT county AS value, count(*) AS count FROM (SELECT * FROM facility_view WHERE state = ?) "
+     "WHERE county IS NOT NULL GROUP BY county ORDER BY count DESC, value LIMIT 31"),
+    ("facility_view filtered by county", "SELECT * FROM facility_view WHERE county = ? ORDER BY epa_facility_id LIMIT 101"),
+    ("facility_view filtered by NAICS codes", "SELECT * FROM facility_view WHERE naics_codes = ? ORDER BY epa_facility_id LIMIT 101"),
+    ("facility_view sorted by name", "SELECT * FROM facility_view ORDER BY facility_name LIMIT 101"),
+    ("facility_view received since a month",
+     "SELECT * FROM facility_view WHERE receipt_month >= ? ORDER BY receipt_month, epa_facility_id LIMIT 101"),
+    ("facility_accidents_view filtered by state", "SELECT * FROM facility_accidents_view WHERE state = ? ORDER BY id LIMIT 101"),
+    ("facility_accidents_view filtered by date", "SELECT * FROM facility_accidents_view WHERE date_of_accident = ? ORDER BY id LIMIT 101"),
+    ("facility_accidents_view sorted by date", "SELECT * FROM facility_accidents_view ORDER BY date_of_accident DESC, id DESC LIMIT 101"),
+    ("facility_accidents_view accidents per year",
+     "SELECT substr(accident_month, 1, 4) AS year, count(*) AS count FROM facility_accidents_view "
+     "WHERE accident_month >= ? GROUP BY year ORDER BY year"),
+    ("facility_accidents_view longest releases",
+     "SELECT * FROM facility_accidents_view WHERE release_duration_minutes >= ? ORDER BY release_duration_minutes DESC LIMIT 101"),
+    ("facility_accidents_view filtered by NAICS code", "SELECT * FROM facility_accidents_view WHERE naics_code = ? ORDER BY id LIMIT 101"),
+    ("facility_accidents_view accidents of a facility", "SELECT * FROM facility_accidents_view WHERE facility_id = ? ORDER BY id LIMIT 101"),
+    ("facility_accidents_view by facility accident ID", "SELECT * FROM facility_accidents_view WHERE facility_accident_id = ?"),
+    ("accident_chemicals_view filtered by state", "SELECT * FROM accident_chemicals_view WHERE state = ? ORDER BY accident_chemical_id LIMIT 101"),
+    ("accident_chemicals_view filtered by chemical",
+     "SELECT * FROM accident_chemicals_view WHERE chemical_name = ? ORDER BY accident_chemical_id LIMIT 101"),
+    ("accident_chemicals_view sorted by date",
+     "SELECT * FROM accident_chemicals_view ORDER BY date_of_accident DESC, accident_chemical_id DESC LIMIT 101"),
+    ("accident_chemicals_view largest releases since a month",
+     "SELECT * FROM accident_chemicals_view WHERE accident_month >= ? ORDER BY quantity_released_lbs_num DESC LIMIT 101"),
+    ("accident_chemicals_view releases over a quantity",
+     "SELECT * FROM accident_chemicals_view WHERE quantity_released_lbs_num > ? ORDER BY quantity_released_lbs_num DESC LIMIT 101"),
+    ("accident_chemicals_view releases by percent weight",
+     "SELECT * FROM accident_chemicals_view WHERE percent_weight_num BETWEEN ? AND ? ORDER BY accident_chemical_id LIMIT 101"),
+    ("accident_chemicals_view chemicals of an accident", "SELECT * FROM accident_chemicals_view WHERE accident_id = ? ORDER BY accident_chemical_id"),
+    ("rmp_facility row: chemicals", "SELECT count(*) FROM rmp_facility_chemicals WHERE facility_id = ?"),
+    ("rmp_facility row: NAICS codes", "SELECT count(*) FROM rmp_facility_naics WHERE facility_id = ?"),
+    ("rmp_facility row: accidents", "SELECT count(*) FROM rmp_facility_accidents WHERE facility_id = ?"),
+    ("rmp_chemical row: facilities", "SELECT count(*) FROM rmp_facility_chemicals WHERE chemical_id = ?"),
+    ("rmp_chemical row: accident releases", "SELECT count(*) FROM rmp_accident_chemicals WHERE chemical_id = ?"),
+    ("rmp_naics row: facilities", "SELECT count(*) FROM rmp_facility_naics WHERE naics_code = ?"),
+    ("rmp_naics row: accidents", "SELECT count(*) FROM rmp_facility_accidents WHERE naics_code = ?"),
+    ("rmp_facility_accidents row: chemicals", "SELECT count(*) FROM rmp_accident_chemicals WHERE facility_accident_id = ?")
+]
+
+# A step of a query plan that reads a whole table: "SCAN facility_view" (older SQLite: "SCAN TABLE facility_view"),
+# as opposed to "SCAN facility_view USING COVERING INDEX ..." or "SEARCH facility_view USING INDEX ..."
+full_scan_pattern = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+
+
+# Function to get the name of an index of the plan
+def index_name(table, columns):
+    return f"idx_{table}_{'_'.join(columns)}"
+
+# Function to list the tables (and materialized views) of a database
+def existing_tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+# Function to list the columns of a table
+def table_columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+# Function to create the indexes of the plan on the tables that exist (or only on some of them), skipping
+# columns a table doesn't have yet (views built before they were added); returns the names of the indexes
+# of the plan on those tables
+def apply_index_plan(conn, tables=None, plan=INDEX_PLAN):
+    existing = existing_tables(conn)
+    created = []
+    for table, columns, _ in plan:
+        if table not in existing or (tables is not None and table not in tables):
+            continue
+        if not set(columns) <= table_columns(conn, table):
+            continue
+        name = index_name(table, columns)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(columns)});")
+        created.append(name)
+    conn.commit()
+    return created
+
+# Function to get the tables a query reads
+def query_tables(sql):
+    return set(re.findall(r"\bFROM (\w+)", sql))
+
+# Function to run EXPLAIN QUERY PLAN on the key queries whose tables exist;
+# returns (page, SQL, full scan steps) of each query that reads a whole table, or (page, SQL, [error]) of
+# each query that fails, e.g. on a column missing from a view built by an older version
+def check_query_plans(conn, queries=KEY_QUERIES):
+    tables = existing_tables(conn)
+    failures = []
+    for page, sql in queries:
+        if not query_tables(sql) <= tables:
+            continue
+        try:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", [None] * sql.count("?")).fetchall()
+        except sqlite3.OperationalError as e:
+            failures.append((page, sql, [f"query failed: {e}"]))
+            continue
+        scans = [row[-1] for row in plan if full_scan_pattern.match(row[-1])]
+        if scans:
+            failures.append((page, sql, scans))
+    return failures
+
+# Function to print the key queries that scan a whole table or fail
+def print_failures(failures):
+    for page, sql, steps in failures:
+        print(f"Key page query '{page}': {'; '.join(steps)}\n    {sql}")
+
+# Function to apply the plan, refresh the planner statistics and fail when a key query scans a whole table
+def apply_and_check(conn):
+    created = apply_index_plan(conn)
+    print(f"Index plan applied: {len(created)} indexes.")
+    conn.execute("ANALYZE;")
+    conn.commit()
+    failures = check_query_plans(conn)
+    print_failures(failures)
+    if failures:
+        raise RuntimeError(f"{len(failures)} key page queries scan a whole table or fail; add an index for them to rmp_indexes.INDEX_PLAN "
+                           "or rebuild the views")
+    print("Query plans checked: every key page query uses an index.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check (and apply) the index plan of risk-management-plans.db.")
+    parser.add_argument("db_file", help="Database to check, e.g. rmp/risk-management-plans.db")
+    parser.add_argument("--apply", action="store_true", help="Create the missing indexes of the plan and run ANALYZE before checking")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_file)
+    if args.apply:
+        print(f"Index plan applied: {len(apply_index_plan(conn))} indexes.")
+        conn.execute("ANALYZE;")
+        conn.commit()
+    failures = check_query_plans(conn)
+    conn.close()
+    print_failures(failures)
+    if failures:
+        sys.exit(1)
+    print("Query plans checked: every key page query uses an index.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Atomic publishing of risk-management-plans.db.
+
+The build scripts used to drop and recreate the tables of the served database in
+place, so Datasette could see missing tables or half-filled views while they ran.
+Instead they now build into a staging file next to the database (on the same file
+system, so the rename below is atomic), and publish it when it's done:
+
+    staging = rmp_publish.start_staging(db_file)   # copy_from=db_file to start from the current database
+    ... build into staging ...
+    rmp_publish.publish(staging, db_file)
+
+publish() runs ANALYZE, VACUUM, PRAGMA integrity_check and the FTS5 integrity-check of
+every full-text index (which also compares the index with the view it indexes) on the
+staging file, and only then renames it over the database. A reader sees either the old file or the new one,
+never a mix; the connections it already has keep reading the old file until they are
+closed. rmp/plugins/swap_database.py makes the Datasette processes switch to the new
+file on their next requests, without a restart.
+
+The scrapers' --sqlite output only has new base tables, so they don't publish it: they
+leave it in scraped_path(db_file), a copy of the database with the six scraped tables
+replaced, and the build scripts start from that file when it's there, build the views
+and full-text indexes on it and publish the result.
+
+A database built elsewhere is published the same way:
+
+    python rmp_publish.py build/risk-management-plans.db /data/risk-management-plans.db
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+
+# Function to get the staging file a database is built in before it is published
+def staging_path(db_file):
+    return f"{db_file}.staging"
+
+# Function to get the file the scrapers' --sqlite tables wait in until a build script finishes and publishes them
+def scraped_path(db_file):
+    return f"{db_file}.scraped"
+
+# Function to get the database a build starts from: the scrapers' output when there is one, else the database itself
+def build_source(db_file):
+    scraped = scraped_path(db_file)
+    return scraped if os.path.exists(scraped) else db_file
+
+# Function to start a fresh staging file for a database, empty or as a copy of another database (e.g. the current one)
+def start_staging(db_file, copy_from=None):
+    staging = staging_path(db_file)
+    for path in (staging, f"{staging}-journal"):
+        if os.path.exists(path):
+            os.remove(path)  # Left over from a build that failed
+    if copy_from is not None and os.path.exists(copy_from):
+        source = sqlite3.connect(copy_from)
+        target = sqlite3.connect(staging)
+        source.backup(target)  # A consistent copy, even while the database is being read
+        target.close()
+        source.close()
+    return staging
+
+# Function to flush a file or a directory (the entries in it) to disk, on POSIX
+def fsync_path(path):
+    flags = (os.O_RDONLY | getattr(os, "O_DIRECTORY", 0)) if os.path.isdir(path) else os.O_RDONLY
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# Function to list the FTS5 tables of a database
+def fts5_tables(conn):
+    return [name for name, sql in conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL TABLE%'")
+            if "fts5" in sql.lower()]
+
+# Function to check a database: PRAGMA integrity_check, then each full-text index against its content;
+# returns the problems found, none when it's sound
+def integrity_problems(conn):
+    problems = [row[0] for row in conn.execute("PRAGMA integrity_check;")]
+    problems = [] if problems == ["ok"] else problems
+    for fts_table in fts5_tables(conn):
+        try:
+            # rank = 1 also checks that the index matches the rows of its external content table
+            conn.execute(f"INSERT INTO {fts_table}({fts_table}, rank) VALUES('integrity-check', 1);")
+        except sqlite3.DatabaseError as e:
+            problems.append(f"{fts_table}: {e}")
+    return problems
+
+# Function to optimize and check a staging file, then rename it over the database; raises sqlite3.DatabaseError
+# (and leaves the published database alone) when the integrity check fails
+def publish(staging, db_file, vacuum=True):
+    start = time.time()
+    conn = sqlite3.connect(staging)
+    try:
+        conn.execute("PRAGMA journal_mode = DELETE;")  # A single file: no WAL to carry along with it
+        conn.execute("ANALYZE;")
+        conn.commit()
+        if vacuum:
+            conn.execute("VACUUM;")
+        problems = integrity_problems(conn)
+        if problems:
+            for problem in problems[:10]:
+                print(f"Integrity check: {problem}")
+            raise sqlite3.DatabaseError(f"{staging} failed the integrity check; {db_file} was not replaced")
+    finally:
+        conn.close()
+    if os.name == "posix":
+        fsync_path(staging)
+    os.replace(staging, db_file)
+    if os.name == "posix":
+        fsync_path(os.path.dirname(os.path.abspath(db_file)))  # Make the rename itself durable
+    print(f"Published {db_file} ({os.path.getsize(db_file) / 1e6:.1f} MB) in {time.time() - start:.2f} seconds.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a built risk-management-plans.db and atomically replace the served one with it.")
+    parser.add_argument("built_db", help="The newly built database")
+    parser.add_argument("db_file", help="The served database to replace, e.g. /data/risk-management-plans.db")
+    parser.add_argument("--no-vacuum", action="store_true", help="Skip the VACUUM (the built database is already compact)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.built_db):
+        parser.error(f"{args.built_db} not found")
+    # Copied next to the served database first, so the final rename stays on one file system
+    staging = start_staging(args.db_file, copy_from=args.built_db)
+    publish(staging, args.db_file, vacuum=not args.no_vacuum)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Schema of the base tables of risk-management-plans.db.
+
+Shared by create_sqlite_rmp_db_from_csv.py, which builds the database, and the
+scrapers' SQLite sink (scraper_sinks.SqliteSink), which writes the six scraped
+tables straight into it.
+"""
+import re
+
+# CREATE TABLE statement of each base table, parents before children
+TABLE_SCHEMAS = {
+    "rmp_facility": """
+    CREATE TABLE rmp_facility (
+        epa_facility_id TEXT PRIMARY KEY,
+        report TEXT,
+        facility_name TEXT,
+        facility_address TEXT,
+        city TEXT,
+        state TEXT,
+        county TEXT,
+        zip TEXT,
+        facility_duns TEXT,
+        latitude REAL,
+        longitude REAL,
+        receipt_date TEXT,
+        report_created_date TEXT
+    );""",
+    "rmp_chemical": """
+    CREATE TABLE rmp_chemical (
+        chemical_id INTEGER PRIMARY KEY,
+        chemical_name TEXT,
+        cas_number TEXT,
+        flammable_toxic TEXT
+    );""",
+    "rmp_facility_chemicals": """
+    CREATE TABLE rmp_facility_chemicals (
+        facility_chemical_id INTEGER PRIMARY KEY,
+        facility_id TEXT,
+        chemical_id INTEGER,
+        program_level TEXT,
+        FOREIGN KEY (facility_id) REFERENCES rmp_facility(epa_facility_id),
+        FOREIGN KEY (chemical_id) REFERENCES rmp_chemical(chemical_id)
+    );""",
+    "rmp_naics": """
+    CREATE TABLE rmp_naics (
+        naics_code TEXT PRIMARY KEY,
+        naics_description TEXT
+    );""",
+    "rmp_facility_naics": """
+    CREATE TABLE rmp_facility_naics (
+        facility_naics_id INTEGER PRIMARY KEY,
+        facility_id TEXT,
+        naics_code TEXT,
+        FOREIGN KEY (facility_id) REFERENCES rmp_facility(epa_facility_id),
+        FOREIGN KEY (naics_code) REFERENCES rmp_naics(naics_code)
+    );""",
+    "rmp_facility_accidents": """
+    CREATE TABLE rmp_facility_accidents (
+        facility_accident_id TEXT PRIMARY KEY,
+        accident_id TEXT,
+        facility_id TEXT,
+        date_of_accident TEXT,
+        time_accident_began TEXT,
+        release_duration TEXT,
+        naics_code TEXT,
+        FOREIGN KEY (facility_id) REFERENCES rmp_facility(epa_facility_id),
+        FOREIGN KEY (naics_code) REFERENCES rmp_naics(naics_code)
+    );""",
+    "rmp_accident_chemicals": """
+    CREATE TABLE rmp_accident_chemicals (
+        accident_chemical_id INTEGER PRIMARY KEY,
+        facility_accident_chemical_id TEXT,
+        facility_accident_id TEXT,
+        quantity_released_lbs TEXT,
+        percent_weight TEXT,
+        chemical_id INTEGER,
+        FOREIGN KEY (facility_accident_id) REFERENCES rmp_facility_accidents(facility_accident_id),
+        FOREIGN KEY (chemical_id) REFERENCES rmp_chemical(chemical_id)
+    );"""
+}
+
+# A column definition line of a CREATE TABLE statement, e.g. "chemical_id INTEGER PRIMARY KEY,"
+column_pattern = re.compile(r"^\s+(\w+) (TEXT|INTEGER|REAL)\b", re.MULTILINE)
+
+
+# Function to list the (column, SQL type) pairs of a base table, in column order
+def table_columns(table):
+    return column_pattern.findall(TABLE_SCHEMAS[table])
+
+# Function to drop and recreate some base tables (children are dropped before their parents)
+def recreate_tables(conn, tables):
+    tables = [table for table in TABLE_SCHEMAS if table in tables]
+    for table in reversed(tables):
+        conn.execute(f"DROP TABLE IF EXISTS {table};")
+    for table in tables:
+        conn.execute(TABLE_SCHEMAS[table])
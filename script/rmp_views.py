@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+"""
+Materialized views of risk-management-plans.db, and their full-text indexes.
+
+facility_view, facility_accidents_view and accident_chemicals_view are tables built
+from the base tables, shared by create_sqlite_rmp_db_from_csv.py and
+create_sqlite_views_and_fts_tables.py. They are built set-based: the NAICS codes and
+chemical names of every facility are collected once, in one pass over each junction
+table, into the temporary table facility_lists, which the views join in by facility
+ID. Previously both lists were looked up again with correlated subqueries for every
+facility and every accident, and each INSERT was wrapped in a GROUP BY over all of
+its columns, which sorted the rows without merging any (every view row comes from one
+row of a table with a primary key).
+
+The rows are the same as before, in the same order:
+- each list keeps the first occurrence of every value, in junction row order
+  (facility_naics_id, facility_chemical_id), as the subqueries read them;
+- facility_view and facility_accidents_view are filled in the order the GROUP BY
+  sorted them (epa_facility_id, facility_accident_id), so the rowids, and the id
+  column of facility_accidents_view, are unchanged.
+
+A small update of the archive doesn't need the views rebuilt: refresh_facilities
+replaces only the rows of the given facilities, in the views and in their full-text
+indexes (FTS_TABLES), which are told about every row removed and added. It can also
+take their base table rows from another database (the scrapers' --sqlite output), in
+the same transaction, so it runs on the served database itself: readers see the rows
+before or after the refresh, never in between.
+
+The dates, durations and quantities are text as scraped ("August 2016", "000 Hours 05
+Minutes", "4034", "N/A"), which sorts lexically and can't be range filtered. Each view
+also has typed companion columns, filled by the SQL functions of register_functions
+and indexed by the index plan: accident_month and receipt_month as ISO year-months
+("2016-08"), release_duration_minutes, and quantity_released_lbs_num and
+percent_weight_num as REAL numbers (NULL for "N/A"). "The largest releases since 2015" is
+
+    SELECT * FROM accident_chemicals_view WHERE accident_month >= '2015-01'
+    ORDER BY quantity_released_lbs_num DESC
+
+The lists are collected in Python rather than with GROUP_CONCAT: the SQLite we build
+with can't order the values inside GROUP_CONCAT, nor take DISTINCT with a separator.
+"""
+import math
+import re
+import time
+import rmp_schema
+
+# CREATE TABLE statement of each materialized view, in build order
+VIEW_SCHEMAS = {
+    "facility_view": """
+    CREATE TABLE facility_view (
+        epa_facility_id TEXT PRIMARY KEY,
+        report TEXT,
+        facility_name TEXT,
+        facility_address TEXT,
+        city TEXT,
+        state TEXT,
+        county TEXT,
+        zip TEXT,
+        facility_duns TEXT,
+        receipt_date TEXT,
+        report_created_date TEXT,
+        naics_codes TEXT,
+        chemical_names TEXT,
+        latitude REAL,
+        longitude REAL,
+        receipt_month TEXT
+    );""",
+    "facility_accidents_view": """
+    CREATE TABLE facility_accidents_view (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        facility_accident_id TEXT,
+        accident_id TEXT,
+        facility_id TEXT,
+        facility_name TEXT,
+        facility_address TEXT,
+        city TEXT,
+        state TEXT,
+        county TEXT,
+        date_of_accident TEXT,
+        time_accident_began TEXT,
+        release_duration TEXT,
+        naics_code TEXT,
+        chemical_names TEXT,
+        latitude REAL,
+        longitude REAL,
+        accident_month TEXT,
+        release_duration_minutes INTEGER
+    );""",
+    "accident_chemicals_view": """
+    CREATE TABLE accident_chemicals_view (
+        accident_chemical_id INTEGER PRIMARY KEY,
+        accident_id TEXT,
+        facility_id TEXT,
+        facility_name TEXT,
+        facility_address TEXT,
+        city TEXT,
+        state TEXT,
+        county TEXT,
+        date_of_accident TEXT,
+        chemical_name TEXT,
+        quantity_released_lbs TEXT,
+        percent_weight TEXT,
+        accident_month TEXT,
+        quantity_released_lbs_num REAL,
+        percent_weight_num REAL
+    );"""
+}
+
+# Temporary table of the NAICS codes and chemical names of each facility, filled by build_facility_lists
+FACILITY_LISTS_SCHEMA = """
+CREATE TEMP TABLE facility_lists (
+    facility_id TEXT PRIMARY KEY,
+    naics_codes TEXT,
+    chemical_names TEXT
+);"""
+
+# INSERT statement filling each materialized view from the base tables and the facility lists. {where} restricts
+# the rows to some facilities; {previous_id} gives a refreshed accident back its id (NULL assigns a new one)
+VIEW_QUERIES = {
+    "facility_view": """
+    INSERT INTO facility_view
+    SELECT
+        rf.epa_facility_id,
+        rf.report,
+        rf.facility_name,
+        rf.facility_address,
+        rf.city,
+        rf.state,
+        rf.county,
+        rf.zip,
+        rf.facility_duns,
+        rf.receipt_date,
+        rf.report_created_date,
+        fl.naics_codes,
+        fl.chemical_names,
+        rf.latitude,
+        rf.longitude,
+        iso_month(rf.receipt_date)
+    FROM rmp_facility rf
+    LEFT JOIN facility_lists fl ON fl.facility_id = rf.epa_facility_id
+    {where}
+    ORDER BY rf.epa_facility_id;""",
+    "facility_accidents_view": """
+    INSERT INTO facility_accidents_view (
+        id,
+        facility_accident_id,
+        accident_id,
+        facility_id,
+        facility_name,
+        facility_address,
+        city,
+        state,
+        county,
+        date_of_accident,
+        time_accident_began,
+        release_duration,
+        naics_code,
+        chemical_names,
+        latitude,
+        longitude,
+        accident_month,
+        release_duration_minutes
+    )
+    SELECT
+        {previous_id},
+        rfa.facility_accident_id,
+        rfa.accident_id,
+        rfa.facility_id,
+        rf.facility_name,
+        rf.facility_address,
+        rf.city,
+        rf.state,
+        rf.county,
+        rfa.date_of_accident,
+        rfa.time_accident_began,
+        rfa.release_duration,
+        rfa.naics_code,
+        fl.chemical_names,
+        rf.latitude,
+        rf.longitude,
+        iso_month(rfa.date_of_accident),
+        duration_minutes(rfa.release_duration)
+    FROM rmp_facility_accidents rfa
+    JOIN rmp_facility rf ON rfa.facility_id = rf.epa_facility_id
+    LEFT JOIN facility_lists fl ON fl.facility_id = rfa.facility_id
+    {where}
+    ORDER BY rfa.facility_accident_id;""",
+    "accident_chemicals_view": """
+    INSERT INTO accident_chemicals_view
+    SELECT
+        rac.accident_chemical_id,
+        rfa.accident_id,
+        rfa.facility_id,
+        rf.facility_name,
+        rf.facility_address,
+        rf.city,
+        rf.state,
+        rf.county,
+        rfa.date_of_accident,
+        rc.chemical_name,
+        rac.quantity_released_lbs,
+        rac.percent_weight,
+        iso_month(rfa.date_of_accident),
+        to_number(rac.quantity_released_lbs),
+        to_number(rac.percent_weight)
+    FROM rmp_accident_chemicals rac
+    LEFT JOIN rmp_facility_accidents rfa ON rac.facility_accident_id = rfa.facility_accident_id
+    LEFT JOIN rmp_facility rf ON rfa.facility_id = rf.epa_facility_id
+    LEFT JOIN rmp_chemical rc ON rac.chemical_id = rc.chemical_id
+    {where};"""
+}
+
+# Month names of the "Month YYYY" dates (date_of_accident; receipt_date, see convert_to_mm_yyyy), in English
+# whatever the locale
+month_numbers = {month: number for number, month in enumerate(
+    ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"], 1)}
+# A release duration, "000 Hours 05 Minutes"
+duration_pattern = re.compile(r"^\s*(?:(\d+)\s*hours?)?\s*(?:(\d+)\s*minutes?)?\s*$", re.IGNORECASE)
+
+# Accidents of the facilities being refreshed (see refresh_facilities)
+refreshed_accidents = ("SELECT facility_accident_id FROM rmp_facility_accidents "
+                       "WHERE facility_id IN (SELECT facility_id FROM refresh_facilities)")
+
+# Rows of each view that belong to the facilities being refreshed: (in VIEW_QUERIES, in the view)
+REFRESH_CONDITIONS = {
+    "facility_view": ("rf.epa_facility_id IN (SELECT facility_id FROM refresh_facilities)",
+                      "epa_facility_id IN (SELECT facility_id FROM refresh_facilities)"),
+    "facility_accidents_view": ("rfa.facility_id IN (SELECT facility_id FROM refresh_facilities)",
+                                "facility_id IN (SELECT facility_id FROM refresh_facilities)"),
+    "accident_chemicals_view": (f"rac.facility_accident_id IN ({refreshed_accidents})",
+                                "facility_id IN (SELECT facility_id FROM refresh_facilities)")
+}
+
+# Full-text index of each view: (view, rowid column, indexed columns). External content tables: the text
+# is read from the view, and the index itself is kept up to date by the build (see refresh_facilities)
+FTS_TABLES = {
+    "accident_chemicals_fts": ("accident_chemicals_view", "accident_chemical_id", [
+        "accident_id", "facility_id", "facility_name", "facility_address", "city", "state", "county",
+        "date_of_accident", "chemical_name", "quantity_released_lbs", "percent_weight"]),
+    "facility_accidents_fts": ("facility_accidents_view", "id", [
+        "facility_accident_id", "accident_id", "facility_id", "facility_name", "facility_address", "city", "state", "county",
+        "date_of_accident", "time_accident_began", "release_duration", "naics_code", "chemical_names"])
+}
+
+
+# Function to convert a "Month YYYY" date to an ISO year-month, "2016-08", which sorts and range filters
+# as a date; None when it isn't one
+def iso_month(text):
+    if text is None:
+        return None
+    parts = str(text).split()
+    if len(parts) != 2 or parts[0].capitalize() not in month_numbers or not parts[1].isdigit():
+        return None
+    return f"{int(parts[1]):04d}-{month_numbers[parts[0].capitalize()]:02d}"
+
+# Function to convert a release duration, "000 Hours 05 Minutes", to minutes; None when it isn't one
+def duration_minutes(text):
+    match = duration_pattern.match(str(text)) if text is not None else None
+    if not match or match.group(1) is None and match.group(2) is None:
+        return None
+    return int(match.group(1) or 0) * 60 + int(match.group(2) or 0)
+
+# Function to convert a quantity or percentage kept as text ("4034", "1,200", "2.5", "N/A") to a number;
+# None when it isn't one
+def to_number(text):
+    if text is None:
+        return None
+    try:
+        number = float(text) if isinstance(text, (int, float)) else float(str(text).strip().replace(",", ""))
+    except ValueError:
+        return None
+    if not math.isfinite(number):
+        return None
+    return number
+
+# Function to register the conversions the view queries fill the typed columns with
+def register_functions(conn):
+    for function in (iso_month, duration_minutes, to_number):
+        conn.create_function(function.__name__, 1, function, deterministic=True)
+
+# Function to collect the distinct values of each facility from (facility_id, value) rows, in row order
+def distinct_values(rows):
+    values = {}
+    for facility_id, value in rows:
+        if facility_id is not None and value is not None:
+            values.setdefault(facility_id, {})[value] = None  # A dict keeps the first occurrence, in order
+    return values
+
+# Function to aggregate the NAICS codes and chemical names into the temporary table facility_lists,
+# of every facility or only of those in temp.refresh_facilities
+def build_facility_lists(conn, refresh=False):
+    where = " WHERE facility_id IN (SELECT facility_id FROM temp.refresh_facilities)" if refresh else ""
+    naics = distinct_values(conn.execute(f"SELECT facility_id, naics_code FROM rmp_facility_naics{where} ORDER BY facility_naics_id"))
+    chemical_names = dict(conn.execute("SELECT chemical_id, chemical_name FROM rmp_chemical"))
+    chemicals = distinct_values((facility_id, chemical_names.get(chemical_id)) for facility_id, chemical_id
+                                in conn.execute(f"SELECT facility_id, chemical_id FROM rmp_facility_chemicals{where} ORDER BY facility_chemical_id"))
+    conn.execute("DROP TABLE IF EXISTS temp.facility_lists;")
+    conn.execute(FACILITY_LISTS_SCHEMA)
+    conn.executemany("INSERT INTO facility_lists VALUES (?, ?, ?)",
+                     ((facility_id,
+                       ",".join(map(str, naics[facility_id])) if facility_id in naics else None,
+                       ", ".join(map(str, chemicals[facility_id])) if facility_id in chemicals else None)
+                      for facility_id in naics.keys() | chemicals.keys()))
+
+# Function to drop, recreate and fill the materialized views
+def materialize_views(conn, views=VIEW_SCHEMAS):
+    start = time.time()
+    register_functions(conn)
+    build_facility_lists(conn)
+    for view in views:
+        conn.execute(f"DROP TABLE IF EXISTS {view};")
+        conn.execute(VIEW_SCHEMAS[view])
+        conn.execute(VIEW_QUERIES[view].format(where="", previous_id="NULL"))
+        conn.commit()
+        print(f"{view} table created successfully.")
+    conn.execute("DROP TABLE temp.facility_lists;")
+    print(f"Materialized {len(views)} views in {time.time() - start:.2f} seconds.")
+
+# Function to drop, recreate and fill a full-text index from its view
+def create_fts_table(conn, fts_table):
+    view, rowid_column, columns = FTS_TABLES[fts_table]
+    conn.execute(f"DROP TABLE IF EXISTS {fts_table};")
+    conn.execute(f"""
+    CREATE VIRTUAL TABLE {fts_table} USING fts5(
+        {', '.join(columns)},
+        content='{view}',
+        content_rowid='{rowid_column}',
+        tokenize='unicode61'
+    );""")
+    conn.execute(f"INSERT INTO {fts_table} (rowid, {', '.join(columns)}) SELECT {rowid_column}, {', '.join(columns)} FROM {view};")
+    conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES('optimize');")
+    conn.commit()
+    print(f"{fts_table} full-text search table created and populated successfully.")
+
+# Function to remove the rows of a view matching a condition from its full-text indexes. External content
+# tables don't see the view change, so each row is deleted with the values it was indexed with, before the
+# view row itself is deleted or updated
+def delete_from_fts(conn, view, condition):
+    for fts_table, (fts_view, rowid_column, columns) in FTS_TABLES.items():
+        if fts_view == view:
+            conn.execute(f"INSERT INTO {fts_table} ({fts_table}, rowid, {', '.join(columns)}) "
+                         f"SELECT 'delete', {rowid_column}, {', '.join(columns)} FROM {view} WHERE {condition};")
+
+# Function to add the rows of a view matching a condition to its full-text indexes
+def insert_into_fts(conn, view, condition):
+    for fts_table, (fts_view, rowid_column, columns) in FTS_TABLES.items():
+        if fts_view == view:
+            conn.execute(f"INSERT INTO {fts_table} (rowid, {', '.join(columns)}) "
+                         f"SELECT {rowid_column}, {', '.join(columns)} FROM {view} WHERE {condition};")
+
+# Function to replace the scraped base table rows of the facilities in temp.refresh_facilities with those of the
+# attached database source. The chemicals and NAICS codes are shared by all the facilities: they are all copied
+def copy_facility_rows(conn, source):
+    def copy(table, condition):
+        columns = ", ".join(column for column, _ in rmp_schema.table_columns(table))
+        return conn.execute(f"INSERT OR REPLACE INTO main.{table} ({columns}) SELECT {columns} FROM {source}.{table} WHERE {condition};").rowcount
+
+    refreshed = "facility_id IN (SELECT facility_id FROM temp.refresh_facilities)"
+    copied = {table: copy(table, "1") for table in ("rmp_chemical", "rmp_naics")}
+    conn.execute(f"DELETE FROM main.rmp_accident_chemicals WHERE facility_accident_id IN "
+                 f"(SELECT facility_accident_id FROM main.rmp_facility_accidents WHERE {refreshed});")
+    for table in ("rmp_facility_chemicals", "rmp_facility_naics", "rmp_facility_accidents"):
+        conn.execute(f"DELETE FROM main.{table} WHERE {refreshed};")
+        copied[table] = copy(table, refreshed)
+    copied["rmp_accident_chemicals"] = copy("rmp_accident_chemicals", "facility_accident_id IN "
+                                            f"(SELECT facility_accident_id FROM {source}.rmp_facility_accidents WHERE {refreshed})")
+    print("Copied " + ", ".join(f"{rows} {table}" for table, rows in copied.items()) + f" rows from {source}.")
+
+# Function to refresh the rows of the materialized views, and their full-text index entries, of some facilities
+# (e.g. those whose reports changed), in one transaction; a facility no longer in the base tables loses its rows.
+# With source_file, their base table rows are first replaced with those of that database, in the same transaction
+def refresh_facilities(conn, facility_ids, source_file=None):
+    start = time.time()
+    register_functions(conn)
+    if source_file is not None:
+        conn.execute("ATTACH DATABASE ? AS source;", (source_file,))  # Not allowed inside the transaction
+    conn.execute("DROP TABLE IF EXISTS temp.refresh_facilities;")
+    conn.execute("CREATE TEMP TABLE refresh_facilities (facility_id TEXT PRIMARY KEY);")
+    conn.executemany("INSERT OR IGNORE INTO refresh_facilities VALUES (?)", ((facility_id,) for facility_id in facility_ids))
+    if source_file is not None:
+        copy_facility_rows(conn, "source")
+    build_facility_lists(conn, refresh=True)
+    # Refreshed accidents keep their id, so the links to their rows keep working
+    conn.execute("DROP TABLE IF EXISTS temp.previous_accident_ids;")
+    conn.execute("CREATE TEMP TABLE previous_accident_ids AS SELECT facility_accident_id, id FROM facility_accidents_view "
+                 "WHERE facility_id IN (SELECT facility_id FROM refresh_facilities);")
+    conn.execute("CREATE INDEX temp.idx_previous_accident_ids ON previous_accident_ids(facility_accident_id);")
+    previous_id = "(SELECT id FROM previous_accident_ids p WHERE p.facility_accident_id = rfa.facility_accident_id)"
+
+    for view in VIEW_SCHEMAS:
+        source_condition, refreshed = REFRESH_CONDITIONS[view]
+        stale = refreshed
+        if view == "accident_chemicals_view":
+            # An accident chemical ID now scraped for one of the facilities may still be on another facility's row
+            stale += (" OR accident_chemical_id IN (SELECT accident_chemical_id FROM rmp_accident_chemicals "
+                      f"WHERE facility_accident_id IN ({refreshed_accidents}))")
+        delete_from_fts(conn, view, stale)
+        removed = conn.execute(f"DELETE FROM {view} WHERE {stale};").rowcount
+        added = conn.execute(VIEW_QUERIES[view].format(where=f"WHERE {source_condition}", previous_id=previous_id)).rowcount
+        insert_into_fts(conn, view, refreshed)
+        print(f"{view}: replaced {removed} rows with {added}.")
+    conn.commit()
+    facilities = conn.execute("SELECT count(*) FROM refresh_facilities").fetchone()[0]
+    for table in ("facility_lists", "previous_accident_ids", "refresh_facilities"):
+        conn.execute(f"DROP TABLE temp.{table};")
+    if source_file is not None:
+        conn.execute("DETACH DATABASE source;")
+    print(f"Refreshed the views of {facilities} facilities in {time.time() - start:.2f} seconds.")
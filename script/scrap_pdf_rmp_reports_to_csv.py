@@ -4,18 +4,36 @@ Created on Thu May  8 22:22:49 2025
 
 @author: MOGIC
 """
-import fitz  # PyMuPDF
 import glob
 import os
-import pandas as pd
 import time
 import logging
+import argparse
+import json
+import bisect
+from collections import Counter
+from multiprocessing import Pool
 from datetime import datetime
 import re
+import pdf_text_cache
+import scrape_logging
+from scrape_logging import event
+from scrape_manifest import ScrapeManifest
+from scrape_metrics import StageTimer, RunMetrics, ProgressLine
+from stable_ids import IdRegistry, seed_registry
+from scrape_watchdog import WatchdogPool, Quarantined
+from section_parser import SectionParser
+import pdf_prefetch
+import rmp_publish
+import scrape_shards
+import scraper_sinks
+from scrape_records import (ChemicalRow, FacilityChemicalRow, NaicsRow, FacilityNaicsRow, FacilityAccidentRow, AccidentChemicalRow,
+                            record_from_dict)
 
 # Set up logging
+log_file = "fac_acc_chem_log.txt"
 logging.basicConfig(
-    filename="fac_acc_chem_log.txt",
+    filename=log_file,
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
@@ -28,21 +46,34 @@ output_naics_file = "rmp_naics.csv"  # New file for unique NAICS codes
 output_facility_naics_file = "rmp_facility_naics.csv"  # Updated junction table
 output_accidents_file = "rmp_facility_accidents.csv"
 output_accident_chemicals_file = "rmp_accident_chemicals.csv"
+run_report_file = "rmp_scrape_run_report.json"  # Per-stage timings and throughput, see scrape_metrics.py
+text_cache_file = "pdf_text_cache.sqlite"  # Shared extracted-text cache, see pdf_text_cache.py
+page_bands_file = "page_bands.json"  # Header/footer bands written by calibrate_page_bands.py
+id_registry_file = "rmp_id_registry.sqlite"  # IDs handed out in earlier runs, see stable_ids.py
+quarantine_file = "rmp_quarantine.json"  # PDFs given up on by the watchdog (--doc-timeout / --doc-memory-mb)
+output_files = {
+    "rmp_chemical": output_chemicals_file,
+    "rmp_facility_chemicals": output_facility_chemicals_file,
+    "rmp_naics": output_naics_file,
+    "rmp_facility_naics": output_facility_naics_file,
+    "rmp_facility_accidents": output_accidents_file,
+    "rmp_accident_chemicals": output_accident_chemicals_file
+}
+sink_batch_size = 1000  # Rows buffered per table before they are written out
+sqlite_commit_rows = 100000  # Rows per transaction when writing straight into SQLite (--sqlite)
+parquet_row_group_rows = 100000  # Rows per row group of the Parquet files (--parquet)
+
+# Bump when a parse_* change should invalidate the results stored in the manifest
+PARSER_VERSION = 1
 
-# Initialize counters for unique IDs and statistics
-chemical_id_counter = 1
-facility_chemical_id_counter = 1
-naics_id_counter = 1
-facility_naics_id_counter = 1
-accident_chemical_id_counter = 1
-chemical_data = []  # For rmp_chemical.csv
-facility_chemicals_data = []  # For rmp_facility_chemicals.csv
-naics_data = []  # For rmp_naics.csv
-facility_naics_data = []  # For rmp_facility_naics.csv
-accidents_data = []
-accident_chemicals_data = []
-unique_chemicals = {}  # Track unique chemicals by cas_number
-unique_naics = {}  # Track unique NAICS codes by naics_code
+# Initialize the ID registry and statistics.
+# Only the merge stage touches these, so worker processes never need them.
+ids = IdRegistry()  # Content-derived row IDs; replaced by the persistent registry in main()
+sinks = {}  # Output sink per table, opened in main(); see scraper_sinks.py
+accident_chemical_ids = set()  # chemical_ids seen in accidents, for the summary
+unique_chemicals = {}  # ChemicalRow of each unique chemical by cas_number
+unique_naics = {}  # NaicsRow of each unique NAICS code by naics_code
+quarantine = []  # Watchdog records of the PDFs quarantined during this run, see scrape_watchdog.py
 stats = {
     "total_pdfs": 0,
     "successful_chemicals": 0,
@@ -53,14 +84,12 @@ stats = {
     "unique_accident_chemicals": 0,
     "skipped_pdfs": 0,
     "errors": 0,
+    "quarantined": 0,
     "facilities_with_accidents": 0,
     "start_time": time.time(),
     "pdf_times": []  # To track time per PDF
 }
 
-# Log script start
-logging.info("Starting the PDF scraping process")
-
 # Function to filter out header/footer lines
 def filter_header_footer(text):
     lines = text.splitlines()
@@ -74,28 +103,59 @@ def filter_header_footer(text):
         filtered_lines.append(line)
     return "\n".join(filtered_lines)
 
-# Function to extract text from PDF
-def extract_text_from_pdf(pdf_path):
+# Function to strip lines and drop blank ones, for text extracted with the header/footer bands
+# clipped away (see calibrate_page_bands.py); the parsers rely on this layout
+def normalize_lines(text):
+    return "\n".join(line for line in (line.strip() for line in text.splitlines()) if line)
+
+# Function to clean a section slice, filtering the header/footer lines only when they were not clipped
+def clean_section_text(text):
+    if pdf_text_cache.page_bands is None:
+        return filter_header_footer(text)
+    return normalize_lines(text)
+
+# Markers the parsers need, in document order. Once one of the last markers appears after
+# "Section 6. Accident History", nothing further in the PDF is used.
+needed_section_chain = [("Process Chemicals",), ("Process NAICS",), ("Section 6. Accident History",), ("Section 7", "Section 9. Emergency Response")]
+
+# Function to extract text from PDF.
+# Pages are streamed through a small state machine that follows needed_section_chain with the
+# same search offsets scrape_facility uses, and decoding stops after the page where the accident
+# history ends. Markers never contain a newline, so they can't be split across two pages.
+def extract_text_from_pdf(pdf_path, facility_id=None, data=None):
     start_time = time.time()
-    doc = fitz.open(pdf_path)
-    full_text = ""
-    for page in doc:
-        text = page.get_text("text")
-        if text:
-            full_text += text + "\n"
-    doc.close()
+    pages = []
+    stage = 0
+    for text in pdf_text_cache.iter_page_texts(pdf_path, data=data):
+        if not text:
+            continue
+        page = text + "\n"
+        pages.append(page)
+        offset = 0
+        while stage < len(needed_section_chain):
+            found = [pos for pos in (page.find(marker, offset) for marker in needed_section_chain[stage]) if pos != -1]
+            if not found:
+                break
+            offset = min(found)
+            if stage == 0:
+                offset += len("Process Chemicals")
+            stage += 1
+        if stage == len(needed_section_chain):
+            break
+    full_text = "".join(pages)
     end_time = time.time()
-    stats["pdf_times"].append(end_time - start_time)
-    logging.info(f"Extracted text from {pdf_path}, length: {len(full_text)} characters, time: {end_time - start_time:.2f} seconds")
-    return full_text
+    scrape_logging.detail(facility_id, "extracted", "Extracted text from %s, length: %d characters, pages: %d, time: %.2f seconds",
+                          pdf_path, len(full_text), len(pages), end_time - start_time, chars=len(full_text), pages=len(pages))
+    return full_text, end_time - start_time
 
-# Function to parse chemicals from text
-def parse_chemicals(text, facility_id, chemical_id_counter, facility_chemical_id_counter):
+# Function to parse chemicals from text.
+# IDs are assigned later by merge_facility_result, so this only returns the raw chemicals.
+def parse_chemicals(text, facility_id):
     chemicals = []
     current_chemical = {}
     current_key = None
     value_buffer = []
-    
+
     lines = text.splitlines()
     for line in lines:
         line = line.strip()
@@ -130,7 +190,7 @@ def parse_chemicals(text, facility_id, chemical_id_counter, facility_chemical_id
                 value_buffer = []
             current_key = "flammable_toxic"
             continue
-        
+
         if current_key:
             if "Flammable Mixture Chemical Components" in line:
                 continue
@@ -139,50 +199,22 @@ def parse_chemicals(text, facility_id, chemical_id_counter, facility_chemical_id
                 current_chemical[current_key] = " ".join(value_buffer).strip()
                 value_buffer = []
                 current_key = None
-    
+
     if current_key and value_buffer:
         current_chemical[current_key] = " ".join(value_buffer).strip()
     if current_chemical.get("chemical_name"):
         chemicals.append(current_chemical)
-    
-    # Process chemicals for rmp_chemical and rmp_facility_chemical
-    facility_chemicals_list = []
-    for chem in chemicals:
-        cas_number = chem["cas_number"]
-        chemical_name = chem["chemical_name"]
-        flammable_toxic = chem.get("flammable_toxic", None)
-        
-        # Add to rmp_chemical if not already present
-        if cas_number not in unique_chemicals:
-            unique_chemicals[cas_number] = {
-                "chemical_id": chemical_id_counter,
-                "chemical_name": chemical_name,
-                "cas_number": cas_number,
-                "flammable_toxic": flammable_toxic
-            }
-            chemical_data.append(unique_chemicals[cas_number])
-            chemical_id_counter += 1
-        
-        # Add to rmp_facility_chemical
-        facility_chemical_entry = {
-            "facility_chemical_id": facility_chemical_id_counter,
-            "facility_id": facility_id,
-            "chemical_id": unique_chemicals[cas_number]["chemical_id"],
-            "program_level": chem.get("program_level", None)
-        }
-        facility_chemicals_list.append(facility_chemical_entry)
-        facility_chemical_id_counter += 1
-    
-    logging.info(f"Parsed chemicals for {facility_id}: {len(facility_chemicals_list)} chemicals, sample: {facility_chemicals_list[:1]}")
-    return facility_chemicals_list, chemical_id_counter, facility_chemical_id_counter
+
+    scrape_logging.detail(facility_id, "chemicals", "Parsed chemicals for %s: %s", facility_id, chemicals, count=len(chemicals))
+    return chemicals
 
 # Function to parse NAICS from text
-def parse_naics(text, facility_id, facility_naics_id_counter):
+def parse_naics(text, facility_id):
     naics = []
     current_naics = {}
     current_key = None
     value_buffer = []
-    
+
     lines = text.splitlines()
     for line in lines:
         line = line.strip()
@@ -205,100 +237,59 @@ def parse_naics(text, facility_id, facility_naics_id_counter):
                 value_buffer = []
             current_key = "naics_description"
             continue
-        
+
         if current_key:
             value_buffer.append(line)
-    
+
     if current_key == "naics_description" and value_buffer:
         current_naics["naics_description"] = " ".join(value_buffer).strip()
     if current_naics.get("naics_code"):
         naics.append(current_naics)
-    
-    # Process NAICS for rmp_naics and rmp_facility_naics
-    facility_naics_list = []
-    for n in naics:
-        naics_code = n["naics_code"]
-        naics_description = n["naics_description"]
-        
-        # Add to rmp_naics if not already present
-        if naics_code not in unique_naics:
-            unique_naics[naics_code] = {
-                "naics_code": naics_code,
-                "naics_description": naics_description
-            }
-            naics_data.append(unique_naics[naics_code])
-        
-        # Add to rmp_facility_naics
-        facility_naics_entry = {
-            "facility_naics_id": facility_naics_id_counter,
-            "facility_id": facility_id,
-            "naics_code": naics_code
-        }
-        facility_naics_list.append(facility_naics_entry)
-        facility_naics_id_counter += 1
-    
-    logging.info(f"Parsed NAICS for {facility_id}: {len(facility_naics_list)} NAICS entries, sample: {facility_naics_list[:1]}")
-    return facility_naics_list, facility_naics_id_counter
 
-# Updated Function to parse accidents from text
+    scrape_logging.detail(facility_id, "naics", "Parsed NAICS for %s: %s", facility_id, naics, count=len(naics))
+    return naics
+
+# Declarative table of the accident fields parse_accidents reads: (column(s), label, value pattern, required).
+# The labels and patterns are those of ACCIDENT_FIELDS in scrap_accidents_details_to_csv.py.
+ACCIDENT_HISTORY_FIELDS = [
+    ("date_of_accident", "Date of Accident:", r"([A-Za-z]+\s*\d{4})", False),
+    ("time_accident_began", "Time Accident Began (HH:MM):", r"(\d{2}:\d{2})", False),
+    ("naics_code", "NAICS Code of Process Involved:", r"(\d+)", False),
+    ("naics_description", "NAICS Description:", r"(.+)", False),
+    (("release_hours", "release_minutes"), "Release Duration:", r"(\d{3})\s*Hours\s*(\d{2})\s*Minutes", False),
+]
+accident_history_parser = SectionParser(ACCIDENT_HISTORY_FIELDS, header=("accident_number", "Accident History ID:", r" Accident (\d+)"))
+
+# Function to parse accidents from text
 def parse_accidents(text, facility_id):
     accidents = []
-    accident_blocks = re.finditer(r"Accident History ID: Accident \d+([\s\S]*?)(?=Accident History ID: Accident \d+|\Z)", text, re.IGNORECASE)
-    accident_count = 0
-    
-    for block in accident_blocks:
-        accident_count += 1
-        block_text = block.group(0)
-        current_accident = {}
-        
-        # Extract Accident ID
-        accident_id_match = re.search(r"Accident History ID: Accident (\d+)", block_text, re.IGNORECASE)
-        if accident_id_match:
-            accident_number = accident_id_match.group(1)
-            current_accident["accident_id"] = f"Accident {accident_number}"
-            current_accident["facility_accident_id"] = f"{facility_id}_{accident_number}"
-        else:
-            current_accident["accident_id"] = "Unknown"
-            current_accident["facility_accident_id"] = f"{facility_id}_unknown"
-        
-        # Extract other fields using regex
-        date_match = re.search(r"Date of Accident:\s*([A-Za-z]+\s*\d{4})", block_text, re.IGNORECASE)
-        current_accident["date_of_accident"] = date_match.group(1) if date_match else None
-        
-        time_match = re.search(r"Time Accident Began \(HH:MM\):\s*(\d{2}:\d{2})", block_text, re.IGNORECASE)
-        current_accident["time_accident_began"] = time_match.group(1) if time_match else None
-        
-        naics_match = re.search(r"NAICS Code of Process Involved:\s*(\d+)", block_text, re.IGNORECASE)
-        naics_code = naics_match.group(1) if naics_match else None
-        current_accident["naics_code"] = naics_code
-        
-        # Add NAICS to rmp_naics if not already present (from accident)
-        if naics_code and naics_code not in unique_naics:
-            naics_desc_match = re.search(r"NAICS Description:\s*(.+)", block_text, re.IGNORECASE)
-            naics_description = naics_desc_match.group(1).strip() if naics_desc_match else None
-            unique_naics[naics_code] = {
-                "naics_code": naics_code,
-                "naics_description": naics_description
-            }
-            naics_data.append(unique_naics[naics_code])
-        
-        release_duration_match = re.search(r"Release Duration:\s*(\d{3})\s*Hours\s*(\d{2})\s*Minutes", block_text, re.IGNORECASE)
-        if release_duration_match:
-            hours = release_duration_match.group(1)
-            minutes = release_duration_match.group(2)
-            current_accident["release_duration"] = f"{hours} Hours {minutes} Minutes"
+    for accident_count, fields in enumerate(accident_history_parser.parse_blocks(text), 1):
+        accident_number = fields["accident_number"]
+        current_accident = {
+            "accident_id": f"Accident {accident_number}",
+            "facility_accident_id": f"{facility_id}_{accident_number}",
+            "date_of_accident": fields["date_of_accident"],
+            "time_accident_began": fields["time_accident_began"],
+            "naics_code": fields["naics_code"]
+        }
+        # Keep the NAICS description so the merge stage can add it to rmp_naics
+        if fields["naics_code"]:
+            current_accident["naics_description"] = fields["naics_description"]
+        if fields["release_hours"]:
+            current_accident["release_duration"] = f"{fields['release_hours']} Hours {fields['release_minutes']} Minutes"
         else:
             current_accident["release_duration"] = None
-        
+
         current_accident["facility_id"] = facility_id
         accidents.append(current_accident)
-        logging.info(f"Parsed accident {accident_count} for facility {facility_id}: {current_accident}")
-    
-    logging.info(f"Total accidents parsed for facility {facility_id}: {len(accidents)}")
+        scrape_logging.detail(facility_id, "accident", "Parsed accident %d for facility %s: %s", accident_count, facility_id, current_accident)
+
+    scrape_logging.detail(facility_id, "accidents", "Total accidents parsed for facility %s: %d", facility_id, len(accidents), count=len(accidents))
     return accidents
 
-# Function to parse accident chemicals from text
-def parse_accident_chemicals(text, facility_id, accident_id, accident_chemical_id_counter, chemical_id_counter):
+# Function to parse accident chemicals from text.
+# chemical_id and accident_chemical_id are assigned later by merge_facility_result.
+def parse_accident_chemicals(text, facility_id, accident_id):
     chemicals = []
     current_chemical = {}
     current_key = None
@@ -308,7 +299,7 @@ def parse_accident_chemicals(text, facility_id, accident_id, accident_chemical_i
     temp_quantities = {"quantity_released_lbs": None, "percent_weight": None}  # Initialize with None
 
     lines = text.splitlines()
-    logging.info(f"Raw chemical text for {accident_id}: {text}")
+    scrape_logging.detail(facility_id, "accident_chemicals_text", "Raw chemical text for %s: %s", accident_id, text, accident_id=accident_id)
     for i, line in enumerate(lines):
         line = line.strip()
         if not line:
@@ -380,7 +371,7 @@ def parse_accident_chemicals(text, facility_id, accident_id, accident_chemical_i
             value_buffer = []
             value_buffer.append(line.replace("Flammable/Toxic:", "").strip())
             continue
-        
+
         if current_key:
             value_buffer.append(line)
             next_line = lines[i + 1] if i + 1 < len(lines) else ""
@@ -399,93 +390,133 @@ def parse_accident_chemicals(text, facility_id, accident_id, accident_chemical_i
             elif current_key == "flammable_toxic" and (next_line.startswith("Section 9") or next_line.startswith("Accident History ID:") or next_line.startswith("Section 7")):
                 current_chemical[current_key] = " ".join(value_buffer).strip()
                 value_buffer = []
-    
+
     if current_key and value_buffer and current_chemical.get("chemical_name"):
         current_chemical[current_key] = " ".join(value_buffer).strip()
     if current_chemical.get("chemical_name"):
         chemicals.append(current_chemical)
-    
-    # Process accident chemicals for rmp_chemical and rmp_accident_chemical
+
+    # Build the rmp_accident_chemical rows, keeping the chemical itself for the merge stage
     accident_chemicals_list = []
     accident_number = int(accident_id.replace("Accident ", ""))
     for chem in chemicals:
-        cas_number = chem["cas_number"]
-        chemical_name = chem["chemical_name"]
-        flammable_toxic = chem.get("flammable_toxic", None)
-        
-        # Add to rmp_chemical if not already present
-        if cas_number not in unique_chemicals:
-            unique_chemicals[cas_number] = {
-                "chemical_id": chemical_id_counter,
-                "chemical_name": chemical_name,
-                "cas_number": cas_number,
-                "flammable_toxic": flammable_toxic
-            }
-            chemical_data.append(unique_chemicals[cas_number])
-            chemical_id_counter += 1
-        
-        # Add to rmp_accident_chemical using existing chemical_id
         chemical_id += 1
         accident_chemical_entry = {
-            "accident_chemical_id": accident_chemical_id_counter,
             "facility_accident_chemical_id": f"{facility_id}_{accident_number}_{chemical_id}",
             "facility_accident_id": f"{facility_id}_{accident_number}",
             "quantity_released_lbs": chem.get("quantity_released_lbs", "N/A"),
             "percent_weight": chem.get("percent_weight", "N/A"),
-            "chemical_id": unique_chemicals[cas_number]["chemical_id"]
+            "chemical_name": chem["chemical_name"],
+            "cas_number": chem["cas_number"],
+            "flammable_toxic": chem.get("flammable_toxic", None)
         }
         if in_flammable_mixture and "quantity_released_lbs" not in chem:
             accident_chemical_entry["quantity_released_lbs"] = "N/A"
             accident_chemical_entry["percent_weight"] = "N/A"
         accident_chemicals_list.append(accident_chemical_entry)
-        accident_chemical_id_counter += 1
         # Reset temp_quantities after each chemical to prevent duplication
         temp_quantities = {"quantity_released_lbs": None, "percent_weight": None}
-    
-    logging.info(f"Parsed {len(accident_chemicals_list)} chemicals for {accident_id}: {accident_chemicals_list}")
-    return accident_chemicals_list, accident_chemical_id_counter, chemical_id_counter
 
-# Main processing loop
-pdf_files = glob.glob(os.path.join(input_dir, "**", "*.pdf"), recursive=True)
-stats["total_pdfs"] = len(pdf_files)
-logging.info(f"Found {stats['total_pdfs']} PDF files to process")
+    scrape_logging.detail(facility_id, "accident_chemicals", "Parsed %d chemicals for %s: %s", len(accident_chemicals_list), accident_id, accident_chemicals_list,
+                          accident_id=accident_id, count=len(accident_chemicals_list))
+    return accident_chemicals_list
+
+# Section and sub-block markers. Each text is indexed once and every later lookup is a bisect,
+# instead of re-scanning the text with find for every section and every accident.
+section_markers = ["Process Chemicals", "Process NAICS", "Section 6. Accident History", "Section 7", "Section 9. Emergency Response"]
+accident_markers = ["Accident History ID:", "Chemicals in Accident History", "Section 9. Emergency Response"]
 
-for pdf_file in pdf_files:
+# Function to record every position of every marker in text
+def index_markers(markers, text):
+    positions = {}
+    for marker in markers:
+        marker_positions = positions[marker] = []
+        pos = text.find(marker)
+        while pos != -1:
+            marker_positions.append(pos)
+            pos = text.find(marker, pos + 1)
+    return positions
+
+# Function to find the first position of a marker at or after start (-1 if none), like str.find
+def find_marker(positions, marker, start=0):
+    marker_positions = positions.get(marker, [])
+    i = bisect.bisect_left(marker_positions, start)
+    return marker_positions[i] if i < len(marker_positions) else -1
+
+# Function to slice the accident chemicals text for one accident out of the accidents section
+def find_accident_chemicals_text(accidents_text, markers, accident_id):
+    accident_id_pattern = f"Accident History ID: {accident_id}"
+    chemical_start = next((pos for pos in markers.get("Accident History ID:", []) if accidents_text.startswith(accident_id_pattern, pos)), -1)
+    if chemical_start == -1:
+        return ""
+    chemical_section_start = find_marker(markers, "Chemicals in Accident History", chemical_start)
+    if chemical_section_start == -1:
+        return ""
+    next_accident_start = find_marker(markers, "Accident History ID:", chemical_section_start + len("Chemicals in Accident History"))
+    section_9_end = find_marker(markers, "Section 9. Emergency Response", chemical_section_start)
+    if next_accident_start == -1 and section_9_end == -1:
+        chemical_section_end = len(accidents_text)
+    elif next_accident_start == -1:
+        chemical_section_end = section_9_end
+    elif section_9_end == -1:
+        chemical_section_end = next_accident_start
+    else:
+        chemical_section_end = min(next_accident_start, section_9_end)
+    return accidents_text[chemical_section_start:chemical_section_end].strip()
+
+# Function to scrape a single facility PDF.
+# This runs in the worker processes, so it must not touch the global counters or tables;
+# it returns everything parsed from the PDF and leaves ID assignment to merge_facility_result.
+# data is the PDF bytes when the prefetcher has read them already.
+def scrape_facility(pdf_file, data=None):
     facility_id = os.path.basename(pdf_file).replace(".pdf", "")
-    logging.info(f"Processing {pdf_file} (Facility ID: {facility_id})")
+    result = {
+        "pdf_file": pdf_file,
+        "facility_id": facility_id,
+        "status": "skipped",
+        "pdf_time": None,
+        "chemicals": [],
+        "naics": [],
+        "accidents": [],
+        "accident_chemicals": [],  # One list per accident, in the same order as accidents
+        "timings": {},  # Seconds per stage, see scrape_metrics.py
+        "pdf_bytes": len(data) if data is not None else os.path.getsize(pdf_file)
+    }
+    timer = StageTimer(result["timings"])
+    scrape_logging.detail(facility_id, "processing", "Processing %s (Facility ID: %s)", pdf_file, facility_id, pdf_file=pdf_file)
 
     try:
-        text = extract_text_from_pdf(pdf_file)
+        open_before = pdf_text_cache.stage_times["open"]
+        text, result["pdf_time"] = extract_text_from_pdf(pdf_file, facility_id, data)
+        timer.add("open", pdf_text_cache.stage_times["open"] - open_before)
+        timer.add("extract", result["pdf_time"] - result["timings"]["open"])
         if not text:
-            logging.warning(f"No text extracted from {pdf_file}")
-            stats["skipped_pdfs"] += 1
-            continue
+            logging.warning("No text extracted from %s", pdf_file, extra=event("no_text", facility_id=facility_id, pdf_file=pdf_file))
+            return result
     except Exception as e:
-        logging.error(f"Error reading {pdf_file}: {e}")
-        stats["errors"] += 1
-        stats["skipped_pdfs"] += 1
-        continue
+        logging.error("Error reading %s: %s", pdf_file, e, extra=event("read_error", facility_id=facility_id, pdf_file=pdf_file, error=str(e)))
+        result["status"] = "error"
+        return result
 
-    process_chemicals_start = text.find("Process Chemicals")
+    slice_start = time.perf_counter()
+    markers = index_markers(section_markers, text)
+    process_chemicals_start = find_marker(markers, "Process Chemicals")
     if process_chemicals_start == -1:
-        logging.warning(f"'Process Chemicals' section not found in {pdf_file}")
-        stats["skipped_pdfs"] += 1
-        continue
+        logging.warning("'Process Chemicals' section not found in %s", pdf_file, extra=event("section_missing", facility_id=facility_id, section="Process Chemicals"))
+        return result
     process_chemicals_start += len("Process Chemicals")
 
-    process_naics_start = text.find("Process NAICS", process_chemicals_start)
+    process_naics_start = find_marker(markers, "Process NAICS", process_chemicals_start)
     if process_naics_start == -1:
-        logging.warning(f"'Process NAICS' section not found in {pdf_file}")
-        stats["skipped_pdfs"] += 1
-        continue
+        logging.warning("'Process NAICS' section not found in %s", pdf_file, extra=event("section_missing", facility_id=facility_id, section="Process NAICS"))
+        return result
 
-    accident_history_start = text.find("Section 6. Accident History", process_naics_start)
+    accident_history_start = find_marker(markers, "Section 6. Accident History", process_naics_start)
     if accident_history_start == -1:
-        logging.warning(f"'Section 6. Accident History' section not found in {pdf_file}")
-        stats["skipped_pdfs"] += 1
-        continue
-    section_7_pos = text.find("Section 7", accident_history_start)
-    section_9_pos = text.find("Section 9. Emergency Response", accident_history_start)
+        logging.warning("'Section 6. Accident History' section not found in %s", pdf_file, extra=event("section_missing", facility_id=facility_id, section="Section 6. Accident History"))
+        return result
+    section_7_pos = find_marker(markers, "Section 7", accident_history_start)
+    section_9_pos = find_marker(markers, "Section 9. Emergency Response", accident_history_start)
     if section_7_pos == -1 and section_9_pos == -1:
         accident_history_end = len(text)
     elif section_7_pos == -1:
@@ -495,124 +526,476 @@ for pdf_file in pdf_files:
     else:
         accident_history_end = min(section_7_pos, section_9_pos)
 
-    chemicals_text = text[process_chemicals_start:process_naics_start].strip()
-    chemicals_text = filter_header_footer(chemicals_text)
-    logging.info(f"Chemicals text for {facility_id}:\n{chemicals_text}")
+    result["status"] = "ok"
+
+    chemicals_text = clean_section_text(text[process_chemicals_start:process_naics_start].strip())
+    naics_text = clean_section_text(text[process_naics_start + len("Process NAICS"):accident_history_start].strip())
+    accidents_text = clean_section_text(text[accident_history_start:accident_history_end].strip())
+    timer.add("slice", time.perf_counter() - slice_start)
+
+    scrape_logging.detail(facility_id, "section_text", "Chemicals text for %s:\n%s", facility_id, chemicals_text, section="chemicals")
     if chemicals_text:
-        new_facility_chemicals, chemical_id_counter, facility_chemical_id_counter = parse_chemicals(chemicals_text, facility_id, chemical_id_counter, facility_chemical_id_counter)
-        facility_chemicals_data.extend(new_facility_chemicals)
-        if new_facility_chemicals:
-            stats["successful_chemicals"] += 1
-        stats["total_chemicals"] = stats.get("total_chemicals", 0) + len(new_facility_chemicals)
-
-    naics_text = text[process_naics_start + len("Process NAICS"):accident_history_start].strip()
-    naics_text = filter_header_footer(naics_text)
-    logging.info(f"NAICS text for {facility_id}:\n{naics_text}")
+        with timer.stage("parse_chemicals"):
+            result["chemicals"] = parse_chemicals(chemicals_text, facility_id)
+
+    scrape_logging.detail(facility_id, "section_text", "NAICS text for %s:\n%s", facility_id, naics_text, section="naics")
     if naics_text:
-        new_facility_naics, facility_naics_id_counter = parse_naics(naics_text, facility_id, facility_naics_id_counter)
-        facility_naics_data.extend(new_facility_naics)
-        if new_facility_naics:
-            stats["successful_naics"] += 1
-        stats["total_naics"] = stats.get("total_naics", 0) + len(new_facility_naics)
-
-    accidents_text = text[accident_history_start:accident_history_end].strip()
-    accidents_text = filter_header_footer(accidents_text)
-    logging.info(f"Accidents text for {facility_id}:\n{accidents_text}")
+        with timer.stage("parse_naics"):
+            result["naics"] = parse_naics(naics_text, facility_id)
+
+    scrape_logging.detail(facility_id, "section_text", "Accidents text for %s:\n%s", facility_id, accidents_text, section="accidents")
     if accidents_text:
-        new_accidents = parse_accidents(accidents_text, facility_id)
-        if new_accidents:
-            stats["facilities_with_accidents"] += 1
-            stats["total_accidents"] += len(new_accidents)
-            accidents_data.extend(new_accidents)
-            logging.info(f"Added {len(new_accidents)} accidents for facility {facility_id}, total accidents so far: {len(accidents_data)}")
+        with timer.stage("parse_accidents"):
+            result["accidents"] = parse_accidents(accidents_text, facility_id)
+        with timer.stage("slice"):
+            markers = index_markers(accident_markers, accidents_text)
+        for accident in result["accidents"]:
+            with timer.stage("slice"):
+                accident_chemicals_text = find_accident_chemicals_text(accidents_text, markers, accident["accident_id"])
+            scrape_logging.detail(facility_id, "section_text", "Accident chemicals text for %s:\n%s", accident["accident_id"], accident_chemicals_text,
+                                  section="accident_chemicals", accident_id=accident["accident_id"])
+            if accident_chemicals_text:
+                with timer.stage("parse_accident_chemicals"):
+                    result["accident_chemicals"].append(parse_accident_chemicals(accident_chemicals_text, facility_id, accident["accident_id"]))
+            else:
+                scrape_logging.detail(facility_id, "no_accident_chemicals", "No chemicals found for %s in %s", accident["accident_id"], facility_id,
+                                      accident_id=accident["accident_id"])
+                result["accident_chemicals"].append([])
+
+    return result
+
+# Function to register a chemical in rmp_chemical and return its chemical_id
+def register_chemical(chemical_name, cas_number, flammable_toxic):
+    if cas_number not in unique_chemicals:
+        unique_chemicals[cas_number] = ChemicalRow(ids.id_for("chemical", cas_number), chemical_name, cas_number, flammable_toxic)
+        sinks["rmp_chemical"].write(unique_chemicals[cas_number])
+    return unique_chemicals[cas_number].chemical_id
+
+# Function to register a NAICS code in rmp_naics
+def register_naics(naics_code, naics_description):
+    if naics_code not in unique_naics:
+        unique_naics[naics_code] = NaicsRow(naics_code, naics_description)
+        sinks["rmp_naics"].write(unique_naics[naics_code])
+
+# Function to merge one facility result into the output tables.
+# The IDs only depend on the rows themselves (see stable_ids.py), but the rows are still
+# merged in glob order so the output files come out in the same order as a serial run.
+def merge_facility_result(result):
+    facility_id = result["facility_id"]
+    # The one INFO event per facility; the per-stage events are detail (DEBUG or --debug-facility)
+    logging.info("Scraped %s (%s): %d chemicals, %d NAICS, %d accidents", facility_id, result["status"],
+                 len(result["chemicals"]), len(result["naics"]), len(result["accidents"]),
+                 extra=event("facility", facility_id=facility_id, status=result["status"], chemicals=len(result["chemicals"]),
+                             naics=len(result["naics"]), accidents=len(result["accidents"]),
+                             accident_chemicals=sum(len(chems) for chems in result["accident_chemicals"]), pdf_time=result["pdf_time"]))
+
+    if result["pdf_time"] is not None:
+        stats["pdf_times"].append(result["pdf_time"])
+    if result["status"] != "ok":
+        if result["status"] == "error":
+            stats["errors"] += 1
+        elif result["status"] == "quarantined":
+            stats["quarantined"] += 1
+        stats["skipped_pdfs"] += 1
+        return
+
+    new_facility_chemicals = []
+    occurrences = Counter()  # The same link listed twice in a report gets two IDs
+    for chem in result["chemicals"]:
+        chemical_id = register_chemical(chem["chemical_name"], chem["cas_number"], chem.get("flammable_toxic", None))
+        link = (facility_id, chem["cas_number"], chem.get("program_level", None))
+        occurrences[link] += 1
+        new_facility_chemicals.append(FacilityChemicalRow(ids.id_for("facility_chemical", *link, occurrences[link]),
+                                                          facility_id, chemical_id, chem.get("program_level", None)))
+    for row in new_facility_chemicals:
+        sinks["rmp_facility_chemicals"].write(row)
+    if new_facility_chemicals:
+        stats["successful_chemicals"] += 1
+    stats["total_chemicals"] = stats.get("total_chemicals", 0) + len(new_facility_chemicals)
+
+    new_facility_naics = []
+    occurrences = Counter()
+    for n in result["naics"]:
+        register_naics(n["naics_code"], n["naics_description"])
+        link = (facility_id, n["naics_code"])
+        occurrences[link] += 1
+        new_facility_naics.append(FacilityNaicsRow(ids.id_for("facility_naics", *link, occurrences[link]), facility_id, n["naics_code"]))
+    for row in new_facility_naics:
+        sinks["rmp_facility_naics"].write(row)
+    if new_facility_naics:
+        stats["successful_naics"] += 1
+    stats["total_naics"] = stats.get("total_naics", 0) + len(new_facility_naics)
+
+    new_accidents = result["accidents"]
+    for accident in new_accidents:
+        if accident["naics_code"]:
+            register_naics(accident["naics_code"], accident["naics_description"])
+    if new_accidents:
+        stats["facilities_with_accidents"] += 1
+        stats["total_accidents"] += len(new_accidents)
         for accident in new_accidents:
-            accident_id_pattern = f"Accident History ID: {accident['accident_id']}"
-            chemical_start = accidents_text.find(accident_id_pattern)
-            if chemical_start == -1:
-                stats["accidents_with_chemicals"] += 0
-                logging.info(f"No chemicals found for {accident['accident_id']} in {facility_id}")
-                continue
-            chemical_section_start = accidents_text.find("Chemicals in Accident History", chemical_start)
-            if chemical_section_start == -1:
-                stats["accidents_with_chemicals"] += 0
-                logging.info(f"No chemicals found for {accident['accident_id']} in {facility_id}")
-                continue
-            next_accident_start = accidents_text.find("Accident History ID:", chemical_section_start + len("Chemicals in Accident History"))
-            section_9_end = accidents_text.find("Section 9. Emergency Response", chemical_section_start)
-            if next_accident_start == -1 and section_9_end == -1:
-                chemical_section_end = len(accidents_text)
-            elif next_accident_start == -1:
-                chemical_section_end = section_9_end
-            elif section_9_end == -1:
-                chemical_section_end = next_accident_start
+            sinks["rmp_facility_accidents"].write(record_from_dict(FacilityAccidentRow, accident))
+        scrape_logging.detail(facility_id, "merged_accidents", "Added %d accidents for facility %s, total accidents so far: %d",
+                              len(new_accidents), facility_id, stats["total_accidents"], count=len(new_accidents))
+
+    for accident, accident_chemicals in zip(new_accidents, result["accident_chemicals"]):
+        new_accident_chemicals = []
+        for ordinal, chem in enumerate(accident_chemicals, start=1):
+            chemical_id = register_chemical(chem["chemical_name"], chem["cas_number"], chem["flammable_toxic"])
+            new_accident_chemicals.append(AccidentChemicalRow(ids.id_for("accident_chemical", chem["facility_accident_id"], ordinal),
+                                                              chem["facility_accident_chemical_id"], chem["facility_accident_id"],
+                                                              chem["quantity_released_lbs"], chem["percent_weight"], chemical_id))
+        for row in new_accident_chemicals:
+            sinks["rmp_accident_chemicals"].write(row)
+            accident_chemical_ids.add(row.chemical_id)
+        if new_accident_chemicals:
+            stats["accidents_with_chemicals"] += 1
+            stats["total_accident_chemicals"] += len(new_accident_chemicals)
+            scrape_logging.detail(facility_id, "merged_accident_chemicals", "Added %d chemicals for %s, total chemicals so far: %d",
+                                  len(new_accident_chemicals), accident["accident_id"], stats["total_accident_chemicals"],
+                                  accident_id=accident["accident_id"], count=len(new_accident_chemicals))
+
+# Function to set up a worker process: same text cache and clip bands, logging through the parent
+def init_worker(cache_path, bands, log_config):
+    pdf_text_cache.configure(cache_path, bands)
+    scrape_logging.init_worker(*log_config)
+
+# Function to scrape a (pdf_file, data) pair from the prefetcher in a worker process
+def scrape_prefetched(item):
+    return scrape_facility(*item)
+
+# Function to turn a quarantined PDF into an empty result, so it is counted and recorded like a skipped one
+def quarantined_result(outcome):
+    pdf_file = outcome.item
+    return {
+        "pdf_file": pdf_file,
+        "facility_id": os.path.basename(pdf_file).replace(".pdf", ""),
+        "status": "quarantined",
+        "pdf_time": None,
+        "chemicals": [],
+        "naics": [],
+        "accidents": [],
+        "accident_chemicals": [],
+        "timings": {},
+        "pdf_bytes": os.path.getsize(pdf_file)
+    }
+
+# Function to scrape a list of PDFs under the watchdog, yielding the results in input order.
+# Quarantined PDFs are held back. With a slow lane, those that ran out of time or memory are
+# retried one at a time under the slow-lane budget once the others are done; whatever still
+# fails is yielded as quarantined.
+def scrape_all_watched(pdf_files, workers, cache_path, bands, watchdog):
+    initargs = (cache_path, bands, scrape_logging.worker_config())
+    held_back = []
+    with WatchdogPool(scrape_facility, workers, watchdog["timeout"], watchdog["memory_mb"], init_worker, initargs) as pool:
+        for outcome in pool.imap(pdf_files):
+            if isinstance(outcome, Quarantined):
+                logging.warning("Quarantined %s (%s): %s", outcome.item, outcome.reason, outcome.detail,
+                                extra=event("quarantined", pdf_file=outcome.item, reason=outcome.reason, detail=outcome.detail,
+                                            seconds=round(outcome.seconds, 3)))
+                held_back.append(outcome)
             else:
-                chemical_section_end = min(next_accident_start, section_9_end)
-            accident_chemicals_text = accidents_text[chemical_section_start:chemical_section_end].strip()
-            logging.info(f"Accident chemicals text for {accident['accident_id']}:\n{accident_chemicals_text}")
-            if accident_chemicals_text:
-                new_accident_chemicals, accident_chemical_id_counter, chemical_id_counter = parse_accident_chemicals(accident_chemicals_text, facility_id, accident['accident_id'], accident_chemical_id_counter, chemical_id_counter)
-                accident_chemicals_data.extend(new_accident_chemicals)
-                if new_accident_chemicals:
-                    stats["accidents_with_chemicals"] += 1
-                    stats["total_accident_chemicals"] += len(new_accident_chemicals)
-                    logging.info(f"Added {len(new_accident_chemicals)} chemicals for {accident['accident_id']}, total chemicals so far: {len(accident_chemicals_data)}")
-
-# Save the data to CSV files
-chemical_df = pd.DataFrame(chemical_data, columns=["chemical_id", "chemical_name", "cas_number", "flammable_toxic"])
-if os.path.exists(output_chemicals_file):
-    chemical_df.to_csv(output_chemicals_file, mode='a', header=False, index=False)
-else:
-    chemical_df.to_csv(output_chemicals_file, index=False)
-
-facility_chemicals_df = pd.DataFrame(facility_chemicals_data, columns=["facility_chemical_id", "facility_id", "chemical_id", "program_level"])
-if os.path.exists(output_facility_chemicals_file):
-    facility_chemicals_df.to_csv(output_facility_chemicals_file, mode='a', header=False, index=False)
-else:
-    facility_chemicals_df.to_csv(output_facility_chemicals_file, index=False)
-
-naics_df = pd.DataFrame(naics_data, columns=["naics_code", "naics_description"])
-if os.path.exists(output_naics_file):
-    naics_df.to_csv(output_naics_file, mode='a', header=False, index=False)
-else:
-    naics_df.to_csv(output_naics_file, index=False)
-
-facility_naics_df = pd.DataFrame(facility_naics_data, columns=["facility_naics_id", "facility_id", "naics_code"])
-if os.path.exists(output_facility_naics_file):
-    facility_naics_df.to_csv(output_facility_naics_file, mode='a', header=False, index=False)
-else:
-    facility_naics_df.to_csv(output_facility_naics_file, index=False)
-
-accidents_df = pd.DataFrame(accidents_data, columns=["facility_accident_id", "accident_id", "facility_id", "date_of_accident", "time_accident_began", "release_duration", "naics_code"])
-if os.path.exists(output_accidents_file):
-    accidents_df.to_csv(output_accidents_file, mode='a', header=False, index=False)
-else:
-    accidents_df.to_csv(output_accidents_file, index=False)
-
-accident_chemicals_df = pd.DataFrame(accident_chemicals_data, columns=["accident_chemical_id", "facility_accident_chemical_id", "facility_accident_id", "quantity_released_lbs", "percent_weight", "chemical_id"])
-if os.path.exists(output_accident_chemicals_file):
-    accident_chemicals_df.to_csv(output_accident_chemicals_file, mode='a', header=False, index=False)
-else:
-    accident_chemicals_df.to_csv(output_accident_chemicals_file, index=False)
-
-# Calculate statistics
-end_time = time.time()
-total_time = end_time - stats["start_time"]
-avg_time_per_pdf = total_time / stats["total_pdfs"] if stats["total_pdfs"] > 0 else 0
-stats["unique_accident_chemicals"] = len(set(chem["chemical_id"] for chem in accident_chemicals_data))
-
-# Log summary statistics
-logging.info("=== Summary Statistics ===")
-logging.info(f"Total PDFs Found: {stats['total_pdfs']}")
-logging.info(f"Facilities with Accidents: {stats['facilities_with_accidents']}")
-logging.info(f"Total Accidents Found: {stats['total_accidents']}")
-logging.info(f"Accidents with Chemicals Extracted: {stats['accidents_with_chemicals']}")
-logging.info(f"Total Accident Chemicals Extracted: {stats['total_accident_chemicals']}")
-logging.info(f"Unique Accident Chemicals: {stats['unique_accident_chemicals']}")
-logging.info(f"PDFs Skipped: {stats['skipped_pdfs']}")
-logging.info(f"Errors Encountered: {stats['errors']}")
-logging.info(f"Total Runtime: {total_time:.2f} seconds")
-logging.info(f"Average Time per PDF: {avg_time_per_pdf:.4f} seconds")
-logging.info("Script completed")
-
-print(f"Data saved to {output_chemicals_file}, {output_facility_chemicals_file}, {output_naics_file}, {output_facility_naics_file}, {output_accidents_file}, and {output_accident_chemicals_file}")
-print(f"See fac_acc_chem_log.txt for detailed statistics and logs")
\ No newline at end of file
+                yield outcome
+    if not held_back:
+        return
+    retried = {}
+    # A crash or an exception would only happen again, so those aren't retried
+    retry_files = [outcome.item for outcome in held_back if outcome.reason in ("timeout", "memory")]
+    if watchdog["slow_lane_timeout"] is not None and retry_files:
+        logging.info(f"Retrying {len(retry_files)} quarantined PDFs on the slow lane ({watchdog['slow_lane_timeout']:g} seconds each)")
+        with WatchdogPool(scrape_facility, 1, watchdog["slow_lane_timeout"], watchdog["slow_lane_memory_mb"], init_worker, initargs) as pool:
+            retried = dict(zip(retry_files, pool.imap(retry_files)))
+    for outcome in held_back:
+        record = outcome.record()
+        retry = retried.get(outcome.item)
+        if retry is not None and not isinstance(retry, Quarantined):
+            record["slow_lane"] = "recovered"
+            quarantine.append(record)
+            yield retry
+            continue
+        if retry is not None:
+            record["slow_lane"] = retry.record()
+            logging.error("Quarantined %s again on the slow lane (%s): %s", retry.item, retry.reason, retry.detail,
+                          extra=event("quarantined", pdf_file=retry.item, reason=retry.reason, detail=retry.detail, slow_lane=True))
+        else:
+            record["slow_lane"] = None
+        quarantine.append(record)
+        yield quarantined_result(outcome)
+
+# Function to scrape a list of PDFs, yielding the results in input order.
+# With prefetch ({"threads", "queue_depth", "max_mb"}) the PDFs are read ahead by a PrefetchReader
+# and handed over as bytes. Each PDF counts against the read-ahead limits until its result is back,
+# and the pool takes one PDF at a time, so a worker never waits on a chunk the limits hold back.
+def scrape_all(pdf_files, workers, chunksize, cache_path, bands=None, watchdog=None, prefetch=None):
+    if watchdog is not None:
+        yield from scrape_all_watched(pdf_files, workers, cache_path, bands, watchdog)
+    elif prefetch is not None and workers > 1:
+        reader = pdf_prefetch.PrefetchReader(pdf_files, prefetch["threads"], prefetch["queue_depth"], prefetch["max_mb"], release_on_next=False)
+        with Pool(processes=workers, initializer=init_worker, initargs=(cache_path, bands, scrape_logging.worker_config())) as pool:
+            for result in pool.imap(scrape_prefetched, reader):
+                reader.release(result["pdf_file"])
+                yield result
+            pool.close()
+            pool.join()
+    elif prefetch is not None:
+        for pdf_file, data in pdf_prefetch.PrefetchReader(pdf_files, prefetch["threads"], prefetch["queue_depth"], prefetch["max_mb"]):
+            yield scrape_facility(pdf_file, data)
+    elif workers > 1:
+        # imap keeps results in glob order, so the merge assigns the same IDs as a serial run
+        with Pool(processes=workers, initializer=init_worker, initargs=(cache_path, bands, scrape_logging.worker_config())) as pool:
+            yield from pool.imap(scrape_facility, pdf_files, chunksize=chunksize)
+            # Let the workers exit normally so their last log records reach the queue
+            pool.close()
+            pool.join()
+    else:
+        for pdf_file in pdf_files:
+            yield scrape_facility(pdf_file)
+
+# Function to yield one result per PDF in glob order, scraping only what the manifest can't carry forward
+def iter_facility_results(pdf_files, workers, chunksize, cache_path, manifest=None, bands=None, watchdog=None, prefetch=None, shard=None):
+    if manifest is None:
+        yield from scrape_all(pdf_files, workers, chunksize, cache_path, bands, watchdog, prefetch)
+        return
+
+    pending = [pdf_file for pdf_file in pdf_files if not manifest.is_current(pdf_file)]
+    logging.info(f"Manifest {manifest.path}: {len(pdf_files) - len(pending)} PDFs unchanged, {len(pending)} new or changed")
+    print(f"Scraping {len(pending)} new or changed PDFs, carrying forward {len(pdf_files) - len(pending)}")
+    # The fresh results are yielded as they come, with their timings, for the run report and the progress line;
+    # the carried-forward ones are loaded in between, so all come in glob order (quarantined PDFs last, as without
+    # a manifest)
+    position = {pdf_file: index for index, pdf_file in enumerate(pdf_files)}
+    pending_files = set(pending)
+    next_index = 0
+    for result in scrape_all(pending, workers, chunksize, cache_path, bands, watchdog, prefetch):
+        # Stored right away so an interrupted run resumes from here
+        manifest.store(result)
+        while next_index < position[result["pdf_file"]]:
+            if pdf_files[next_index] not in pending_files:
+                yield manifest.load(pdf_files[next_index])
+            next_index += 1
+        next_index = max(next_index, position[result["pdf_file"]] + 1)
+        yield result
+    # pdf_files only has this shard's reports: the entries of the other shards are not pruned
+    in_shard = (lambda path: shard.contains(path, os.path.abspath(input_dir))) if shard is not None else None
+    pruned = manifest.prune(pdf_files, in_shard)
+    if pruned:
+        logging.info(f"Removed {pruned} PDFs no longer in {input_dir} from the manifest")
+    for pdf_file in pdf_files[next_index:]:
+        if pdf_file not in pending_files:
+            yield manifest.load(pdf_file)
+
+def main():
+    global ids
+    parser = argparse.ArgumentParser(description="Scrape EPA RMP PDF reports into CSV files.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes used to scrape PDFs (default: 1, serial)")
+    parser.add_argument("--chunksize", type=int, default=8,
+                        help="Number of PDFs handed to a worker at a time in parallel mode (default: 8)")
+    parser.add_argument("--text-cache", default=text_cache_file,
+                        help=f"SQLite file caching the extracted page text (default: {text_cache_file})")
+    parser.add_argument("--no-text-cache", action="store_true",
+                        help="Decode every PDF without reading or filling the text cache")
+    parser.add_argument("--manifest", default=None,
+                        help="SQLite manifest enabling incremental, resumable runs; outputs are rewritten in full")
+    parser.add_argument("--page-bands", default=page_bands_file,
+                        help=f"Header/footer bands to clip during extraction, from calibrate_page_bands.py (default: {page_bands_file}, used if present)")
+    parser.add_argument("--no-page-bands", action="store_true",
+                        help="Extract whole pages and filter the header/footer lines by pattern instead")
+    parser.add_argument("--log-format", choices=["text", "json"], default="text",
+                        help="Write the log as text lines or as one JSON event per line (default: text)")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO",
+                        help="DEBUG also logs the raw section text and parsed records of every facility (default: INFO)")
+    parser.add_argument("--debug-facility", action="append", default=[], metavar="FACILITY_ID",
+                        help="Log the raw section text and parsed records for this facility only; may be repeated")
+    parser.add_argument("--report", default=run_report_file,
+                        help=f"JSON run report with per-stage timings and throughput (default: {run_report_file})")
+    parser.add_argument("--top", type=int, default=20,
+                        help="Number of slowest PDFs listed in the run report (default: 20)")
+    parser.add_argument("--no-progress", action="store_true",
+                        help="Don't print the progress/ETA line")
+    parser.add_argument("--id-registry", default=id_registry_file,
+                        help=f"SQLite file keeping the row IDs stable across runs (default: {id_registry_file})")
+    parser.add_argument("--seed-ids", default=None, metavar="SOURCE",
+                        help="Register the IDs published in this directory of CSV files or risk-management-plans.db before deriving new ones "
+                             "(default: the CSV files in --output-dir when the ID registry is empty)")
+    parser.add_argument("--doc-timeout", type=float, default=None, metavar="SECONDS",
+                        help="Scrape each PDF in an isolated worker and quarantine it if it takes longer than this")
+    parser.add_argument("--doc-memory-mb", type=float, default=None, metavar="MB",
+                        help="Same, for a worker using more memory than this on a PDF (Linux only)")
+    parser.add_argument("--slow-lane-timeout", type=float, default=None, metavar="SECONDS",
+                        help="Retry PDFs quarantined for time or memory one at a time with this time budget once the others are done")
+    parser.add_argument("--slow-lane-memory-mb", type=float, default=None, metavar="MB",
+                        help="Memory budget on the slow lane (default: none, as only one PDF runs at a time)")
+    parser.add_argument("--quarantine", default=quarantine_file,
+                        help=f"JSON list of the PDFs quarantined during the run and why (default: {quarantine_file})")
+    parser.add_argument("--sqlite", default=None, metavar="DB_FILE",
+                        help="Also write the six tables into a copy of this risk-management-plans.db (DB_FILE.scraped), for the build scripts to finish and publish")
+    parser.add_argument("--parquet", default=None, metavar="DIR",
+                        help="Also write the six tables as typed Parquet files (<table>.parquet) into this directory (needs pyarrow)")
+    parser.add_argument("--no-csv", action="store_true",
+                        help="Don't write the CSV files; only useful with --sqlite or --parquet")
+    parser.add_argument("--prefetch", type=int, default=0, metavar="THREADS",
+                        help="Read upcoming PDFs into memory on this many background threads while others are decoded (default: 0, off)")
+    parser.add_argument("--prefetch-depth", type=int, default=pdf_prefetch.default_queue_depth, metavar="PDFS",
+                        help=f"Most PDFs read ahead and not yet scraped (default: {pdf_prefetch.default_queue_depth})")
+    parser.add_argument("--prefetch-mb", type=float, default=pdf_prefetch.default_max_mb, metavar="MB",
+                        help=f"Most megabytes read ahead and not yet scraped (default: {pdf_prefetch.default_max_mb})")
+    parser.add_argument("--shard", default=None, metavar="SPEC",
+                        help="Only scrape a slice of the archive: a list of states (AK,AL) or a hash bucket of N (3/8); merge the shards with scrape_shards.py")
+    parser.add_argument("--output-dir", default=".",
+                        help="Directory for the CSV files, run report and quarantine list, e.g. one per shard (default: current directory)")
+    args = parser.parse_args()
+    if args.seed_ids and not os.path.exists(args.seed_ids):
+        parser.error(f"{args.seed_ids} not found")
+    if args.no_csv and not (args.sqlite or args.parquet):
+        parser.error("--no-csv needs --sqlite or --parquet")
+    if args.parquet:
+        try:
+            scraper_sinks.import_pyarrow()
+        except ImportError as e:
+            parser.error(str(e))
+    watchdog = None
+    if args.doc_timeout or args.doc_memory_mb or args.slow_lane_timeout:
+        watchdog = {"timeout": args.doc_timeout, "memory_mb": args.doc_memory_mb,
+                    "slow_lane_timeout": args.slow_lane_timeout, "slow_lane_memory_mb": args.slow_lane_memory_mb}
+    prefetch = None
+    if args.prefetch > 0:
+        if watchdog is not None:
+            parser.error("--prefetch can't be combined with the watchdog options")
+        prefetch = {"threads": args.prefetch, "queue_depth": args.prefetch_depth, "max_mb": args.prefetch_mb}
+    shard = None
+    if args.shard:
+        try:
+            shard = scrape_shards.parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    os.makedirs(args.output_dir, exist_ok=True)
+    outputs = {table: os.path.join(args.output_dir, path) for table, path in output_files.items()}
+    report_file = os.path.join(args.output_dir, args.report)
+    quarantine_list = os.path.join(args.output_dir, args.quarantine)
+    scrape_logging.setup(log_file, log_format=args.log_format, level=args.log_level,
+                         capture_facilities=args.debug_facility, multiprocess=args.workers > 1 or watchdog is not None)
+    cache_path = None if args.no_text_cache else args.text_cache
+    bands = None
+    if not args.no_page_bands and os.path.exists(args.page_bands):
+        bands = pdf_text_cache.load_page_bands(args.page_bands)
+        logging.info(f"Clipping header {bands[0]:.2f}pt and footer {bands[1]:.2f}pt using {args.page_bands}")
+    pdf_text_cache.configure(cache_path, bands)
+
+    # Log script start
+    logging.info("Starting the PDF scraping process")
+
+    # Main processing loop
+    pdf_files = glob.glob(os.path.join(input_dir, "**", "*.pdf"), recursive=True)
+    if shard is not None:
+        found = len(pdf_files)
+        pdf_files = scrape_shards.select(pdf_files, input_dir, shard)
+        logging.info(f"Shard {shard}: {len(pdf_files)} of {found} PDFs")
+    stats["total_pdfs"] = len(pdf_files)
+    logging.info(f"Found {stats['total_pdfs']} PDF files to process with {args.workers} worker(s)")
+
+    # Clipped text parses differently, so results stored under other bands are not carried forward
+    parser_version = PARSER_VERSION if bands is None else f"{PARSER_VERSION}-{pdf_text_cache.extractor_version()}"
+    manifest = ScrapeManifest(args.manifest, parser_version) if args.manifest else None
+    # With a manifest every facility is carried forward, so the outputs are replaced instead of appended to
+    ids = IdRegistry(args.id_registry)
+    logging.info(f"ID registry {args.id_registry}: {len(ids)} IDs from earlier runs")
+    # A new registry first takes the IDs already published, so the rows scraped again keep them
+    seed_source = args.seed_ids or (args.output_dir if len(ids) == 0 else None)
+    if seed_source:
+        for kind, (registered, skipped) in seed_registry(ids, seed_source).items():
+            logging.info(f"Seeded the ID registry from {seed_source}: {registered} {kind} IDs, {skipped} already registered or taken")
+    csv_sinks = {} if args.no_csv else scraper_sinks.open_csv_sinks(outputs, batch_size=sink_batch_size, append=manifest is None)
+    sqlite_sinks = {}
+    sqlite_staging = None
+    if args.sqlite:
+        # The tables are written into a copy of the database, which is not published: its views and full-text
+        # indexes are still those of the previous build. When the run succeeds it is left for the build scripts
+        # (rmp_publish.scraped_path), which build them on it and publish it
+        sqlite_staging = rmp_publish.start_staging(rmp_publish.scraped_path(args.sqlite), copy_from=args.sqlite)
+        sqlite_sinks = scraper_sinks.open_sqlite_sinks(sqlite_staging, list(output_files), batch_size=sink_batch_size, commit_rows=sqlite_commit_rows)
+        logging.info(f"Writing the tables into {sqlite_staging}, kept as {rmp_publish.scraped_path(args.sqlite)} at the end of the run")
+    parquet_sinks = {}
+    if args.parquet:
+        parquet_sinks = scraper_sinks.open_parquet_sinks(args.parquet, list(output_files), batch_size=parquet_row_group_rows)
+        logging.info(f"Writing the tables as Parquet files into {args.parquet}")
+    sinks.update(scraper_sinks.combine_sinks(csv_sinks, sqlite_sinks, parquet_sinks))
+    metrics = RunMetrics(input_dir, top_n=args.top)
+    progress = ProgressLine(len(pdf_files), enabled=not args.no_progress)
+    try:
+        for result in iter_facility_results(pdf_files, args.workers, args.chunksize, cache_path, manifest, bands, watchdog, prefetch, shard):
+            write_start = time.perf_counter()
+            merge_facility_result(result)
+            if result.get("timings") is not None:
+                result["timings"]["write"] = time.perf_counter() - write_start
+            metrics.add(result)
+            progress.update()
+    finally:
+        # Also runs on a crash, so the rows merged so far are always written out (to the unfinished copy for --sqlite)
+        progress.close()
+        scraper_sinks.close_sinks(sinks)
+        ids.close()
+        if manifest is not None:
+            manifest.close()
+    if sqlite_staging is not None:
+        os.replace(sqlite_staging, rmp_publish.scraped_path(args.sqlite))
+
+    # Calculate statistics
+    end_time = time.time()
+    total_time = end_time - stats["start_time"]
+    avg_time_per_pdf = total_time / stats["total_pdfs"] if stats["total_pdfs"] > 0 else 0
+    stats["unique_accident_chemicals"] = len(accident_chemical_ids)
+
+    # Log summary statistics
+    logging.info("=== Summary Statistics ===")
+    logging.info(f"Total PDFs Found: {stats['total_pdfs']}")
+    logging.info(f"Facilities with Accidents: {stats['facilities_with_accidents']}")
+    logging.info(f"Total Accidents Found: {stats['total_accidents']}")
+    logging.info(f"Accidents with Chemicals Extracted: {stats['accidents_with_chemicals']}")
+    logging.info(f"Total Accident Chemicals Extracted: {stats['total_accident_chemicals']}")
+    logging.info(f"Unique Accident Chemicals: {stats['unique_accident_chemicals']}")
+    logging.info(f"PDFs Skipped: {stats['skipped_pdfs']}")
+    logging.info(f"Errors Encountered: {stats['errors']}")
+    logging.info(f"PDFs Quarantined: {stats['quarantined']}")
+    logging.info(f"Workers: {args.workers}")
+    logging.info(f"Prefetch: {prefetch if prefetch else 'off'}")
+    logging.info(f"Header/Footer: {'clipped ' + repr(bands) if bands else 'filtered by pattern'}")
+    logging.info(f"Text Cache: {cache_path} (parent process hits: {pdf_text_cache.cache_stats['hits']}, misses: {pdf_text_cache.cache_stats['misses']})")
+    logging.info(f"Total Runtime: {total_time:.2f} seconds")
+    logging.info(f"Average Time per PDF: {avg_time_per_pdf:.4f} seconds")
+
+    report = metrics.write_report(
+        report_file,
+        workers=args.workers,
+        shard=str(shard) if shard is not None else None,
+        parser_version=parser_version,
+        extractor_version=pdf_text_cache.extractor_version(),
+        text_cache={"path": cache_path, **pdf_text_cache.cache_stats},
+        stats={key: value for key, value in stats.items() if key not in ("start_time", "pdf_times")},
+        total_runtime_seconds=round(total_time, 3)
+    )
+    for name, stage in report["stages"].items():
+        logging.info(f"Stage {name}: {stage['seconds']:.2f} seconds, {stage['mean_ms'] or 0:.2f} ms per PDF, {(stage['share'] or 0):.1%} of scrape time")
+    for slow in report["slowest"][:5]:
+        logging.info(f"Slow PDF: {slow['pdf_file']} ({slow['seconds']:.2f} seconds)")
+    logging.info(f"Run report saved to {report_file}")
+    if watchdog is not None:
+        with open(quarantine_list, "w", encoding="utf-8") as f:
+            json.dump({"created": time.strftime("%Y-%m-%d %H:%M:%S"), "watchdog": watchdog, "documents": quarantine}, f, indent=2)
+        logging.info(f"Quarantine list ({len(quarantine)} PDFs) saved to {quarantine_list}")
+        if quarantine:
+            print(f"{len(quarantine)} PDFs were quarantined, see {quarantine_list}")
+    logging.info("Script completed")
+
+    if not args.no_csv:
+        print(f"Data saved to {', '.join(outputs.values())}")
+    if args.sqlite:
+        print(f"Data saved to {rmp_publish.scraped_path(args.sqlite)}; run create_sqlite_rmp_db_from_csv.py with import_scraped_csvs = False "
+              f"to build the views and publish it as {args.sqlite}")
+    if args.parquet:
+        print(f"Data saved to {args.parquet} as Parquet files")
+    print(f"See {log_file} for detailed statistics and logs, and {report_file} for stage timings and throughput")
+    scrape_logging.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,27 @@
-import fitz
 import re
 import pandas as pd
 import logging
 import time
+import argparse
+import base64
+import io
+import json
+import os
+import socketserver
+import sys
+import pdf_text_cache
+import scrape_logging
 
 # Set up logging
-logging.basicConfig(filename="accident_history_log_single.txt", level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+log_file = "accident_history_log_single.txt"
+logging.basicConfig(filename=log_file, level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 # Define paths
 pdf_file = r""
 output_csv = r""
 error_log = r"error_log_single.txt"
+text_cache_file = "pdf_text_cache.sqlite"  # Shared extracted-text cache, see pdf_text_cache.py
+pdf_text_cache.configure(text_cache_file)
 
 # Function to extract EPA Facility ID from filename
 def extract_epa_facility_id_from_filename(filename):
@@ -315,64 +326,153 @@ def parse_accident_history(section_6_text, epa_id):
         "Accident Details": accidents if accidents else None
     }
 
-# Process the single PDF
-try:
-    with fitz.open(pdf_file) as doc:
-        epa_id = extract_epa_facility_id_from_filename(pdf_file)
-        if not epa_id:
-            raise ValueError(f"Invalid EPA Facility ID from filename: {pdf_file}")
-
-        text_before_section_6 = ""
-        section_6_text = ""
-        in_section_6 = False
-        for i in range(len(doc)):
-            page_text = doc[i].get_text("text")
-            if not page_text:
-                logging.error(f"No text extracted from page {i+1} of {pdf_file}")
-                continue
-            
-            if re.search(r"Section 6\. Accident History", page_text, re.IGNORECASE):
-                in_section_6 = True
-                section_6_start = page_text.find("Section 6. Accident History")
-                section_6_text += page_text[section_6_start:] + "\n"
-                continue
-            
-            if in_section_6:
-                if re.search(r"Section 7\.|Section 8\.|Section 9\.", page_text, re.IGNORECASE):
-                    matches = [(page_text.find(s), s) for s in ["Section 7.", "Section 8.", "Section 9."] if page_text.find(s) != -1]
-                    if matches:
-                        earliest_pos, earliest_section = min(matches, key=lambda x: x[0])
-                        section_6_text += page_text[:earliest_pos]
-                        logging.info(f"Section 6 ended at {earliest_section} for EPA ID {epa_id}")
-                        break
-                    else:
-                        section_6_text += page_text + "\n"
+# Function to scrape one report into its accident rows. Pass data (the PDF bytes) to parse
+# a report that isn't on disk; pdf_file then only names it.
+def scrape_pdf(pdf_file, data=None):
+    epa_id = extract_epa_facility_id_from_filename(pdf_file)
+    if not epa_id:
+        raise ValueError(f"Invalid EPA Facility ID from filename: {pdf_file}")
+
+    text_before_section_6 = ""
+    section_6_text = ""
+    in_section_6 = False
+    for i, page_text in enumerate(pdf_text_cache.iter_page_texts(pdf_file, data=data)):
+        if not page_text:
+            logging.error(f"No text extracted from page {i+1} of {pdf_file}")
+            continue
+        
+        if re.search(r"Section 6\. Accident History", page_text, re.IGNORECASE):
+            in_section_6 = True
+            section_6_start = page_text.find("Section 6. Accident History")
+            section_6_text += page_text[section_6_start:] + "\n"
+            continue
+        
+        if in_section_6:
+            if re.search(r"Section 7\.|Section 8\.|Section 9\.", page_text, re.IGNORECASE):
+                matches = [(page_text.find(s), s) for s in ["Section 7.", "Section 8.", "Section 9."] if page_text.find(s) != -1]
+                if matches:
+                    earliest_pos, earliest_section = min(matches, key=lambda x: x[0])
+                    section_6_text += page_text[:earliest_pos]
+                    logging.info(f"Section 6 ended at {earliest_section} for EPA ID {epa_id}")
+                    break
                 else:
                     section_6_text += page_text + "\n"
             else:
-                text_before_section_6 += page_text + "\n"
-
-        naics_code = extract_process_naics(text_before_section_6)
-        accident_data = parse_accident_history(section_6_text, epa_id)
-
-        results = []
-        if accident_data["Has Accident"] == "Yes":
-            for accident in accident_data["Accident Details"]:
-                row = {
-                    "EPA Facility ID": epa_id,
-                    "Has Accident": "Yes",
-                    "Accident Count": accident_data["Accident Count"],
-                    "NAICS Code": naics_code,
-                    **accident
-                }
-                results.append(row)
+                section_6_text += page_text + "\n"
+        else:
+            text_before_section_6 += page_text + "\n"
+
+    naics_code = extract_process_naics(text_before_section_6)
+    accident_data = parse_accident_history(section_6_text, epa_id)
+
+    results = []
+    if accident_data["Has Accident"] == "Yes":
+        for accident in accident_data["Accident Details"]:
+            row = {
+                "EPA Facility ID": epa_id,
+                "Has Accident": "Yes",
+                "Accident Count": accident_data["Accident Count"],
+                "NAICS Code": naics_code,
+                **accident
+            }
+            results.append(row)
+    return results
+
+# Function to answer one batch-mode request: a PDF path, or a JSON object {"path": ...} that may
+# carry the PDF itself as {"path": "100000158116.pdf", "pdf_base64": "..."}.
+# Writes one {"path", "row"} line per accident row, then one {"path", "status", ...} line.
+def handle_request(line, out):
+    line = line.strip()
+    if not line:
+        return
+    start = time.perf_counter()
+    path = line
+    try:
+        data = None
+        if line.startswith("{"):
+            request = json.loads(line)
+            path = request["path"]
+            if "pdf_base64" in request:
+                data = base64.b64decode(request["pdf_base64"])
+        rows = scrape_pdf(path, data)
+        for row in rows:
+            out.write(json.dumps({"path": path, "row": row}, ensure_ascii=False) + "\n")
+        status = {"path": path, "status": "ok", "rows": len(rows)}
+        logging.info(f"Processed {path}, accidents found: {len(rows)}")
+    except Exception as e:
+        status = {"path": path, "status": "error", "error": f"{type(e).__name__}: {e}"}
+        with open(error_log, "a") as error_file:
+            error_file.write(f"Error processing {path}: {e} at {time.ctime()}\n")
+        logging.error(f"Error processing {path}: {e}")
+    status["ms"] = round((time.perf_counter() - start) * 1000, 2)
+    out.write(json.dumps(status) + "\n")
+    out.flush()
+
+# Function to answer requests line by line until the input ends
+def serve(lines, out):
+    for line in lines:
+        handle_request(line, out)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """One socket connection: request lines in, NDJSON out."""
+
+    def handle(self):
+        out = io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True)
+        serve(io.TextIOWrapper(self.rfile, encoding="utf-8"), out)
+        out.detach()
 
+
+# Function to serve connections on a local socket one at a time: a port number listens on
+# 127.0.0.1, anything else is the path of a Unix socket
+def serve_socket(address):
+    if address.isdigit():
+        server = socketserver.TCPServer(("127.0.0.1", int(address)), RequestHandler)
+    else:
+        if os.path.exists(address):
+            os.remove(address)
+        server = socketserver.UnixStreamServer(address, RequestHandler)
+    with server:
+        print(f"Listening on {address}", file=sys.stderr, flush=True)
+        server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape the accident history of one RMP report, or of many in batch mode.")
+    parser.add_argument("--serve", action="store_true",
+                        help="Batch mode: read PDF paths (or JSON requests) from stdin, one per line, and write NDJSON rows to stdout")
+    parser.add_argument("--listen", default=None, metavar="PORT_OR_SOCKET",
+                        help="Batch mode on a local socket instead of stdin/stdout: a port on 127.0.0.1 or a Unix socket path")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO",
+                        help="Log level in batch mode; WARNING skips the per-field lines (default: INFO)")
+    args = parser.parse_args()
+
+    if args.serve or args.listen:
+        # Logging goes through a background thread, so the per-field lines don't slow down the replies
+        scrape_logging.setup(log_file, level=args.log_level)
+        try:
+            if args.listen:
+                serve_socket(args.listen)
+            else:
+                # Stray prints (e.g. PyMuPDF messages) go to stderr, so stdout only carries the replies
+                out, sys.stdout = sys.stdout, sys.stderr
+                serve(sys.stdin, out)
+        except KeyboardInterrupt:
+            pass
+        scrape_logging.shutdown()
+        return
+
+    # Process the single PDF
+    try:
+        results = scrape_pdf(pdf_file)
         pd.DataFrame(results).to_csv(output_csv, index=False)
-        logging.info(f"Processed {pdf_file} (EPA ID: {epa_id}), accidents found: {len(results)}")
+        logging.info(f"Processed {pdf_file} (EPA ID: {extract_epa_facility_id_from_filename(pdf_file)}), accidents found: {len(results)}")
+
+    except Exception as e:
+        with open(error_log, "a") as error_file:
+            error_file.write(f"Error processing {pdf_file}: {e} at {time.ctime()}\n")
+        logging.error(f"Error processing {pdf_file}: {e}")
 
-except Exception as e:
-    with open(error_log, "a") as log_file:
-        log_file.write(f"Error processing {pdf_file}: {e} at {time.ctime()}\n")
-    logging.error(f"Error processing {pdf_file}: {e}")
+    print(f"Processing of {pdf_file} completed. Check {output_csv} for results.")
 
-print(f"Processing of {pdf_file} completed. Check {output_csv} for results.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
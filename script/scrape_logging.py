@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Low-overhead logging for the scrapers.
+
+setup() routes every log record through a queue to a background listener thread, so
+formatting and file writes happen off the scraping path. Messages use %-style
+arguments, which are only merged into the message by the listener. Worker processes
+put their records on the same queue (see init_worker).
+
+Two formats are available: "text" keeps the classic "time - LEVEL - message" lines,
+"json" writes one compact JSON object per line with the event name and its fields,
+e.g. {"ts": ..., "level": "INFO", "event": "facility", "facility_id": "1000...", ...}.
+
+Per-stage events, raw section text and whole parsed records are "detail" events.
+They are skipped (not even formatted) unless the level is DEBUG, or the facility is
+one of the IDs passed as capture_facilities, in which case only that facility's
+detail is logged.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+_detail_logger = logging.getLogger("rmp.detail")
+_listener = None
+_queue = None
+_settings = {"level": logging.INFO, "capture_facilities": frozenset()}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object: timestamp, level, event, message and the event fields."""
+
+    def format(self, record):
+        event = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "event": getattr(record, "event", "message"),
+            "pid": record.process
+        }
+        event.update(getattr(record, "fields", {}))
+        event["msg"] = record.getMessage()
+        if record.exc_text:
+            event["exc"] = record.exc_text
+        return json.dumps(event, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves msg % args to the listener thread."""
+
+    def prepare(self, record):
+        # Tracebacks can't cross a process boundary, so only they are rendered here
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# Function to build the extra= dict of a structured event
+def event(name, **fields):
+    return {"event": name, "fields": fields}
+
+# Function to check whether detail events (raw text, whole records) are wanted for a facility
+def detail_enabled(facility_id):
+    return _settings["level"] <= logging.DEBUG or facility_id in _settings["capture_facilities"]
+
+# Function to log a detail event; nothing is formatted unless detail_enabled(facility_id)
+def detail(facility_id, name, msg, *args, **fields):
+    if detail_enabled(facility_id):
+        _detail_logger.debug(msg, *args, extra=event(name, facility_id=facility_id, **fields))
+
+def _apply(settings, handler):
+    _settings.update(settings)
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+        old.close()
+    root.addHandler(handler)
+    root.setLevel(settings["level"])
+    # Detail records are gated by detail() itself, so this logger lets all of them through
+    _detail_logger.setLevel(logging.DEBUG if settings["level"] <= logging.DEBUG or settings["capture_facilities"] else logging.CRITICAL + 1)
+
+# Function to send all logging of this process to filename through a background thread.
+# Pass multiprocess=True when worker processes will log too (see init_worker).
+def setup(filename, log_format="text", level="INFO", capture_facilities=(), multiprocess=False):
+    global _listener, _queue
+    shutdown()
+    file_handler = logging.FileHandler(filename, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+    _queue = multiprocessing.Queue() if multiprocess else queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(_queue, file_handler)
+    _listener.start()
+    atexit.register(shutdown)  # The listener thread is a daemon, so drain the queue even after a crash
+    settings = {"level": logging.getLevelName(level) if isinstance(level, str) else level,
+                "capture_facilities": frozenset(str(f) for f in capture_facilities)}
+    _apply(settings, _DeferredQueueHandler(_queue))
+
+# Function to get what a worker process needs to log through the parent's queue
+def worker_config():
+    return _queue, dict(_settings)
+
+# Function to run in a worker process (e.g. from a Pool initializer) with worker_config()'s values
+def init_worker(log_queue, settings):
+    if log_queue is not None:
+        _apply(settings, _DeferredQueueHandler(log_queue))
+
+# Function to drain the queue and stop the listener; safe to call more than once
+def shutdown():
+    global _listener, _queue
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _queue = None
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Per-PDF manifest for incremental, resumable runs of scrap_pdf_rmp_reports_to_csv.py.
+
+For every report the manifest records its path, size, mtime, content hash, parse
+status, output row counts and the parsed per-facility result. A later run only
+scrapes reports that are new, changed, failed, quarantined or were parsed by an
+older parser, and carries the stored results of every other facility forward.
+Results are committed as soon as each PDF is scraped, so an interrupted run resumes
+where it stopped.
+"""
+import json
+import os
+import sqlite3
+import time
+import zlib
+import pdf_text_cache
+
+
+class ScrapeManifest:
+    def __init__(self, path, parser_version):
+        self.path = path
+        self.parser_version = str(parser_version)  # e.g. "1-pymupdf-1.24.10-clip-..." with clipped page bands
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode = WAL;")
+        self.conn.execute("PRAGMA synchronous = NORMAL;")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS manifest (
+                path TEXT PRIMARY KEY,
+                facility_id TEXT,
+                size INTEGER,
+                mtime_ns INTEGER,
+                pdf_hash TEXT,
+                parser_version TEXT,
+                status TEXT,
+                chemicals INTEGER,
+                naics INTEGER,
+                accidents INTEGER,
+                accident_chemicals INTEGER,
+                result BLOB,
+                updated_at TEXT
+            );
+        """)
+        self.conn.commit()
+
+    # Function to check whether the stored result for a PDF can be carried forward
+    def is_current(self, pdf_file):
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, pdf_hash, parser_version, status FROM manifest WHERE path = ?",
+            (os.path.abspath(pdf_file),)).fetchone()
+        # str(): manifests created before the column was TEXT stored "1" as the integer 1
+        if not row or str(row[3]) != self.parser_version or row[4] in ("error", "quarantined"):
+            return False
+        st = os.stat(pdf_file)
+        if row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return True
+        # The file was touched; only rescrape it if the content really changed
+        if pdf_text_cache.file_hash(pdf_file) != row[2]:
+            return False
+        self.conn.execute("UPDATE manifest SET size = ?, mtime_ns = ? WHERE path = ?",
+                          (st.st_size, st.st_mtime_ns, os.path.abspath(pdf_file)))
+        self.conn.commit()
+        return True
+
+    # Function to record a freshly scraped facility result
+    def store(self, result):
+        pdf_file = result["pdf_file"]
+        st = os.stat(pdf_file)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                os.path.abspath(pdf_file),
+                result["facility_id"],
+                st.st_size,
+                st.st_mtime_ns,
+                pdf_text_cache.file_hash(pdf_file),
+                self.parser_version,
+                result["status"],
+                len(result["chemicals"]),
+                len(result["naics"]),
+                len(result["accidents"]),
+                sum(len(chems) for chems in result["accident_chemicals"]),
+                zlib.compress(json.dumps(result).encode("utf-8")),
+                time.strftime("%Y-%m-%d %H:%M:%S")
+            ))
+        self.conn.commit()
+
+    # Function to load the stored result for a PDF
+    def load(self, pdf_file):
+        row = self.conn.execute("SELECT result FROM manifest WHERE path = ?", (os.path.abspath(pdf_file),)).fetchone()
+        result = json.loads(zlib.decompress(row[0]).decode("utf-8"))
+        result["pdf_file"] = pdf_file
+        result["pdf_time"] = None  # Not extracted during this run
+        result["timings"] = None
+        return result
+
+    # Function to forget reports that are no longer in the archive. When pdf_files only lists a slice of it (a shard),
+    # in_slice(path) tells which paths belong to that slice: the others are kept
+    def prune(self, pdf_files, in_slice=None):
+        keep = {os.path.abspath(f) for f in pdf_files}
+        stale = [path for (path,) in self.conn.execute("SELECT path FROM manifest")
+                 if path not in keep and (in_slice is None or in_slice(path))]
+        self.conn.executemany("DELETE FROM manifest WHERE path = ?", [(path,) for path in stale])
+        self.conn.commit()
+        return len(stale)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Per-stage timing and throughput metrics for scrap_pdf_rmp_reports_to_csv.py.
+
+Each scraped facility result carries a "timings" dict (seconds per stage: open,
+extract, slice, parse_chemicals, parse_naics, parse_accidents,
+parse_accident_chemicals, plus the merge stage's write). RunMetrics adds these up
+over the run and produces a JSON run report with per-stage totals, a histogram of
+the time per PDF, the slowest PDFs and the throughput per state, so runs can be
+compared with each other. ProgressLine prints a live progress/ETA line.
+"""
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+STAGES = ["open", "extract", "slice", "parse_chemicals", "parse_naics", "parse_accidents", "parse_accident_chemicals", "write"]
+
+# Upper bounds (seconds) of the per-PDF time histogram buckets; the last bucket is open-ended
+HISTOGRAM_BOUNDS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+
+class StageTimer:
+    """Adds up the time spent in each named stage."""
+
+    def __init__(self, timings=None):
+        self.timings = timings if timings is not None else {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+
+class RunMetrics:
+    """Collects the timings of every scraped PDF and summarizes them."""
+
+    def __init__(self, input_dir, top_n=20):
+        self.input_dir = input_dir
+        self.top_n = top_n
+        self.started = time.time()
+        self.stage_totals = dict.fromkeys(STAGES, 0.0)
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.pdf_times = []  # (seconds, pdf_file), only for PDFs scraped during this run
+        self.states = {}
+        self.carried_forward = 0
+        self.quarantined = 0
+
+    # Function to get the state folder of a report, e.g. reports/AK/1000....pdf -> AK
+    def state_of(self, pdf_file):
+        relative = os.path.relpath(pdf_file, self.input_dir)
+        parts = relative.split(os.sep)
+        return parts[0] if len(parts) > 1 else ""
+
+    def add(self, result):
+        if result["status"] == "quarantined":
+            self.quarantined += 1
+            return
+        timings = result.get("timings")
+        if not timings:
+            # Carried forward from the manifest, nothing was scraped
+            self.carried_forward += 1
+            return
+        for name, seconds in timings.items():
+            self.stage_totals[name] = self.stage_totals.get(name, 0.0) + seconds
+        seconds = sum(timings.values())
+        self.pdf_times.append((seconds, result["pdf_file"]))
+        bucket = 0
+        while bucket < len(HISTOGRAM_BOUNDS) and seconds >= HISTOGRAM_BOUNDS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+        state = self.states.setdefault(self.state_of(result["pdf_file"]), {"pdfs": 0, "seconds": 0.0, "bytes": 0})
+        state["pdfs"] += 1
+        state["seconds"] += seconds
+        state["bytes"] += result.get("pdf_bytes") or 0
+
+    def histogram_rows(self):
+        rows = []
+        lower = 0
+        for bound, count in zip(HISTOGRAM_BOUNDS + [None], self.histogram):
+            rows.append({"from_seconds": lower, "to_seconds": bound, "pdfs": count})
+            lower = bound
+        return rows
+
+    def slowest(self):
+        return [{"pdf_file": pdf_file, "seconds": round(seconds, 4)}
+                for seconds, pdf_file in sorted(self.pdf_times, reverse=True)[:self.top_n]]
+
+    def state_rows(self):
+        rows = {}
+        for state, s in sorted(self.states.items()):
+            rows[state] = {
+                "pdfs": s["pdfs"],
+                "seconds": round(s["seconds"], 4),
+                "megabytes": round(s["bytes"] / 1e6, 3),
+                "docs_per_sec": round(s["pdfs"] / s["seconds"], 2) if s["seconds"] else None,
+                "mb_per_sec": round(s["bytes"] / 1e6 / s["seconds"], 3) if s["seconds"] else None
+            }
+        return rows
+
+    def report(self, **extra):
+        wall = time.time() - self.started
+        scraped = len(self.pdf_times)
+        busy = sum(self.stage_totals.values())
+        return {
+            "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+            "wall_seconds": round(wall, 3),
+            "pdfs_scraped": scraped,
+            "pdfs_carried_forward": self.carried_forward,
+            "pdfs_quarantined": self.quarantined,
+            "docs_per_sec": round(scraped / wall, 2) if wall else None,
+            # Stage times are summed over all workers, so with --workers they exceed wall_seconds
+            "stages": {name: {"seconds": round(total, 4),
+                              "mean_ms": round(total * 1000 / scraped, 3) if scraped else None,
+                              "share": round(total / busy, 4) if busy else None}
+                       for name, total in self.stage_totals.items()},
+            "histogram": self.histogram_rows(),
+            "slowest": self.slowest(),
+            "states": self.state_rows(),
+            **extra
+        }
+
+    def write_report(self, path, **extra):
+        report = self.report(**extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+
+class ProgressLine:
+    """Live "done/total, rate, ETA" line on stderr; redrawn in place on a terminal, else printed every interval seconds."""
+
+    def __init__(self, total, enabled=True, interval=None, stream=sys.stderr):
+        self.total = total
+        self.enabled = enabled and total > 0
+        self.stream = stream
+        self.tty = stream.isatty()
+        self.interval = interval if interval is not None else (0.5 if self.tty else 30)
+        self.done = 0
+        self.started = time.time()
+        self._last = 0.0
+
+    def update(self, count=1):
+        self.done += count
+        now = time.time()
+        if self.enabled and (now - self._last >= self.interval or self.done == self.total):
+            self._last = now
+            self._draw(now)
+
+    def _draw(self, now):
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0
+        eta = (self.total - self.done) / rate if rate else 0
+        line = (f"[{self.done:>{len(str(self.total))}}/{self.total}] {self.done / self.total:6.1%}  "
+                f"{rate:7.1f} PDFs/s  elapsed {format_seconds(elapsed)}  ETA {format_seconds(eta)}")
+        self.stream.write(f"\r{line}" if self.tty else f"{line}\n")
+        self.stream.flush()
+
+    def close(self):
+        if self.enabled and self.tty:
+            self.stream.write("\n")
+            self.stream.flush()
+
+
+# Function to format seconds as H:MM:SS
+def format_seconds(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02}:{seconds % 60:02}"
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Row record types of the six scraped tables.
+
+Each table row is a named tuple: no per-row __dict__, well under half the memory of
+the equivalent dict, and fields read by name (row.chemical_id) or by position. The
+field order of each record is the column order of its table, shared by every sink
+(scraper_sinks.TABLE_COLUMNS), the CSV files and the CREATE TABLE statements in
+rmp_schema.py, so a record is written out as it is, without looking up its columns.
+
+The parsers still build plain dicts per PDF, as they fill them in key by key and the
+results travel through the worker pool and the manifest as JSON; the merge stage
+turns them into records once the IDs are known.
+"""
+from typing import NamedTuple, Optional
+
+
+class ChemicalRow(NamedTuple):
+    chemical_id: int
+    chemical_name: Optional[str]
+    cas_number: Optional[str]
+    flammable_toxic: Optional[str]
+
+
+class FacilityChemicalRow(NamedTuple):
+    facility_chemical_id: int
+    facility_id: str
+    chemical_id: int
+    program_level: Optional[str]
+
+
+class NaicsRow(NamedTuple):
+    naics_code: str
+    naics_description: Optional[str]
+
+
+class FacilityNaicsRow(NamedTuple):
+    facility_naics_id: int
+    facility_id: str
+    naics_code: Optional[str]
+
+
+class FacilityAccidentRow(NamedTuple):
+    facility_accident_id: str
+    accident_id: str
+    facility_id: str
+    date_of_accident: Optional[str]
+    time_accident_began: Optional[str]
+    release_duration: Optional[str]
+    naics_code: Optional[str]
+
+
+class AccidentChemicalRow(NamedTuple):
+    accident_chemical_id: int
+    facility_accident_chemical_id: str
+    facility_accident_id: str
+    quantity_released_lbs: Optional[str]
+    percent_weight: Optional[str]
+    chemical_id: int
+
+
+# Record type of each table
+TABLE_RECORDS = {
+    "rmp_chemical": ChemicalRow,
+    "rmp_facility_chemicals": FacilityChemicalRow,
+    "rmp_naics": NaicsRow,
+    "rmp_facility_naics": FacilityNaicsRow,
+    "rmp_facility_accidents": FacilityAccidentRow,
+    "rmp_accident_chemicals": AccidentChemicalRow
+}
+
+
+# Function to build a record from a dict holding (at least) its fields; missing fields are None
+def record_from_dict(record_type, row):
+    return record_type._make(row.get(field) for field in record_type._fields)
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+Sharded scraping of the report archive, and the merge of the shards.
+
+The archive is laid out as reports/<STATE>/<facility_id>.pdf, so a shard is either a
+list of states ("AK,AL,AZ") or one hash bucket of N ("3/8", buckets 0 to N-1, by a
+hash of the facility ID, which every machine computes the same way). Each machine
+runs scrap_pdf_rmp_reports_to_csv.py --shard SPEC --output-dir DIR on its slice, and
+the merge combines the shard directories into the final tables:
+
+    python scrape_shards.py shards/0 shards/1 shards/2 --output-dir merged
+
+The shards are merged in the order given. Chemicals and NAICS codes are deduplicated
+by CAS number and NAICS code. When shards disagree on a name or description, the
+smallest row (by its values) is kept whatever the shard order; a single full run
+keeps the first one in glob order instead, so those rmp_chemical and rmp_naics rows
+can differ from it (the IDs and other tables don't). A facility found in more than
+one shard (overlapping specs) is taken from the first. The row IDs the shards
+handed out are discarded: every row gets its ID again from the same content key as in
+scrap_pdf_rmp_reports_to_csv.py, through the ID registry (see stable_ids.py), so the
+merged tables carry the IDs a single full run with that registry would have given.
+"""
+import argparse
+import csv
+import hashlib
+import os
+import time
+from collections import Counter
+import rmp_publish
+import scraper_sinks
+from scrape_records import TABLE_RECORDS, record_from_dict
+from stable_ids import IdRegistry, seed_registry
+
+# File name of each scraped table inside a shard (and the merged) directory
+table_files = {table: f"{table}.csv" for table in scraper_sinks.TABLE_COLUMNS}
+# Written by scrap_accidents_details_to_csv.py; concatenated by the merge when the shards have it
+details_file = "rmp_accident_history_detailed.csv"
+id_registry_file = "rmp_id_registry.sqlite"
+
+
+class Shard:
+    """A slice of the archive: a set of states, or one hash bucket of N."""
+
+    def __init__(self, states=None, bucket=None, buckets=None):
+        self.states = states
+        self.bucket = bucket
+        self.buckets = buckets
+
+    def __str__(self):
+        if self.states is not None:
+            return ",".join(sorted(self.states))
+        return f"{self.bucket}/{self.buckets}"
+
+    # Function to tell whether a report (a path under root) belongs to this shard
+    def contains(self, pdf_file, root):
+        if self.states is not None:
+            return report_state(pdf_file, root) in self.states
+        facility_id = os.path.basename(pdf_file).replace(".pdf", "")
+        return hash_bucket(facility_id, self.buckets) == self.bucket
+
+
+# Function to parse a shard spec: "AK,AL" (states) or "3/8" (hash bucket 3 of 8)
+def parse_shard(spec):
+    if "/" in spec:
+        bucket, buckets = spec.split("/", 1)
+        try:
+            bucket, buckets = int(bucket), int(buckets)
+        except ValueError:
+            raise ValueError(f"Bad shard spec {spec!r}: expected BUCKET/BUCKETS, e.g. 3/8")
+        if buckets < 1 or not 0 <= bucket < buckets:
+            raise ValueError(f"Bad shard spec {spec!r}: the bucket must be between 0 and {buckets - 1}")
+        return Shard(bucket=bucket, buckets=buckets)
+    states = {state.strip().upper() for state in spec.split(",") if state.strip()}
+    if not states:
+        raise ValueError(f"Bad shard spec {spec!r}: expected a list of states, e.g. AK,AL")
+    return Shard(states=states)
+
+# Function to get the state folder of a report, or "" for a report directly under root
+def report_state(pdf_file, root):
+    parts = os.path.relpath(pdf_file, root).split(os.sep)
+    return parts[0].upper() if len(parts) > 1 else ""
+
+# Function to get the hash bucket of a facility; unlike hash(), the same on every machine and run
+def hash_bucket(facility_id, buckets):
+    digest = hashlib.blake2b(facility_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % buckets
+
+# Function to keep the reports of a list that belong to a shard
+def select(pdf_files, root, shard):
+    return [pdf_file for pdf_file in pdf_files if shard.contains(pdf_file, root)]
+
+# Function to read one table of a shard as records; empty fields become None, as they were scraped
+def read_table(shard_dir, table):
+    path = os.path.join(shard_dir, table_files[table])
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{shard_dir} has no {table_files[table]}; is it a scraper output directory?")
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield record_from_dict(TABLE_RECORDS[table], {column: (value if value != "" else None) for column, value in row.items()})
+
+# Function to list the facilities a shard has rows for
+def shard_facilities(shard_dir):
+    facilities = set()
+    for table in ("rmp_facility_chemicals", "rmp_facility_naics", "rmp_facility_accidents"):
+        facilities.update(row.facility_id for row in read_table(shard_dir, table))
+    return facilities
+
+# Function to choose between the rows of the same chemical or NAICS code from two shards: the smallest by
+# their values, so the merged row doesn't depend on the order the shards are given in
+def preferred_row(current, candidate):
+    values = lambda row: tuple("" if value is None else str(value) for value in row)
+    return candidate if values(candidate) < values(current) else current
+
+# Function to merge one shard into the sinks, re-deriving every ID; returns the number of rows written per table.
+# The chemicals (CAS number -> row) and NAICS codes (code -> row) are only collected: write_reference_rows writes
+# them once every shard is merged
+def merge_shard(shard_dir, sinks, ids, chemicals, naics, skip_facilities):
+    written = Counter()
+    # The shard's chemical IDs only serve to find the CAS number, the key of the merged ID
+    cas_by_shard_id = {}
+    for row in read_table(shard_dir, "rmp_chemical"):
+        cas_by_shard_id[row.chemical_id] = row.cas_number
+        if row.cas_number in chemicals:
+            chemicals[row.cas_number] = preferred_row(chemicals[row.cas_number], row._replace(chemical_id=chemicals[row.cas_number].chemical_id))
+        else:
+            chemicals[row.cas_number] = row._replace(chemical_id=ids.id_for("chemical", row.cas_number))
+            written["rmp_chemical"] += 1
+    for row in read_table(shard_dir, "rmp_naics"):
+        if row.naics_code in naics:
+            naics[row.naics_code] = preferred_row(naics[row.naics_code], row)
+        else:
+            naics[row.naics_code] = row
+            written["rmp_naics"] += 1
+
+    occurrences = Counter()  # The same link listed twice in a report gets two IDs, as in the scraper
+    for row in read_table(shard_dir, "rmp_facility_chemicals"):
+        if row.facility_id in skip_facilities:
+            continue
+        cas_number = cas_by_shard_id[row.chemical_id]
+        link = (row.facility_id, cas_number, row.program_level)
+        occurrences[link] += 1
+        sinks["rmp_facility_chemicals"].write(row._replace(facility_chemical_id=ids.id_for("facility_chemical", *link, occurrences[link]),
+                                                           chemical_id=chemicals[cas_number].chemical_id))
+        written["rmp_facility_chemicals"] += 1
+
+    occurrences = Counter()
+    for row in read_table(shard_dir, "rmp_facility_naics"):
+        if row.facility_id in skip_facilities:
+            continue
+        link = (row.facility_id, row.naics_code)
+        occurrences[link] += 1
+        sinks["rmp_facility_naics"].write(row._replace(facility_naics_id=ids.id_for("facility_naics", *link, occurrences[link])))
+        written["rmp_facility_naics"] += 1
+
+    skip_accidents = set()
+    for row in read_table(shard_dir, "rmp_facility_accidents"):
+        if row.facility_id in skip_facilities:
+            skip_accidents.add(row.facility_accident_id)
+            continue
+        sinks["rmp_facility_accidents"].write(row)
+        written["rmp_facility_accidents"] += 1
+
+    ordinals = Counter()  # Position of each chemical within its accident
+    for row in read_table(shard_dir, "rmp_accident_chemicals"):
+        if row.facility_accident_id in skip_accidents:
+            continue
+        ordinals[row.facility_accident_id] += 1
+        sinks["rmp_accident_chemicals"].write(row._replace(accident_chemical_id=ids.id_for("accident_chemical", row.facility_accident_id,
+                                                                                           ordinals[row.facility_accident_id]),
+                                                           chemical_id=chemicals[cas_by_shard_id[row.chemical_id]].chemical_id))
+        written["rmp_accident_chemicals"] += 1
+    return written
+
+# Function to write the chemicals and NAICS codes collected from all the shards, in the order they were first seen
+def write_reference_rows(sinks, chemicals, naics):
+    for row in chemicals.values():
+        sinks["rmp_chemical"].write(row)
+    for row in naics.values():
+        sinks["rmp_naics"].write(row)
+
+# Function to concatenate the accident details CSVs of the shards that have one, skipping duplicated facilities
+def merge_details(shard_dirs, output_path):
+    paths = [os.path.join(shard_dir, details_file) for shard_dir in shard_dirs if os.path.exists(os.path.join(shard_dir, details_file))]
+    if not paths:
+        return None
+    seen = set()
+    rows = 0
+    with open(output_path, "w", newline="", encoding="utf-8") as out:
+        writer = None
+        for path in paths:
+            with open(path, newline="", encoding="utf-8") as f:
+                reader = csv.DictReader(f)
+                if writer is None:
+                    writer = csv.DictWriter(out, fieldnames=reader.fieldnames, lineterminator=os.linesep)
+                    writer.writeheader()
+                shard_seen = set()
+                for row in reader:
+                    facility_id = row["EPA Facility ID"]
+                    if facility_id in seen:
+                        continue
+                    shard_seen.add(facility_id)
+                    writer.writerow(row)
+                    rows += 1
+                seen |= shard_seen
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the outputs of sharded scraper runs into the final tables.")
+    parser.add_argument("shard_dirs", nargs="+", help="Output directories of the shard runs (--output-dir), merged in this order")
+    parser.add_argument("--output-dir", default=".", help="Directory for the merged CSV files (default: current directory)")
+    parser.add_argument("--id-registry", default=id_registry_file,
+                        help=f"SQLite file keeping the row IDs stable across runs (default: {id_registry_file})")
+    parser.add_argument("--seed-ids", default=None, metavar="SOURCE",
+                        help="Register the IDs published in this directory of CSV files or risk-management-plans.db before deriving new ones "
+                             "(default: the CSV files in --output-dir when the ID registry is empty)")
+    parser.add_argument("--sqlite", default=None, metavar="DB_FILE",
+                        help="Also write the merged tables into a copy of this risk-management-plans.db (DB_FILE.scraped), for the build scripts to finish and publish")
+    parser.add_argument("--parquet", default=None, metavar="DIR",
+                        help="Also write the merged tables as Parquet files into this directory (needs pyarrow)")
+    args = parser.parse_args()
+
+    if args.seed_ids and not os.path.exists(args.seed_ids):
+        parser.error(f"{args.seed_ids} not found")
+    start = time.time()
+    os.makedirs(args.output_dir, exist_ok=True)
+    outputs = {table: os.path.join(args.output_dir, name) for table, name in table_files.items()}
+    if any(os.path.abspath(shard_dir) == os.path.abspath(args.output_dir) for shard_dir in args.shard_dirs):
+        parser.error("--output-dir must not be one of the shard directories")
+    ids = IdRegistry(args.id_registry)
+    # A new registry first takes the IDs already published, so the merged rows keep them
+    seed_source = args.seed_ids or (args.output_dir if len(ids) == 0 else None)
+    if seed_source:
+        for kind, (registered, skipped) in seed_registry(ids, seed_source).items():
+            print(f"Seeded the ID registry from {seed_source}: {registered} {kind} IDs, {skipped} already registered or taken")
+    sinks = scraper_sinks.open_csv_sinks(outputs)
+    sqlite_staging = None
+    if args.sqlite:
+        # Written into a copy of the database, left for the build scripts to build the views on and publish
+        # once the merge succeeds (rmp_publish.scraped_path)
+        sqlite_staging = rmp_publish.start_staging(rmp_publish.scraped_path(args.sqlite), copy_from=args.sqlite)
+        sinks = scraper_sinks.combine_sinks(sinks, scraper_sinks.open_sqlite_sinks(sqlite_staging, list(table_files)))
+    if args.parquet:
+        sinks = scraper_sinks.combine_sinks(sinks, scraper_sinks.open_parquet_sinks(args.parquet, list(table_files)))
+    chemicals = {}  # CAS number -> merged rmp_chemical row
+    naics = {}  # NAICS code -> merged rmp_naics row
+    seen_facilities = set()
+    totals = Counter()
+    try:
+        for shard_dir in args.shard_dirs:
+            facilities = shard_facilities(shard_dir)
+            duplicated = facilities & seen_facilities
+            if duplicated:
+                print(f"{shard_dir}: {len(duplicated)} facilities already merged from an earlier shard are skipped")
+            written = merge_shard(shard_dir, sinks, ids, chemicals, naics, duplicated)
+            seen_facilities |= facilities
+            totals.update(written)
+            print(f"Merged {shard_dir}: {len(facilities - duplicated)} facilities, "
+                  + ", ".join(f"{written[table]} {table}" for table in table_files))
+        write_reference_rows(sinks, chemicals, naics)
+    finally:
+        scraper_sinks.close_sinks(sinks)
+        ids.close()
+    if sqlite_staging is not None:
+        os.replace(sqlite_staging, rmp_publish.scraped_path(args.sqlite))
+    details_rows = merge_details(args.shard_dirs, os.path.join(args.output_dir, details_file))
+
+    print(f"Merged {len(args.shard_dirs)} shards, {len(seen_facilities)} facilities in {time.time() - start:.2f} seconds: "
+          + ", ".join(f"{totals[table]} {table}" for table in table_files))
+    if details_rows is not None:
+        print(f"Merged {details_rows} accident detail rows into {os.path.join(args.output_dir, details_file)}")
+    saved = [args.output_dir] + ([rmp_publish.scraped_path(args.sqlite)] if args.sqlite else []) + ([args.parquet] if args.parquet else [])
+    print(f"Data saved to {', '.join(saved)}")
+    if args.sqlite:
+        print(f"Run create_sqlite_rmp_db_from_csv.py with import_scraped_csvs = False to build the views and publish it as {args.sqlite}")
+
+if __name__ == "__main__":
+    main()
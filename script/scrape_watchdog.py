@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Per-document watchdog for the scrapers.
+
+WatchdogPool runs a function over a list of documents in worker processes, one
+document per worker at a time, and watches every document it hands out. When a
+document runs longer than the time budget, or its worker's resident memory grows
+past the memory budget, the worker is killed and replaced. The document is then
+reported as a Quarantined outcome with the reason instead of a result. A worker
+that dies on its own (e.g. a crash inside PyMuPDF) or a function that raises is
+handled the same way. So one pathological PDF can neither stall nor end the run,
+and the other workers keep going. Outcomes are yielded in input order.
+
+Memory is read from /proc, so the memory budget is only enforced on Linux.
+"""
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+
+QUARANTINE_REASONS = ["timeout", "memory", "crashed", "exception"]
+
+
+class Quarantined:
+    """Outcome of a document that was given up on."""
+
+    def __init__(self, item, reason, detail, seconds, memory_mb=None):
+        self.item = item
+        self.reason = reason  # One of QUARANTINE_REASONS
+        self.detail = detail
+        self.seconds = seconds
+        self.memory_mb = memory_mb
+
+    def record(self):
+        return {"pdf_file": self.item, "reason": self.reason, "detail": self.detail,
+                "seconds": round(self.seconds, 3), "memory_mb": round(self.memory_mb, 1) if self.memory_mb is not None else None}
+
+
+# Function to read the resident memory of a process in MB, or None where /proc isn't available
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError, IndexError):
+        return None
+
+# Function run by each worker process: handle one (index, item) task at a time until it gets None
+def _worker_main(conn, func, initializer, initargs):
+    if initializer is not None:
+        initializer(*initargs)
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        index, item = task
+        try:
+            conn.send((index, True, func(item)))
+        except Exception as e:
+            conn.send((index, False, f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, context, func, initializer, initargs):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, func, initializer, initargs), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None  # (index, item, started) while busy
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class WatchdogPool:
+    """Worker processes that run func(item) under a time and memory budget per item."""
+
+    def __init__(self, func, workers=1, timeout=None, memory_mb=None, initializer=None, initargs=(), poll_interval=0.25):
+        self.func = func
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.initializer = initializer
+        self.initargs = initargs
+        self.poll_interval = poll_interval
+        self.context = multiprocessing.get_context()
+        self._workers = []
+
+    def _start_worker(self):
+        worker = _Worker(self.context, self.func, self.initializer, self.initargs)
+        self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker):
+        worker.stop(kill=True)
+        self._workers.remove(worker)
+        self._start_worker()
+
+    # Function to yield func(item), or a Quarantined outcome, for every item in input order
+    def imap(self, items):
+        items = list(items)
+        outcomes = {}
+        next_task = next_yield = 0
+        while len(self._workers) < min(self.workers, len(items)):
+            self._start_worker()
+        while next_yield < len(items):
+            for worker in self._workers:
+                if worker.task is None and next_task < len(items):
+                    worker.conn.send((next_task, items[next_task]))
+                    worker.task = (next_task, items[next_task], time.monotonic())
+                    next_task += 1
+            while next_yield in outcomes:
+                yield outcomes.pop(next_yield)
+                next_yield += 1
+            if next_yield >= len(items):
+                break
+
+            busy = [worker for worker in self._workers if worker.task is not None]
+            wait_for = self.poll_interval if self.memory_mb else None
+            if self.timeout:
+                now = time.monotonic()
+                remaining = min(worker.task[2] + self.timeout - now for worker in busy)
+                wait_for = max(0.0, remaining if wait_for is None else min(wait_for, remaining))
+            ready = wait([worker.conn for worker in busy] + [worker.process.sentinel for worker in busy], wait_for)
+
+            now = time.monotonic()
+            for worker in busy:
+                index, item, started = worker.task
+                outcome = None
+                if worker.conn in ready:
+                    try:
+                        _, ok, value = worker.conn.recv()
+                        outcome = value if ok else Quarantined(item, "exception", value, now - started)
+                        worker.task = None
+                    except (EOFError, OSError):
+                        pass  # Died while sending; handled as a crash below
+                if outcome is None and worker.process.sentinel in ready:
+                    worker.process.join()
+                    outcome = Quarantined(item, "crashed", f"worker exited with code {worker.process.exitcode}", now - started)
+                    self._replace(worker)
+                elif outcome is None and self.timeout and now - started > self.timeout:
+                    outcome = Quarantined(item, "timeout", f"still running after {self.timeout:g} seconds", now - started, rss_mb(worker.process.pid))
+                    self._replace(worker)
+                elif outcome is None and self.memory_mb:
+                    memory = rss_mb(worker.process.pid)
+                    if memory is not None and memory > self.memory_mb:
+                        outcome = Quarantined(item, "memory", f"worker used {memory:.0f} MB, over the {self.memory_mb:g} MB budget", now - started, memory)
+                        self._replace(worker)
+                if outcome is not None:
+                    outcomes[index] = outcome
+
+    def close(self):
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # On an error (or a generator closed early) the workers may be mid-document, so they are killed
+        if exc_type is None:
+            self.close()
+        else:
+            for worker in self._workers:
+                worker.stop(kill=True)
+            self._workers = []
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming output sinks for the scraper tables.
+
+Rows are buffered per table and written out in batches while the scrape runs, so
+memory stays bounded no matter how many PDFs are processed. Every sink follows the
+same protocol: write(row) buffers a record of the table (see scrape_records.py),
+flush() writes the buffered rows and pushes them to disk, close() flushes and
+releases the sink. Only complete rows are ever written, so whatever is on disk after
+a flush is a valid partial table.
+
+CsvSink writes the classic CSV files. SqliteSink inserts the rows straight into the
+risk-management-plans.db schema (see rmp_schema.py) with executemany, committing in
+large transactions, so the rows don't have to go through CSV text and pandas on the
+way to the database. ParquetSink writes a typed, compressed Parquet file per table
+(the column types come from rmp_schema.py), which pandas, DuckDB or the database
+builder read without parsing any text; it needs pyarrow, which is only imported when
+a Parquet sink is opened. SinkGroup writes each row to several sinks, e.g. SQLite
+plus a CSV side output.
+
+The scraper writes "N/A" for a missing quantity or percentage. The CSV files keep
+it, and reading them back (pandas, or the database builder's bulk load) turns it and
+the other MISSING_VALUES into NULL; the SQLite and Parquet sinks apply the same rule
+(normalize_missing) as they write, so the database is the same whichever way it was
+built.
+"""
+import csv
+import os
+import sqlite3
+import rmp_schema
+from scrape_records import TABLE_RECORDS
+
+# Column order of each output table, shared by every sink: the fields of its record type
+TABLE_COLUMNS = {table: list(record_type._fields) for table, record_type in TABLE_RECORDS.items()}
+# Strings pandas.read_csv reads as missing values; stored as NULL whichever way the tables are loaded
+MISSING_VALUES = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+                  "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+
+
+# Function to replace the values of a row that read as missing in the CSV files ("N/A", "") with None
+def normalize_missing(row):
+    return tuple(None if isinstance(value, str) and value in MISSING_VALUES else value for value in row)
+
+
+class CsvSink:
+    """Writes one table to a CSV file, formatted the same way as DataFrame.to_csv(index=False)."""
+
+    def __init__(self, path, columns, batch_size=1000, append=False):
+        self.path = path
+        self.columns = columns
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self._buffer = []
+        # Same convention as before: append without a header to an existing file
+        write_header = not (append and os.path.exists(path))
+        self._file = open(path, "a" if append else "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file, lineterminator=os.linesep)
+        if write_header:
+            self._writer.writerow(columns)
+            self._file.flush()
+
+    def write(self, row):
+        # Records are in column order already
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._writer.writerows(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SqliteDatabase:
+    """Connection shared by the SqliteSinks of one database; commits every commit_rows inserted rows."""
+
+    def __init__(self, path, commit_rows=100000):
+        self.path = path
+        self.commit_rows = commit_rows
+        # A crash only loses the open transaction, which is at most commit_rows rows
+        self.conn = sqlite3.connect(path)
+        self._pending = 0
+        self._open_sinks = 0
+
+    def insert(self, sql, rows):
+        self.conn.executemany(sql, rows)
+        self._pending += len(rows)
+        if self._pending >= self.commit_rows:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self._pending = 0
+
+    def release(self):
+        # Called by each sink on close; the last one commits and closes the connection
+        self._open_sinks -= 1
+        if self._open_sinks == 0:
+            self.commit()
+            self.conn.close()
+
+
+class SqliteSink:
+    """Inserts one table into a SQLite database, batch_size rows per executemany."""
+
+    def __init__(self, database, table, columns, batch_size=1000):
+        self.database = database
+        self.columns = columns
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self._buffer = []
+        self._closed = False
+        self._sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        database._open_sinks += 1
+
+    def write(self, row):
+        self._buffer.append(normalize_missing(row))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # The rows go into the open transaction; they are on disk once SqliteDatabase commits
+        if self._buffer:
+            self.database.insert(self._sql, self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self.database.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# Function to import pyarrow, which only the Parquet output needs
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet output needs pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+# Function to get the Arrow schema for (column, SQL type) pairs, mapping the types as SQLite's column affinity does
+def arrow_schema(columns):
+    pa = import_pyarrow()
+    fields = []
+    for column, sql_type in columns:
+        sql_type = sql_type.upper()
+        if "INT" in sql_type:
+            fields.append((column, pa.int64()))
+        elif any(name in sql_type for name in ("REAL", "FLOA", "DOUB")):
+            fields.append((column, pa.float64()))
+        else:
+            fields.append((column, pa.string()))
+    return pa.schema(fields)
+
+
+class ParquetSink:
+    """Writes rows to a Parquet file with an Arrow schema, one row group per batch_size rows; the file is complete once closed."""
+
+    def __init__(self, path, schema, batch_size=100000, compression="zstd"):
+        self._pa = import_pyarrow()
+        self.path = path
+        self.schema = schema
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self._buffer = []
+        self._writer = self._pa.parquet.ParquetWriter(path, self.schema, compression=compression)
+
+    def write(self, row):
+        self._buffer.append(normalize_missing(row))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # Parquet is written a row group at a time, so this also ends the current row group
+        if self._buffer:
+            columns = list(zip(*self._buffer))
+            self._writer.write_batch(self._pa.record_batch([self._pa.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+                                                           schema=self.schema))
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        if self._writer is None:
+            return
+        self.flush()
+        self._writer.close()
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SinkGroup:
+    """Writes every row to each of several sinks of the same table."""
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    @property
+    def rows_written(self):
+        return self.sinks[0].rows_written
+
+    def write(self, row):
+        for sink in self.sinks:
+            sink.write(row)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# Function to open a CSV sink for every table in paths_by_table
+def open_csv_sinks(paths_by_table, batch_size=1000, append=False):
+    return {table: CsvSink(path, TABLE_COLUMNS[table], batch_size=batch_size, append=append)
+            for table, path in paths_by_table.items()}
+
+# Function to open a SQLite sink for every table in tables; the tables are dropped and recreated first, so the
+# scrapers point it at a copy of a database that may be served, never at the database (rmp_publish.scraped_path)
+def open_sqlite_sinks(db_path, tables, batch_size=1000, commit_rows=100000):
+    database = SqliteDatabase(db_path, commit_rows=commit_rows)
+    rmp_schema.recreate_tables(database.conn, tables)
+    database.commit()
+    return {table: SqliteSink(database, table, TABLE_COLUMNS[table], batch_size=batch_size) for table in tables}
+
+# Function to open a Parquet sink writing <table>.parquet into a directory for every table in tables
+def open_parquet_sinks(directory, tables, batch_size=100000):
+    os.makedirs(directory, exist_ok=True)
+    return {table: ParquetSink(os.path.join(directory, f"{table}.parquet"), arrow_schema(rmp_schema.table_columns(table)), batch_size=batch_size)
+            for table in tables}
+
+# Function to combine several {table: sink} dicts into one, grouping the sinks of the same table
+def combine_sinks(*sink_dicts):
+    combined = {}
+    for sinks in sink_dicts:
+        for table, sink in sinks.items():
+            combined.setdefault(table, []).append(sink)
+    return {table: group[0] if len(group) == 1 else SinkGroup(group) for table, group in combined.items()}
+
+# Function to flush every sink, e.g. after a facility has been merged
+def flush_sinks(sinks):
+    for sink in sinks.values():
+        sink.flush()
+
+# Function to close every sink, flushing what is still buffered
+def close_sinks(sinks):
+    for sink in sinks.values():
+        sink.close()
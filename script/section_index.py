@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Page index of the numbered sections of every RMP report.
+
+The build step reads every report once (through pdf_text_cache, so it also fills the
+text cache) and records in a small SQLite file the facility ID, path, page count and,
+for each numbered section ("Section 6. Accident History", ...), the first and last
+page it covers. Pages are numbered from 0, as in pdf_text_cache. A section ends on the
+page where the next section starts, so neighbouring ranges share that page.
+
+Scrapers then decode only the pages they need, e.g. just Section 6 for the accident
+details, and pick the reports of a set of facilities without walking the archive.
+Re-running the build only reads reports that are new or changed since the last run:
+
+    python section_index.py --input-dir reports
+"""
+import argparse
+import glob
+import os
+import re
+import sqlite3
+import time
+import pdf_text_cache
+
+input_dir = r"C:\MS Data Science - WMU\EDGI\epa-risk-management-plans\reports"
+index_file = "rmp_section_index.sqlite"
+
+# A section heading is a line of its own, e.g. "Section 9. Emergency Response"
+heading_pattern = re.compile(r"^\s*Section (\d+)\.\s+(.*?)\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+# Function to open (and create if needed) an index file
+def connect(path):
+    conn = sqlite3.connect(path, timeout=60)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS documents (
+            path TEXT PRIMARY KEY,
+            facility_id TEXT,
+            size INTEGER,
+            mtime_ns INTEGER,
+            page_count INTEGER,
+            indexed TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_documents_facility_id ON documents(facility_id);
+        CREATE TABLE IF NOT EXISTS sections (
+            path TEXT,
+            section INTEGER,
+            title TEXT,
+            first_page INTEGER,
+            last_page INTEGER,
+            PRIMARY KEY (path, section)
+        ) WITHOUT ROWID;
+    """)
+    return conn
+
+# Function to find the section headings in the page texts, as (page_no, section, title) in reading order
+def page_headings(page_texts):
+    headings = []
+    for page_no, text in enumerate(page_texts):
+        for match in heading_pattern.finditer(text):
+            headings.append((page_no, int(match.group(1)), match.group(2)))
+    return headings
+
+# Function to turn the headings into {section: (title, first_page, last_page)}.
+# Each occurrence of a heading runs to the page where a different section starts (or the last
+# page); a section repeated further on (e.g. one Section 7 per process) spans all its occurrences.
+def section_ranges(headings, page_count):
+    ranges = {}
+    for i, (page_no, section, title) in enumerate(headings):
+        end = next((later_page for later_page, later_section, _ in headings[i + 1:] if later_section != section), page_count - 1)
+        if section in ranges:
+            first_title, first_page, last_page = ranges[section]
+            ranges[section] = (first_title, first_page, max(last_page, end))
+        else:
+            ranges[section] = (title, page_no, end)
+    return ranges
+
+# Function to index one report; returns False when it is unchanged since it was last indexed
+def index_pdf(conn, pdf_file):
+    path = os.path.abspath(pdf_file)
+    st = os.stat(path)
+    row = conn.execute("SELECT size, mtime_ns FROM documents WHERE path = ?", (path,)).fetchone()
+    if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+        return False
+    page_texts = pdf_text_cache.get_page_texts(path)
+    ranges = section_ranges(page_headings(page_texts), len(page_texts))
+    facility_id = os.path.basename(path).replace(".pdf", "")
+    conn.execute("DELETE FROM sections WHERE path = ?", (path,))
+    conn.execute("INSERT OR REPLACE INTO documents (path, facility_id, size, mtime_ns, page_count, indexed) VALUES (?, ?, ?, ?, ?, ?)",
+                 (path, facility_id, st.st_size, st.st_mtime_ns, len(page_texts), time.strftime("%Y-%m-%d %H:%M:%S")))
+    conn.executemany("INSERT INTO sections (path, section, title, first_page, last_page) VALUES (?, ?, ?, ?, ?)",
+                     [(path, section, title, first, last) for section, (title, first, last) in ranges.items()])
+    return True
+
+
+class SectionIndex:
+    """Read side of an index file, for the scrapers."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = connect(path)
+
+    # Function to list the indexed reports of some facilities as (facility_id, path), in path order
+    def documents(self, facility_ids=None):
+        rows = self.conn.execute("SELECT facility_id, path FROM documents ORDER BY path").fetchall()
+        if facility_ids is None:
+            return rows
+        return [(facility_id, path) for facility_id, path in rows if facility_id in facility_ids]
+
+    # Function to tell whether a report is indexed and unchanged since
+    def is_current(self, pdf_file):
+        path = os.path.abspath(pdf_file)
+        row = self.conn.execute("SELECT size, mtime_ns FROM documents WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return False
+        st = os.stat(path)
+        return row[0] == st.st_size and row[1] == st.st_mtime_ns
+
+    # Function to get the page count of a report, or None if it is not indexed or changed since
+    def page_count(self, pdf_file):
+        if not self.is_current(pdf_file):
+            return None
+        return self.conn.execute("SELECT page_count FROM documents WHERE path = ?", (os.path.abspath(pdf_file),)).fetchone()[0]
+
+    # Function to get the (first_page, last_page) of a section of a report, or None if it has no such section,
+    # is not indexed or changed since
+    def section_pages(self, pdf_file, section):
+        if not self.is_current(pdf_file):
+            return None
+        row = self.conn.execute("SELECT first_page, last_page FROM sections WHERE path = ? AND section = ?",
+                                (os.path.abspath(pdf_file), section)).fetchone()
+        return tuple(row) if row else None
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the page ranges of the numbered sections of the RMP reports.")
+    parser.add_argument("--input-dir", default=input_dir, help="Directory holding the RMP PDF reports")
+    parser.add_argument("--index", default=index_file, help=f"SQLite index file to build or update (default: {index_file})")
+    parser.add_argument("--text-cache", default=pdf_text_cache.cache_file,
+                        help=f"SQLite file caching the extracted page text (default: {pdf_text_cache.cache_file})")
+    parser.add_argument("--no-text-cache", action="store_true", help="Decode every PDF without reading or filling the text cache")
+    args = parser.parse_args()
+    pdf_text_cache.configure(None if args.no_text_cache else args.text_cache)
+
+    start = time.time()
+    pdf_files = sorted(glob.glob(os.path.join(args.input_dir, "**", "*.pdf"), recursive=True))
+    conn = connect(args.index)
+    indexed = errors = 0
+    for pdf_file in pdf_files:
+        try:
+            if index_pdf(conn, pdf_file):
+                indexed += 1
+                if indexed % 1000 == 0:
+                    conn.commit()
+                    print(f"Indexed {indexed} reports...")
+        except Exception as e:
+            errors += 1
+            print(f"Error indexing {pdf_file}: {e}")
+    # Forget reports that are no longer in the archive
+    paths = {os.path.abspath(pdf_file) for pdf_file in pdf_files}
+    gone = [path for (path,) in conn.execute("SELECT path FROM documents") if path not in paths]
+    conn.executemany("DELETE FROM documents WHERE path = ?", [(path,) for path in gone])
+    conn.executemany("DELETE FROM sections WHERE path = ?", [(path,) for path in gone])
+    conn.commit()
+    conn.close()
+    print(f"Indexed {indexed} new or changed reports, {len(pdf_files) - indexed - errors} unchanged, {len(gone)} removed, "
+          f"{errors} errors in {time.time() - start:.2f} seconds; saved to {args.index}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Single-pass "Label: value" parser for the sections of an RMP report.
+
+A parser is built from a declarative field table. Parsing walks the text once to
+find every label occurrence (labels all end in ":", so only the colons have to be
+looked at), then reads each value with one precompiled, anchored pattern. The
+results match the old per-field re.search calls exactly: a label may appear anywhere
+(also inside a longer label, e.g. "Deaths:" in "Public Deaths:"), matching is
+case-insensitive, and a field takes the first occurrence whose value fits its pattern.
+"""
+import bisect
+import re
+import string
+
+# Each field is (columns, label, value_pattern, required).
+# columns is a column name, or a tuple of names for a pattern with several groups.
+# required=True means: if the label appears, one of its occurrences must carry a valid
+# value, otherwise ValueError is raised (the old code failed with an AttributeError).
+YES_NO_NA = r"(Yes|No|N/A)"
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_COLON = re.compile(":")
+_SUFFIX_LEN = 4  # Labels are bucketed by their last characters, colon included
+
+
+class SectionParser:
+    def __init__(self, fields, header=None):
+        """fields is the field table; header is an optional (column, label, value_pattern)
+        whose occurrences start a new block, e.g. "Accident History ID: Accident N"."""
+        self.fields = [(columns if isinstance(columns, tuple) else (columns,), label, label.lower(), len(label),
+                        re.compile(r"\s*" + value, re.IGNORECASE), required)
+                       for columns, label, value, required in fields]
+        self.header = None
+        labels = [field[1] for field in self.fields]
+        if header is not None:
+            column, label, value = header
+            self.header = (column, label, re.compile(value, re.IGNORECASE))
+            labels.append(label)
+        self._by_suffix = {}
+        for label in set(labels):
+            key = label.lower()
+            self._by_suffix.setdefault(key[-_SUFFIX_LEN:], []).append(key)
+
+    # Function to find the end offset of every label occurrence, in one pass over the text
+    def scan(self, text):
+        lower = text.translate(_ASCII_LOWER)
+        found = {}
+        by_suffix = self._by_suffix
+        for m in _COLON.finditer(lower):
+            end = m.end()
+            candidates = by_suffix.get(lower[end - _SUFFIX_LEN:end])
+            if candidates:
+                for label in candidates:
+                    if lower.endswith(label, 0, end):
+                        found.setdefault(label, []).append(end)
+        return found
+
+    # Function to read the fields of one block, text[start:end]
+    def _read_block(self, text, found, start, end, record):
+        for columns, label, key, length, pattern, required in self.fields:
+            ends = found.get(key)
+            values = None
+            seen = False
+            if ends:
+                i = bisect.bisect_left(ends, start + length)
+                while i < len(ends) and ends[i] <= end:
+                    seen = True
+                    m = pattern.match(text, ends[i], end)
+                    if m:
+                        values = [g.strip() for g in m.groups()]
+                        break
+                    i += 1
+            if values is None and seen and required:
+                raise ValueError(f"'{label}' found but no value matching {pattern.pattern[3:]!r}")
+            for j, column in enumerate(columns):
+                record[column] = values[j] if values else None
+        return record
+
+    # Function to parse text holding a single record
+    def parse(self, text):
+        return self._read_block(text, self.scan(text), 0, len(text), {})
+
+    # Function to split text into header-delimited blocks and parse each one
+    def parse_blocks(self, text):
+        found = self.scan(text)
+        column, label, pattern = self.header
+        starts = []
+        for label_end in found.get(label.lower(), []):
+            m = pattern.match(text, label_end)
+            if m:
+                starts.append((label_end - len(label), m.group(1)))
+        records = []
+        for i, (start, header_value) in enumerate(starts):
+            end = starts[i + 1][0] if i + 1 < len(starts) else len(text)
+            records.append(self._read_block(text, found, start, end, {column: header_value}))
+        return records
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Content-derived, stable row IDs for the scraped tables.
+
+Every integer ID is derived from the content of the row it identifies, never from
+the order in which the PDFs were found or parsed:
+
+- rmp_chemical.chemical_id: the CAS number
+- rmp_facility_chemicals.facility_chemical_id: facility ID, CAS number, program level
+- rmp_facility_naics.facility_naics_id: facility ID, NAICS code
+- rmp_accident_chemicals.accident_chemical_id: facility accident ID, ordinal
+
+Links listed more than once in the same report also get their occurrence number
+(1, 2, ...) in the key, so each of them still gets its own row. The ID is a BLAKE2b
+hash of the kind and key, cut to 53 bits so it survives the JavaScript number type
+in the datasette pages. Parallel, partial and sharded runs therefore agree on every
+ID without any coordination.
+
+IdRegistry records the IDs it hands out in a small SQLite file. A key seen in an
+earlier run always gets its recorded ID back, so IDs stay the same across rebuilds;
+the rare new key whose hash is already taken within its kind moves on to the next
+free value.
+
+The IDs published before this scheme were sequential. seed_registry registers them
+under the content key of their rows, read from the scraper's CSV files or from a
+risk-management-plans.db, so a re-scrape gives those rows their published ID back and
+only derives IDs for new rows. The scrapers seed an empty registry from the CSV files
+in their output directory; to seed from elsewhere:
+
+    python stable_ids.py rmp_id_registry.sqlite ../data
+    python stable_ids.py rmp_id_registry.sqlite ../rmp/risk-management-plans.db
+"""
+import argparse
+import csv
+import hashlib
+import os
+import sqlite3
+import time
+from collections import Counter
+
+MAX_ID = 2 ** 53 - 1
+KEY_SEPARATOR = "\x1f"
+
+
+# Function to derive the ID of a key, before the registry resolves collisions
+def derive_id(kind, key):
+    digest = hashlib.blake2b(f"{kind}{KEY_SEPARATOR}{key}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % MAX_ID + 1
+
+
+class IdRegistry:
+    """Hands out content-derived IDs and, given a path, keeps them stable across runs."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._ids = {}  # (kind, key) -> ID
+        self._taken = {}  # kind -> IDs in use
+        self._new = []  # (kind, key, ID) not yet saved
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path, timeout=60)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS stable_ids (
+                    kind TEXT,
+                    key TEXT,
+                    id INTEGER,
+                    created TEXT,
+                    PRIMARY KEY (kind, key),
+                    UNIQUE (kind, id)
+                )
+            """)
+            for kind, key, value in self.conn.execute("SELECT kind, key, id FROM stable_ids"):
+                self._ids[kind, key] = value
+                self._taken.setdefault(kind, set()).add(value)
+
+    # Function to get the ID of a key given as parts, e.g. id_for("chemical", cas_number)
+    def id_for(self, kind, *parts):
+        key = KEY_SEPARATOR.join("" if part is None else str(part) for part in parts)
+        value = self._ids.get((kind, key))
+        if value is None:
+            taken = self._taken.setdefault(kind, set())
+            value = derive_id(kind, key)
+            while value in taken:
+                value = value % MAX_ID + 1
+            taken.add(value)
+            self._ids[kind, key] = value
+            self._new.append((kind, key, value))
+        return value
+
+    # Function to record an ID already in use for a key given as parts; returns False (and keeps the registry as it
+    # is) when the key already has an ID or the ID is taken by another key of its kind
+    def register(self, kind, value, *parts):
+        key = KEY_SEPARATOR.join("" if part is None else str(part) for part in parts)
+        taken = self._taken.setdefault(kind, set())
+        if (kind, key) in self._ids or value in taken:
+            return False
+        taken.add(value)
+        self._ids[kind, key] = value
+        self._new.append((kind, key, value))
+        return True
+
+    def __len__(self):
+        return len(self._ids)
+
+    def commit(self):
+        if self.conn is not None and self._new:
+            created = time.strftime("%Y-%m-%d %H:%M:%S")
+            self.conn.executemany("INSERT INTO stable_ids (kind, key, id, created) VALUES (?, ?, ?, ?)",
+                                  [(kind, key, value, created) for kind, key, value in self._new])
+            self.conn.commit()
+        self._new = []
+
+    def close(self):
+        self.commit()
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# Function to read the rows of a published table as dicts, from a directory of the scraper's CSV files or from a
+# SQLite database; None when the source doesn't have the table
+def published_rows(source, table):
+    if os.path.isdir(source):
+        path = os.path.join(source, f"{table}.csv")
+        if not os.path.exists(path):
+            return None
+        with open(path, newline="", encoding="utf-8") as f:
+            return [{column: (value if value != "" else None) for column, value in row.items()} for row in csv.DictReader(f)]
+    conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+            return None
+        cursor = conn.execute(f"SELECT * FROM {table}")
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+    finally:
+        conn.close()
+
+# Function to register the IDs of the published rows of a source under the content keys the scrapers derive them
+# from. Occurrence numbers and ordinals are counted in ID order, the order the rows were scraped in.
+# Returns {kind: [IDs registered, IDs skipped]}
+def seed_registry(registry, source):
+    counts = {}
+
+    def seed(kind, rows, id_column, link, numbered=True):
+        if rows is None:
+            return
+        counts[kind] = [0, 0]
+        occurrences = Counter()
+        for row in sorted(rows, key=lambda row: int(row[id_column])):
+            parts = link(row)
+            occurrences[parts] += 1
+            key = (*parts, occurrences[parts]) if numbered else parts
+            counts[kind][0 if registry.register(kind, int(row[id_column]), *key) else 1] += 1
+
+    chemicals = published_rows(source, "rmp_chemical")
+    cas_numbers = {int(row["chemical_id"]): row["cas_number"] for row in chemicals or []}
+    seed("chemical", chemicals, "chemical_id", lambda row: (row["cas_number"],), numbered=False)
+    seed("facility_chemical", published_rows(source, "rmp_facility_chemicals"), "facility_chemical_id",
+         lambda row: (row["facility_id"], cas_numbers.get(int(row["chemical_id"])), row["program_level"]))
+    seed("facility_naics", published_rows(source, "rmp_facility_naics"), "facility_naics_id",
+         lambda row: (row["facility_id"], row["naics_code"]))
+    seed("accident_chemical", published_rows(source, "rmp_accident_chemicals"), "accident_chemical_id",
+         lambda row: (row["facility_accident_id"],))
+    registry.commit()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Register the row IDs already published in an ID registry, so re-scrapes keep them.")
+    parser.add_argument("registry", help="SQLite ID registry to seed, e.g. rmp_id_registry.sqlite")
+    parser.add_argument("source", help="Directory of the scraper's CSV files, or a risk-management-plans.db")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        parser.error(f"{args.source} not found")
+    registry = IdRegistry(args.registry)
+    counts = seed_registry(registry, args.source)
+    registry.close()
+    for kind, (registered, skipped) in counts.items():
+        print(f"{kind}: registered {registered} IDs, skipped {skipped} (already registered or taken)")
+    print(f"Seeded {args.registry} from {args.source}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Builds a tiny risk-management-plans.db and checks script/rmp_views.py against it:
+the materialized views hold the rows the original SQL views gave, in the same order,
+and refreshing one facility from the scrapers' copy leaves the views and their
+full-text indexes as a full rebuild from that copy would.
+"""
+import os
+import shutil
+import sqlite3
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "script"))
+import rmp_publish  # noqa: E402
+import rmp_schema  # noqa: E402
+import rmp_views  # noqa: E402
+
+# The queries create_sqlite_views_and_fts_tables.py filled the views with before they were built set-based
+ORIGINAL_QUERIES = {
+    "facility_view": """
+    SELECT
+        rmp_facility.epa_facility_id, rmp_facility.report, rmp_facility.facility_name, rmp_facility.facility_address,
+        rmp_facility.city, rmp_facility.state, rmp_facility.county, rmp_facility.zip, rmp_facility.facility_duns,
+        rmp_facility.receipt_date, rmp_facility.report_created_date,
+        (
+            SELECT GROUP_CONCAT(DISTINCT naics_code)
+            FROM rmp_facility_naics
+            WHERE rmp_facility_naics.facility_id = rmp_facility.epa_facility_id
+        ) AS naics_codes,
+        (
+            SELECT GROUP_CONCAT(chemical_name, ', ')
+            FROM (
+                SELECT DISTINCT rc.chemical_name
+                FROM rmp_facility_chemicals rfc
+                JOIN rmp_chemical rc ON rfc.chemical_id = rc.chemical_id
+                WHERE rfc.facility_id = rmp_facility.epa_facility_id
+            )
+        ) AS chemical_names,
+        rmp_facility.latitude, rmp_facility.longitude
+    FROM rmp_facility
+    GROUP BY
+        rmp_facility.epa_facility_id, rmp_facility.report, rmp_facility.facility_name, rmp_facility.facility_address,
+        rmp_facility.city, rmp_facility.state, rmp_facility.county, rmp_facility.zip, rmp_facility.facility_duns,
+        rmp_facility.receipt_date, rmp_facility.report_created_date;""",
+    "facility_accidents_view": """
+    SELECT
+        rfa.facility_accident_id, rfa.accident_id, rfa.facility_id, rf.facility_name, rf.facility_address, rf.city,
+        rf.state, rf.county, rfa.date_of_accident, rfa.time_accident_began, rfa.release_duration, rfa.naics_code,
+        (
+            SELECT GROUP_CONCAT(chemical_name, ', ')
+            FROM (
+                SELECT DISTINCT rc.chemical_name
+                FROM rmp_facility_chemicals rfc
+                JOIN rmp_chemical rc ON rfc.chemical_id = rc.chemical_id
+                WHERE rfc.facility_id = rfa.facility_id
+            )
+        ) AS chemical_names,
+        rf.latitude, rf.longitude
+    FROM rmp_facility_accidents rfa
+    JOIN rmp_facility rf ON rfa.facility_id = rf.epa_facility_id
+    GROUP BY
+        rfa.facility_accident_id, rfa.accident_id, rfa.facility_id, rf.facility_name, rf.facility_address, rf.city,
+        rf.state, rf.county, rfa.date_of_accident, rfa.time_accident_began, rfa.release_duration, rfa.naics_code,
+        rf.latitude, rf.longitude;""",
+    "accident_chemicals_view": """
+    SELECT
+        rac.accident_chemical_id, rfa.accident_id, rfa.facility_id, rf.facility_name, rf.facility_address, rf.city,
+        rf.state, rf.county, rfa.date_of_accident, rc.chemical_name, rac.quantity_released_lbs, rac.percent_weight
+    FROM rmp_accident_chemicals rac
+    LEFT JOIN rmp_facility_accidents rfa ON rac.facility_accident_id = rfa.facility_accident_id
+    LEFT JOIN rmp_facility rf ON rfa.facility_id = rf.epa_facility_id
+    LEFT JOIN rmp_chemical rc ON rac.chemical_id = rc.chemical_id
+    GROUP BY
+        rac.accident_chemical_id, rfa.accident_id, rfa.facility_id, rf.facility_name, rf.facility_address, rf.city,
+        rf.state, rf.county, rfa.date_of_accident, rc.chemical_name, rac.quantity_released_lbs, rac.percent_weight;"""
+}
+# Columns the original views had, in their order (the materialized ones add the typed companion columns)
+ORIGINAL_COLUMNS = {
+    "facility_view": "epa_facility_id, report, facility_name, facility_address, city, state, county, zip, facility_duns, "
+                     "receipt_date, report_created_date, naics_codes, chemical_names, latitude, longitude",
+    "facility_accidents_view": "facility_accident_id, accident_id, facility_id, facility_name, facility_address, city, state, "
+                               "county, date_of_accident, time_accident_began, release_duration, naics_code, chemical_names, "
+                               "latitude, longitude",
+    "accident_chemicals_view": "accident_chemical_id, accident_id, facility_id, facility_name, facility_address, city, state, "
+                               "county, date_of_accident, chemical_name, quantity_released_lbs, percent_weight"
+}
+
+# Base table rows; the IDs are out of order and the lists have repeated values, as in the scraped data
+base_rows = {
+    "rmp_facility": [
+        ("100000000003", "r3", "Gamma Cold Storage", "3 Dock St", "Kodiak", "AK", "Kodiak Island", "99615", None, 57.79, -152.4, "June 2004", "x"),
+        ("100000000001", "r1", "Alpha Seafoods", "1 Pier Rd", "Juneau", "AK", "Juneau", "99801", "00123", 58.3, -134.4, "August 2016", "x"),
+        ("100000000002", "r2", "Beta Chemicals", "2 Plant Ave", "Mobile", "AL", "Mobile", "36601", None, 30.69, -88.04, None, "x")
+    ],
+    "rmp_chemical": [
+        (7, "Ammonia (anhydrous)", "7664-41-7", "Toxic"), (3, "Chlorine", "7782-50-5", "Toxic"), (5, "Propane", "74-98-6", "Flammable"),
+        (9, "Ammonia (anhydrous)", "7664-41-7 ", "Toxic")
+    ],
+    "rmp_facility_chemicals": [
+        (40, "100000000001", 7, "Program Level 3 process"), (12, "100000000001", 5, "Program Level 1 process"),
+        (25, "100000000001", 9, "Program Level 3 process"), (13, "100000000002", 3, "Program Level 3 process"),
+        (14, "100000000002", 7, "Program Level 3 process"), (15, "100000000003", 7, "Program Level 2 process")
+    ],
+    "rmp_naics": [("31171", "Seafood Product Preparation and Packaging"), ("32519", "Other Basic Organic Chemical Manufacturing"),
+                  ("49312", "Refrigerated Warehousing and Storage")],
+    "rmp_facility_naics": [
+        (8, "100000000001", "31171"), (2, "100000000001", "49312"), (5, "100000000001", "31171"), (3, "100000000002", "32519"),
+        (4, "100000000003", "49312")
+    ],
+    "rmp_facility_accidents": [
+        ("100000000001_2", "Accident 2", "100000000001", "March 2019", "14:00", "001 Hours 30 Minutes", "31171"),
+        ("100000000001_1", "Accident 1", "100000000001", "August 2016", "08:30", "000 Hours 05 Minutes", "31171"),
+        ("100000000002_1", "Accident 1", "100000000002", "May 2020", "10:00", None, "32519")
+    ],
+    "rmp_accident_chemicals": [
+        (31, "100000000001_1_1", "100000000001_1", "4034", "100", 7), (30, "100000000001_2_1", "100000000001_2", "N/A", None, 7),
+        (32, "100000000001_2_2", "100000000001_2", "1,200", "2.5", 5), (33, "100000000002_1_1", "100000000002_1", "39", "100", 3),
+        (34, "100000000009_1_1", "100000000009_1", "12", None, 3)  # Its accident is missing: kept with NULLs by the LEFT JOINs
+    ]
+}
+
+
+# Function to build the base tables of the tiny database at path
+def write_base_tables(path):
+    conn = sqlite3.connect(path)
+    rmp_schema.recreate_tables(conn, list(rmp_schema.TABLE_SCHEMAS))
+    for table, rows in base_rows.items():
+        conn.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(rows[0]))})", rows)
+    conn.commit()
+    conn.close()
+
+# Function to materialize the views of a database and build their full-text indexes, as the build scripts do
+def build_views(path):
+    conn = sqlite3.connect(path)
+    rmp_views.materialize_views(conn)
+    for fts_table in rmp_views.FTS_TABLES:
+        rmp_views.create_fts_table(conn, fts_table)
+    conn.close()
+
+# Function to get the rows of a view in rowid order, without the id column of facility_accidents_view
+def view_rows(conn, view, columns=None):
+    return conn.execute(f"SELECT {columns or ORIGINAL_COLUMNS[view]} FROM {view} ORDER BY rowid").fetchall()
+
+# Function to get the rowids each full-text index matches for some terms
+def fts_matches(conn, terms):
+    return {(fts_table, term): sorted(rowid for (rowid,) in conn.execute(f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ?", (term,)))
+            for fts_table in rmp_views.FTS_TABLES for term in terms}
+
+
+def test_materialized_views_match_the_original_queries(tmp_path):
+    db_file = str(tmp_path / "rmp.db")
+    write_base_tables(db_file)
+    build_views(db_file)
+    conn = sqlite3.connect(db_file)
+    for view, query in ORIGINAL_QUERIES.items():
+        assert view_rows(conn, view) == conn.execute(query).fetchall(), view
+    # The accidents are numbered in the order the original INSERT gave them
+    assert [row[0] for row in conn.execute("SELECT id FROM facility_accidents_view ORDER BY rowid")] == [1, 2, 3]
+    assert rmp_publish.integrity_problems(conn) == []
+    conn.close()
+
+
+def test_refresh_from_the_scraped_copy_matches_a_full_rebuild(tmp_path):
+    db_file = str(tmp_path / "rmp.db")
+    write_base_tables(db_file)
+    build_views(db_file)
+    conn = sqlite3.connect(db_file)
+    ids_before = dict(conn.execute("SELECT facility_accident_id, id FROM facility_accidents_view"))
+    conn.close()
+
+    # The scrapers' copy, in which facility 100000000001 was scraped again: a chemical and a NAICS code less, a
+    # new chemical, an accident less, a changed accident and a new one, and an accident chemical ID that moved
+    scraped_file = str(tmp_path / "rmp.db.scraped")
+    shutil.copy(db_file, scraped_file)
+    scraped = sqlite3.connect(scraped_file)
+    scraped.executescript("""
+        DELETE FROM rmp_facility_chemicals WHERE facility_chemical_id = 12;
+        INSERT INTO rmp_chemical VALUES (11, 'Sulfur dioxide', '7446-09-5', 'Toxic');
+        INSERT INTO rmp_facility_chemicals VALUES (41, '100000000001', 11, 'Program Level 3 process');
+        DELETE FROM rmp_facility_naics WHERE facility_naics_id = 8;
+        DELETE FROM rmp_accident_chemicals WHERE facility_accident_id = '100000000001_2';
+        DELETE FROM rmp_facility_accidents WHERE facility_accident_id = '100000000001_2';
+        UPDATE rmp_facility_accidents SET release_duration = '002 Hours 00 Minutes' WHERE facility_accident_id = '100000000001_1';
+        INSERT INTO rmp_facility_accidents VALUES ('100000000001_3', 'Accident 3', '100000000001', 'July 2023', '06:15',
+                                                   '000 Hours 45 Minutes', '31171');
+        INSERT INTO rmp_accident_chemicals VALUES (30, '100000000001_3_1', '100000000001_3', '250', '100', 11);
+    """)
+    scraped.close()
+    rebuilt_file = str(tmp_path / "rebuilt.db")
+    shutil.copy(scraped_file, rebuilt_file)
+    build_views(rebuilt_file)
+
+    conn = sqlite3.connect(db_file)
+    rmp_views.refresh_facilities(conn, ["100000000001"], source_file=scraped_file)
+    rebuilt = sqlite3.connect(rebuilt_file)
+    for table in rmp_schema.TABLE_SCHEMAS:
+        assert sorted(conn.execute(f"SELECT * FROM {table}")) == sorted(rebuilt.execute(f"SELECT * FROM {table}")), table
+    # Same rows as the full rebuild; only the ids of facility_accidents_view differ, as refreshed accidents keep theirs
+    typed_columns = {"facility_view": "receipt_month", "facility_accidents_view": "accident_month, release_duration_minutes",
+                     "accident_chemicals_view": "accident_month, quantity_released_lbs_num, percent_weight_num"}
+    for view, columns in ORIGINAL_COLUMNS.items():
+        columns = f"{columns}, {typed_columns[view]}"
+        assert sorted(view_rows(conn, view, columns), key=repr) == sorted(view_rows(rebuilt, view, columns), key=repr), view
+    ids_after = dict(conn.execute("SELECT facility_accident_id, id FROM facility_accidents_view"))
+    assert ids_after["100000000001_1"] == ids_before["100000000001_1"]
+    assert ids_after["100000000002_1"] == ids_before["100000000002_1"]
+    assert ids_after["100000000001_3"] > max(ids_before.values())
+    # The full-text indexes match their views, and find what the rebuilt ones find
+    assert rmp_publish.integrity_problems(conn) == []
+    terms = ["Sulfur", "Propane", "Ammonia", "Alpha", "July", "March", "002", "250", "Mobile"]
+    matches = fts_matches(conn, terms)
+    assert matches[("accident_chemicals_fts", "Sulfur")] == [30]
+    assert matches[("facility_accidents_fts", "March")] == []
+    rebuilt_ids = dict(rebuilt.execute("SELECT id, facility_accident_id FROM facility_accidents_view"))
+    for (fts_table, term), rowids in fts_matches(rebuilt, terms).items():
+        if fts_table == "facility_accidents_fts":
+            rowids = sorted(ids_after[rebuilt_ids[rowid]] for rowid in rowids)
+        assert matches[fts_table, term] == rowids, (fts_table, term)
+    conn.close()
+    rebuilt.close()
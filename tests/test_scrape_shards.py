@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Merges two small shard outputs with script/scrape_shards.py in both orders: the merged
+tables and their IDs must not depend on the order the shards are given in, including
+when the shards disagree on a chemical name or a NAICS description.
+"""
+import csv
+import os
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "script"))
+import scraper_sinks  # noqa: E402
+import stable_ids  # noqa: E402
+from scrape_records import (ChemicalRow, FacilityChemicalRow, NaicsRow, FacilityNaicsRow, FacilityAccidentRow,  # noqa: E402
+                            AccidentChemicalRow)
+
+# Two shard outputs. Their IDs are their own (the shards' registries differ): ammonia is chemical 5 in
+# one and 9 in the other, where 5 is chlorine. They name ammonia and describe NAICS 31171 differently
+shards = {
+    "ak": {
+        "rmp_chemical": [ChemicalRow(5, "Ammonia (anhydrous)", "7664-41-7", "Toxic")],
+        "rmp_facility_chemicals": [FacilityChemicalRow(11, "100000000001", 5, "Program Level 3 process"),
+                                   FacilityChemicalRow(12, "100000000001", 5, "Program Level 3 process")],
+        "rmp_naics": [NaicsRow("31171", "Seafood Product Preparation and Packaging")],
+        "rmp_facility_naics": [FacilityNaicsRow(21, "100000000001", "31171")],
+        "rmp_facility_accidents": [FacilityAccidentRow("100000000001_1", "Accident 1", "100000000001", "August 2016", "08:30",
+                                                       "000 Hours 05 Minutes", "31171")],
+        "rmp_accident_chemicals": [AccidentChemicalRow(31, "100000000001_1_1", "100000000001_1", "39", "100", 5)]
+    },
+    "al": {
+        "rmp_chemical": [ChemicalRow(5, "Chlorine", "7782-50-5", "Toxic"), ChemicalRow(9, "Ammonia", "7664-41-7", "Toxic")],
+        "rmp_facility_chemicals": [FacilityChemicalRow(11, "100000000002", 9, "Program Level 2 process"),
+                                   FacilityChemicalRow(12, "100000000002", 5, "Program Level 3 process")],
+        "rmp_naics": [NaicsRow("31171", "Seafood Product Preparation"), NaicsRow("32519", "Other Basic Organic Chemical Manufacturing")],
+        "rmp_facility_naics": [FacilityNaicsRow(21, "100000000002", "32519"), FacilityNaicsRow(22, "100000000002", "31171")],
+        "rmp_facility_accidents": [FacilityAccidentRow("100000000002_1", "Accident 1", "100000000002", "May 2020", "10:00", None, "32519")],
+        "rmp_accident_chemicals": [AccidentChemicalRow(31, "100000000002_1_1", "100000000002_1", "1200", None, 5),
+                                   AccidentChemicalRow(32, "100000000002_1_2", "100000000002_1", "N/A", "2.5", 9)]
+    }
+}
+
+
+# Function to write a shard output directory, as scrap_pdf_rmp_reports_to_csv.py --output-dir does
+def write_shard(directory, tables):
+    os.makedirs(directory)
+    sinks = scraper_sinks.open_csv_sinks({table: os.path.join(directory, f"{table}.csv") for table in tables})
+    for table, rows in tables.items():
+        for row in rows:
+            sinks[table].write(row)
+    scraper_sinks.close_sinks(sinks)
+
+# Function to merge shard directories in the given order with a fresh ID registry; returns the merged CSV rows per table
+def merge(tmp_path, name, shard_dirs):
+    output_dir = str(tmp_path / name)
+    subprocess.run([sys.executable, os.path.join(root, "script", "scrape_shards.py"), *shard_dirs, "--output-dir", output_dir,
+                    "--id-registry", str(tmp_path / f"{name}.sqlite")], check=True, capture_output=True)
+    tables = {}
+    for table in scraper_sinks.TABLE_COLUMNS:
+        with open(os.path.join(output_dir, f"{table}.csv"), newline="", encoding="utf-8") as f:
+            tables[table] = list(csv.reader(f))
+    return tables
+
+
+def test_merge_does_not_depend_on_the_shard_order(tmp_path):
+    shard_dirs = []
+    for name, tables in shards.items():
+        shard_dirs.append(str(tmp_path / name))
+        write_shard(shard_dirs[-1], tables)
+
+    forward = merge(tmp_path, "forward", shard_dirs)
+    backward = merge(tmp_path, "backward", shard_dirs[::-1])
+    for table in scraper_sinks.TABLE_COLUMNS:
+        assert forward[table][0] == backward[table][0] == scraper_sinks.TABLE_COLUMNS[table]
+        assert sorted(forward[table][1:]) == sorted(backward[table][1:]), table
+
+    # The rows carry the IDs derived from their content, not the shards' IDs
+    ammonia_id = str(stable_ids.derive_id("chemical", "7664-41-7"))
+    chlorine_id = str(stable_ids.derive_id("chemical", "7782-50-5"))
+    assert sorted(forward["rmp_chemical"][1:]) == sorted([[ammonia_id, "Ammonia", "7664-41-7", "Toxic"],
+                                                          [chlorine_id, "Chlorine", "7782-50-5", "Toxic"]])
+    assert sorted(forward["rmp_naics"][1:]) == [["31171", "Seafood Product Preparation"],
+                                                ["32519", "Other Basic Organic Chemical Manufacturing"]]
+    assert sorted(row[0] for row in forward["rmp_facility_chemicals"][1:]) == sorted(
+        str(stable_ids.derive_id("facility_chemical", stable_ids.KEY_SEPARATOR.join(key))) for key in [
+            ("100000000001", "7664-41-7", "Program Level 3 process", "1"),
+            ("100000000001", "7664-41-7", "Program Level 3 process", "2"),
+            ("100000000002", "7664-41-7", "Program Level 2 process", "1"),
+            ("100000000002", "7782-50-5", "Program Level 3 process", "1")])
+    assert sorted((row[0], row[5]) for row in forward["rmp_accident_chemicals"][1:]) == sorted([
+        (str(stable_ids.derive_id("accident_chemical", f"100000000001_1{stable_ids.KEY_SEPARATOR}1")), ammonia_id),
+        (str(stable_ids.derive_id("accident_chemical", f"100000000002_1{stable_ids.KEY_SEPARATOR}1")), chlorine_id),
+        (str(stable_ids.derive_id("accident_chemical", f"100000000002_1{stable_ids.KEY_SEPARATOR}2")), ammonia_id)])
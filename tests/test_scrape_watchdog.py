@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Runs script/scrape_watchdog.py's WatchdogPool over items that sleep past the time budget,
+grow past the memory budget, raise or kill their worker: each is quarantined with its
+reason, its worker is replaced, and every other result still arrives, in input order.
+"""
+import os
+import sys
+import time
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "script"))
+from scrape_watchdog import WatchdogPool, Quarantined, rss_mb  # noqa: E402
+
+
+# Function run in the workers: most items are scraped at once, the others misbehave as their name says
+def scrape(item):
+    if item == "sleeps":
+        time.sleep(60)
+    elif item == "grows":
+        ballast = b"x" * (400 << 20)
+        time.sleep(60)
+        return len(ballast)
+    elif item == "raises":
+        raise ValueError("no Section 6")
+    elif item == "exits":
+        os._exit(3)
+    return item.upper()
+
+# Function to run the pool and check that the quarantined items are exactly the expected ones, in place
+def run(items, expected_reasons, **budget):
+    started = time.monotonic()
+    with WatchdogPool(scrape, **budget) as pool:
+        outcomes = list(pool.imap(items))
+    assert len(outcomes) == len(items)
+    for item, outcome in zip(items, outcomes):
+        if item in expected_reasons:
+            assert isinstance(outcome, Quarantined), item
+            assert (outcome.item, outcome.reason) == (item, expected_reasons[item])
+        else:
+            assert outcome == item.upper()
+    return outcomes, time.monotonic() - started
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_item_past_the_timeout_is_quarantined_and_the_rest_arrive_in_order(workers):
+    items = ["a", "b", "sleeps", "c", "d", "e", "f"]
+    outcomes, seconds = run(items, {"sleeps": "timeout"}, workers=workers, timeout=1)
+    # The sleeping worker was killed after its budget, not waited for
+    assert seconds < 10
+    assert 1 <= outcomes[2].seconds < 10
+    assert outcomes[2].record()["reason"] == "timeout"
+
+
+def test_raising_and_exiting_items_are_quarantined():
+    items = ["a", "raises", "b", "exits", "c"]
+    outcomes, _ = run(items, {"raises": "exception", "exits": "crashed"}, workers=2, timeout=30)
+    assert outcomes[1].detail == "ValueError: no Section 6"
+    assert outcomes[3].detail == "worker exited with code 3"
+
+
+@pytest.mark.skipif(rss_mb(os.getpid()) is None, reason="the memory budget is read from /proc")
+def test_item_past_the_memory_budget_is_quarantined():
+    items = ["a", "grows", "b", "c"]
+    budget = rss_mb(os.getpid()) + 200
+    outcomes, seconds = run(items, {"grows": "memory"}, workers=2, timeout=30, memory_mb=budget, poll_interval=0.05)
+    assert seconds < 30
+    assert outcomes[1].memory_mb > budget
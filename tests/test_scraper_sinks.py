@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Checks that scraper_sinks.CsvSink writes the same bytes as the pandas DataFrame.to_csv
+calls the scraper used before it: new files with a header, appended files without one,
+missing values, "N/A", quoting, and numbers kept as text with their leading zeros.
+"""
+import os
+import sys
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "script"))
+import scraper_sinks  # noqa: E402
+from scrape_records import (ChemicalRow, FacilityChemicalRow, NaicsRow, FacilityNaicsRow, FacilityAccidentRow,  # noqa: E402
+                            AccidentChemicalRow)
+
+pd = pytest.importorskip("pandas")
+
+# Rows of every table, as the scraper writes them in two runs (the second appends)
+runs = [
+    {
+        "rmp_chemical": [ChemicalRow(1, "Ammonia (anhydrous)", "7664-41-7", "Toxic"),
+                         ChemicalRow(2, 'Butane, "n-"', "106-97-8", None)],
+        "rmp_facility_chemicals": [FacilityChemicalRow(4503599627370495, "100000013521", 1, "Program Level 3 process"),
+                                   FacilityChemicalRow(2, "100000013521", 2, None)],
+        "rmp_naics": [NaicsRow("011111", "Soybean Farming"), NaicsRow("31171", "Seafood Product Preparation,\nand Packaging")],
+        "rmp_facility_naics": [FacilityNaicsRow(1, "100000013521", "011111")],
+        "rmp_facility_accidents": [FacilityAccidentRow("100000013521_1", "Accident 1", "100000013521", "August 2016", "08:30",
+                                                       "000 Hours 05 Minutes", "011111")],
+        "rmp_accident_chemicals": [AccidentChemicalRow(1, "100000013521_1_1", "100000013521_1", "N/A", "", 1),
+                                   AccidentChemicalRow(2, "100000013521_1_2", "100000013521_1", "04034", None, 2)]
+    },
+    {
+        "rmp_chemical": [ChemicalRow(3, "Chlorine ", "7782-50-5", "Toxic")],
+        "rmp_facility_chemicals": [FacilityChemicalRow(3, "100000023654", 3, "Program Level 2 process")],
+        "rmp_naics": [NaicsRow("32519", None)],
+        "rmp_facility_naics": [FacilityNaicsRow(2, "100000023654", None)],
+        "rmp_facility_accidents": [FacilityAccidentRow("100000023654_1", "Accident 1", "100000023654", None, None, None, None)],
+        "rmp_accident_chemicals": [AccidentChemicalRow(3, "100000023654_1_1", "100000023654_1", "1,200", "2.5", 3)]
+    }
+]
+
+
+# Function to write the runs the way the scraper did before the sinks: one DataFrame per table and run, with
+# mode='a' and no header when the file exists
+def write_with_pandas(directory):
+    for rows_by_table in runs:
+        for table, rows in rows_by_table.items():
+            path = os.path.join(directory, f"{table}.csv")
+            df = pd.DataFrame([row._asdict() for row in rows], columns=scraper_sinks.TABLE_COLUMNS[table])
+            if os.path.exists(path):
+                df.to_csv(path, mode='a', header=False, index=False)
+            else:
+                df.to_csv(path, index=False)
+
+# Function to write the runs through the CSV sinks, in small batches
+def write_with_sinks(directory):
+    paths = {table: os.path.join(directory, f"{table}.csv") for table in scraper_sinks.TABLE_COLUMNS}
+    for rows_by_table in runs:
+        sinks = scraper_sinks.open_csv_sinks(paths, batch_size=1, append=True)
+        for table, rows in rows_by_table.items():
+            for row in rows:
+                sinks[table].write(row)
+        scraper_sinks.close_sinks(sinks)
+
+
+def test_csv_sinks_write_the_bytes_pandas_wrote(tmp_path):
+    os.makedirs(tmp_path / "pandas")
+    os.makedirs(tmp_path / "sinks")
+    write_with_pandas(str(tmp_path / "pandas"))
+    write_with_sinks(str(tmp_path / "sinks"))
+    for table in scraper_sinks.TABLE_COLUMNS:
+        with open(tmp_path / "pandas" / f"{table}.csv", "rb") as f:
+            expected = f.read()
+        with open(tmp_path / "sinks" / f"{table}.csv", "rb") as f:
+            assert f.read() == expected, table
+
+
+def test_csv_sink_keeps_leading_zeros_like_pandas(tmp_path):
+    # The facility columns hold zip and DUNS numbers as text, as rmp_facility.csv does
+    columns = ["epa_facility_id", "zip", "facility_duns", "latitude", "longitude"]
+    rows = [("100000013521", "01033", "00123", 30.1, -95.2), ("100000023654", "99501", None, None, 61.21806)]
+    pd.DataFrame(rows, columns=columns).to_csv(tmp_path / "pandas.csv", index=False)
+    with scraper_sinks.CsvSink(str(tmp_path / "sink.csv"), columns) as sink:
+        for row in rows:
+            sink.write(row)
+    with open(tmp_path / "sink.csv", "rb") as f:
+        written = f.read()
+    with open(tmp_path / "pandas.csv", "rb") as f:
+        assert written == f.read()
+    assert b"01033,00123" in written
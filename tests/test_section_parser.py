@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+Checks that the SectionParser-driven accident parsers return exactly what the per-field
+re.search code they replaced returned, on representative Section 6 text: complete
+accidents, missing fields, malformed values, labels repeated or nested in longer labels,
+and required Yes/No fields without a valid value.
+"""
+import ast
+import os
+import re
+import sys
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "script"))
+import scrap_pdf_rmp_reports_to_csv as scraper  # noqa: E402
+from section_parser import SectionParser, YES_NO_NA  # noqa: E402
+
+
+# Function to read ACCIDENT_FIELDS out of scrap_accidents_details_to_csv.py, which scrapes as soon as it is imported
+def load_accident_fields():
+    with open(os.path.join(root, "script", "scrap_accidents_details_to_csv.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and [target.id for target in node.targets] == ["ACCIDENT_FIELDS"]:
+            return eval(compile(ast.Expression(node.value), "ACCIDENT_FIELDS", "eval"), {"YES_NO_NA": YES_NO_NA})
+    raise LookupError("ACCIDENT_FIELDS not found")
+
+# Function to parse Section 6 the way scrap_accidents_details_to_csv.parse_accident_history does
+def parse_accident_history(section_6_text):
+    if re.search(r"No records found|No accidents reported", section_6_text, re.IGNORECASE):
+        return {"Has Accident": "No", "Accident Count": 0, "Accident Details": None}
+    parser = SectionParser(load_accident_fields(), header=("Accident History ID", "Accident History ID:", r" Accident (\d+)"))
+    accidents = parser.parse_blocks(section_6_text)
+    return {"Has Accident": "Yes" if accidents else "No", "Accident Count": len(accidents), "Accident Details": accidents if accidents else None}
+
+
+# The per-field code the parsers replaced, as it was (without its logging)
+def old_parse_accident_history(section_6_text):
+    accidents = []
+    if re.search(r"No records found|No accidents reported", section_6_text, re.IGNORECASE):
+        return {
+            "Has Accident": "No",
+            "Accident Count": 0,
+            "Accident Details": None
+        }
+
+    accident_blocks = re.finditer(r"Accident History ID: Accident \d+([\s\S]*?)(?=Accident History ID: Accident \d+|\Z)", section_6_text, re.IGNORECASE)
+    accident_count = 0
+
+    for block in accident_blocks:
+        block_text = block.group(0)
+        accident_count += 1
+        accident = {}
+
+        # Basic accident info
+        accident_id_match = re.search(r"Accident History ID: Accident (\d+)", block_text, re.IGNORECASE)
+        accident["Accident History ID"] = accident_id_match.group(1) if accident_id_match else None
+        date_match = re.search(r"Date of Accident:\s*([A-Za-z]+\s*\d{4})", block_text, re.IGNORECASE)
+        accident["Date of Accident"] = date_match.group(1) if date_match else None
+        time_match = re.search(r"Time Accident Began \(HH:MM\):\s*(\d{2}:\d{2})", block_text, re.IGNORECASE)
+        accident["Time Accident Began"] = time_match.group(1) if time_match else None
+        naics_match = re.search(r"NAICS Code of Process Involved:\s*(\d+)", block_text, re.IGNORECASE)
+        accident["NAICS Code of Process Involved"] = naics_match.group(1) if naics_match else None
+        naics_desc_match = re.search(r"NAICS Description:\s*(.+)", block_text, re.IGNORECASE)
+        accident["NAICS Description"] = naics_desc_match.group(1).strip() if naics_desc_match else None
+        release_duration_match = re.search(r"Release Duration:\s*(\d{3})\s*Hours\s*(\d{2})\s*Minutes", block_text, re.IGNORECASE)
+        accident["Release Duration (Hours)"] = release_duration_match.group(1) if release_duration_match else None
+        accident["Release Duration (Minutes)"] = release_duration_match.group(2) if release_duration_match else None
+
+        # Release Event
+        accident["Gas Release"] = re.search(r"Gas Release:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Gas Release:", block_text, re.IGNORECASE) else None
+        accident["Liquid Spill/Evaporation"] = re.search(r"Liquid Spill/Evaporation:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Liquid Spill/Evaporation:", block_text, re.IGNORECASE) else None
+        accident["Fire"] = re.search(r"Fire:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Fire:", block_text, re.IGNORECASE) else None
+        accident["Explosion"] = re.search(r"Explosion:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Explosion:", block_text, re.IGNORECASE) else None
+        accident["Uncontrolled/Runaway Reaction"] = re.search(r"Uncontrolled/Runaway Reaction:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Uncontrolled/Runaway Reaction:", block_text, re.IGNORECASE) else None
+
+        # Release Source
+        accident["Storage Vessel"] = re.search(r"Storage Vessel:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Storage Vessel:", block_text, re.IGNORECASE) else None
+        accident["Piping"] = re.search(r"Piping:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Piping:", block_text, re.IGNORECASE) else None
+        accident["Process Vessel"] = re.search(r"Process Vessel:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Process Vessel:", block_text, re.IGNORECASE) else None
+        accident["Transfer Hose"] = re.search(r"Transfer Hose:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Transfer Hose:", block_text, re.IGNORECASE) else None
+        accident["Valve"] = re.search(r"Valve:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Valve:", block_text, re.IGNORECASE) else None
+        accident["Pump"] = re.search(r"Pump:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Pump:", block_text, re.IGNORECASE) else None
+        accident["Joint"] = re.search(r"Joint:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Joint:", block_text, re.IGNORECASE) else None
+        other_source_match = re.search(r"Other Release Source:\s*(.+)", block_text, re.IGNORECASE)
+        accident["Other Release Source"] = other_source_match.group(1).strip() if other_source_match else None
+
+        # Weather Conditions
+        wind_speed_match = re.search(r"Wind Speed:\s*(\d+\.?\d*)", block_text, re.IGNORECASE)
+        accident["Wind Speed"] = wind_speed_match.group(1) if wind_speed_match else None
+        units_match = re.search(r"Units:\s*(.+)", block_text, re.IGNORECASE)
+        accident["Wind Speed Units"] = units_match.group(1).strip() if units_match else None
+        direction_match = re.search(r"Direction:\s*(.+)", block_text, re.IGNORECASE)
+        accident["Wind Direction"] = direction_match.group(1).strip() if direction_match else None
+        temp_match = re.search(r"Temperature:\s*(\d+)", block_text, re.IGNORECASE)
+        accident["Temperature"] = temp_match.group(1) if temp_match else None
+        stability_match = re.search(r"Atmospheric Stability Class:\s*([A-Z])", block_text, re.IGNORECASE)
+        accident["Atmospheric Stability Class"] = stability_match.group(1) if stability_match else None
+        precip_match = re.search(r"Precipitation Present:\s*(Yes|No|N/A)", block_text, re.IGNORECASE)
+        accident["Precipitation Present"] = precip_match.group(1) if precip_match else None
+        unknown_weather_match = re.search(r"Unknown Weather Conditions:\s*(Yes|No|N/A)", block_text, re.IGNORECASE)
+        accident["Unknown Weather Conditions"] = unknown_weather_match.group(1) if unknown_weather_match else None
+
+        # On-Site Impacts
+        accident["Employee/Contractor Deaths"] = re.search(r"Employee or Contractor Deaths:\s*(\d+)", block_text, re.IGNORECASE).group(1) if re.search(r"Employee or Contractor Deaths:", block_text, re.IGNORECASE) else None
+        accident["Public Responder Deaths"] = re.search(r"Public Responder Deaths:\s*(\d+)", block_text, re.IGNORECASE).group(1) if re.search(r"Public Responder Deaths:", block_text, re.IGNORECASE) else None
+        accident["Public Deaths"] = re.search(r"Public Deaths:\s*(\d+)", block_text, re.IGNORECASE).group(1) if re.search(r"Public Deaths:", block_text, re.IGNORECASE) else None
+        accident["Employee/Contractor Injuries"] = re.search(r"Employee or Contractor Injuries:\s*(\d+)", block_text, re.IGNORECASE).group(1) if re.search(r"Employee or Contractor Injuries:", block_text, re.IGNORECASE) else None
+        accident["Public Responder Injuries"] = re.search(r"Public Responder Injuries:\s*(\d+)", block_text, re.IGNORECASE).group(1) if re.search(r"Public Responder Injuries:", block_text, re.IGNORECASE) else None
+        accident["Public Injuries"] = re.search(r"Public Injuries:\s*(\d+)", block_text, re.IGNORECASE).group(1) if re.search(r"Public Injuries:", block_text, re.IGNORECASE) else None
+        property_damage_match = re.search(r"On-Site Property Damage \(\$\):\s*(\d+)", block_text, re.IGNORECASE)
+        accident["On-Site Property Damage ($)"] = property_damage_match.group(1) if property_damage_match else None
+
+        # Off-Site Impacts
+        accident["Off-Site Deaths"] = re.search(r"Deaths:\s*(\d+)", block_text, re.IGNORECASE).group(1) if re.search(r"Deaths:", block_text, re.IGNORECASE) else None
+        accident["Off-Site Hospitalizations"] = re.search(r"Hospitalizations:\s*(\d+)", block_text, re.IGNORECASE).group(1) if re.search(r"Hospitalizations:", block_text, re.IGNORECASE) else None
+        accident["Off-Site Public Deaths"] = re.search(r"Public Deaths:\s*(\d+)", block_text, re.IGNORECASE).group(1) if re.search(r"Public Deaths:", block_text, re.IGNORECASE) else None
+        accident["Off-Site Other Medical Treatments"] = re.search(r"Other Medical Treatments:\s*(\d+)", block_text, re.IGNORECASE).group(1) if re.search(r"Other Medical Treatments:", block_text, re.IGNORECASE) else None
+        accident["Evacuated"] = re.search(r"Evacuated:\s*(\d+)", block_text, re.IGNORECASE).group(1) if re.search(r"Evacuated:", block_text, re.IGNORECASE) else None
+        accident["Sheltered-in-Place"] = re.search(r"Sheltered-in-Place:\s*(\d+)", block_text, re.IGNORECASE).group(1) if re.search(r"Sheltered-in-Place:", block_text, re.IGNORECASE) else None
+        offsite_property_match = re.search(r"Off-Site Property Damage \(\$\):\s*(\d+)", block_text, re.IGNORECASE)
+        accident["Off-Site Property Damage ($)"] = offsite_property_match.group(1) if offsite_property_match else None
+
+        # Environmental Damage
+        accident["Fish or Animal Kills"] = re.search(r"Fish or Animal Kills:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Fish or Animal Kills:", block_text, re.IGNORECASE) else None
+        accident["Tree, Lawn, Shrub, or Crop Damage"] = re.search(r"Tree, Lawn, Shrub, or Crop Damage:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Tree, Lawn, Shrub, or Crop Damage:", block_text, re.IGNORECASE) else None
+        accident["Water Contamination"] = re.search(r"Water Contamination:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Water Contamination:", block_text, re.IGNORECASE) else None
+        accident["Soil Contamination"] = re.search(r"Soil Contamination:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Soil Contamination:", block_text, re.IGNORECASE) else None
+        other_env_match = re.search(r"Other Environmental Damage:\s*(.+)", block_text, re.IGNORECASE)
+        accident["Other Environmental Damage"] = other_env_match.group(1).strip() if other_env_match else None
+
+        # Initiating Event
+        initiating_match = re.search(r"Initiating Event:\s*(.+)", block_text, re.IGNORECASE)
+        accident["Initiating Event"] = initiating_match.group(1).strip() if initiating_match else None
+
+        # Contributing Factors
+        accident["Contributing - Equipment Failure"] = re.search(r"Equipment Failure:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Equipment Failure:", block_text, re.IGNORECASE) else None
+        accident["Contributing - Human Error"] = re.search(r"Human Error:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Human Error:", block_text, re.IGNORECASE) else None
+        accident["Contributing - Improper Procedures"] = re.search(r"Improper Procedures:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Improper Procedures:", block_text, re.IGNORECASE) else None
+        accident["Contributing - Overpressurization"] = re.search(r"Overpressurization:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Overpressurization:", block_text, re.IGNORECASE) else None
+        accident["Contributing - Upset Condition"] = re.search(r"Upset Condition:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Upset Condition:", block_text, re.IGNORECASE) else None
+        accident["Contributing - By-Pass Condition"] = re.search(r"By-Pass Condition:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"By-Pass Condition:", block_text, re.IGNORECASE) else None
+        accident["Contributing - Maintenance Activity/Inactivity"] = re.search(r"Maintenance Activity/Inactivity:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Maintenance Activity/Inactivity:", block_text, re.IGNORECASE) else None
+        accident["Contributing - Process Design Failure"] = re.search(r"Process Design Failure:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Process Design Failure:", block_text, re.IGNORECASE) else None
+        accident["Contributing - Unsuitable Equipment"] = re.search(r"Unsuitable Equipment:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Unsuitable Equipment:", block_text, re.IGNORECASE) else None
+        accident["Contributing - Unusual Weather Condition"] = re.search(r"Unusual Weather Condition:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Unusual Weather Condition:", block_text, re.IGNORECASE) else None
+        accident["Contributing - Management Error"] = re.search(r"Management Error:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Management Error:", block_text, re.IGNORECASE) else None
+        other_contrib_match = re.search(r"Other Contributing Factor:\s*(.+)", block_text, re.IGNORECASE)
+        accident["Contributing - Other"] = other_contrib_match.group(1).strip() if other_contrib_match else None
+
+        # Off-Site Responders
+        responders_match = re.search(r"Off-Site Responders Notified:\s*(Yes|No, not notified)", block_text, re.IGNORECASE)
+        accident["Off-Site Responders Notified"] = responders_match.group(1) if responders_match else None
+
+        # Changes Introduced
+        accident["Change - Improved/Upgraded Equipment"] = re.search(r"Improved or Upgraded Equipment:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Improved or Upgraded Equipment:", block_text, re.IGNORECASE) else None
+        accident["Change - Revised Maintenance"] = re.search(r"Revised Maintenance:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Revised Maintenance:", block_text, re.IGNORECASE) else None
+        accident["Change - Revised Training"] = re.search(r"Revised Training:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Revised Training:", block_text, re.IGNORECASE) else None
+        accident["Change - Revised Operating Procedures"] = re.search(r"Revised Operating Procedures:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Revised Operating Procedures:", block_text, re.IGNORECASE) else None
+        accident["Change - New Process Controls"] = re.search(r"New Process Controls:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"New Process Controls:", block_text, re.IGNORECASE) else None
+        accident["Change - New Mitigation Systems"] = re.search(r"New Mitigation Systems:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"New Mitigation Systems:", block_text, re.IGNORECASE) else None
+        accident["Change - Revised Emergency Response Plan"] = re.search(r"Revised Emergency Response Plan:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Revised Emergency Response Plan:", block_text, re.IGNORECASE) else None
+        accident["Change - Changed Process"] = re.search(r"Changed Process:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Changed Process:", block_text, re.IGNORECASE) else None
+        accident["Change - Reduced Inventory"] = re.search(r"Reduced Inventory:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"Reduced Inventory:", block_text, re.IGNORECASE) else None
+        accident["Change - None"] = re.search(r"None:\s*(Yes|No|N/A)", block_text, re.IGNORECASE).group(1) if re.search(r"None:", block_text, re.IGNORECASE) else None
+        other_change_match = re.search(r"Other Changes Introduced:\s*(.+)", block_text, re.IGNORECASE)
+        accident["Change - Other"] = other_change_match.group(1).strip() if other_change_match else None
+
+        accidents.append(accident)
+
+    return {
+        "Has Accident": "Yes" if accident_count > 0 else "No",
+        "Accident Count": accident_count,
+        "Accident Details": accidents if accidents else None
+    }
+
+
+def old_parse_accidents(text, facility_id):
+    accidents = []
+    accident_blocks = re.finditer(r"Accident History ID: Accident \d+([\s\S]*?)(?=Accident History ID: Accident \d+|\Z)", text, re.IGNORECASE)
+    accident_count = 0
+
+    for block in accident_blocks:
+        accident_count += 1
+        block_text = block.group(0)
+        current_accident = {}
+
+        # Extract Accident ID
+        accident_id_match = re.search(r"Accident History ID: Accident (\d+)", block_text, re.IGNORECASE)
+        if accident_id_match:
+            accident_number = accident_id_match.group(1)
+            current_accident["accident_id"] = f"Accident {accident_number}"
+            current_accident["facility_accident_id"] = f"{facility_id}_{accident_number}"
+        else:
+            current_accident["accident_id"] = "Unknown"
+            current_accident["facility_accident_id"] = f"{facility_id}_unknown"
+
+        # Extract other fields using regex
+        date_match = re.search(r"Date of Accident:\s*([A-Za-z]+\s*\d{4})", block_text, re.IGNORECASE)
+        current_accident["date_of_accident"] = date_match.group(1) if date_match else None
+
+        time_match = re.search(r"Time Accident Began \(HH:MM\):\s*(\d{2}:\d{2})", block_text, re.IGNORECASE)
+        current_accident["time_accident_began"] = time_match.group(1) if time_match else None
+
+        naics_match = re.search(r"NAICS Code of Process Involved:\s*(\d+)", block_text, re.IGNORECASE)
+        naics_code = naics_match.group(1) if naics_match else None
+        current_accident["naics_code"] = naics_code
+
+        # Keep the NAICS description so the merge stage can add it to rmp_naics
+        if naics_code:
+            naics_desc_match = re.search(r"NAICS Description:\s*(.+)", block_text, re.IGNORECASE)
+            current_accident["naics_description"] = naics_desc_match.group(1).strip() if naics_desc_match else None
+
+        release_duration_match = re.search(r"Release Duration:\s*(\d{3})\s*Hours\s*(\d{2})\s*Minutes", block_text, re.IGNORECASE)
+        if release_duration_match:
+            hours = release_duration_match.group(1)
+            minutes = release_duration_match.group(2)
+            current_accident["release_duration"] = f"{hours} Hours {minutes} Minutes"
+        else:
+            current_accident["release_duration"] = None
+
+        current_accident["facility_id"] = facility_id
+        accidents.append(current_accident)
+
+    return accidents
+
+
+# Section 6 of a report with three accidents. Accident 1 has every field. Accident 2 is missing most
+# fields and has malformed ones: a one-digit hour, a numeric date, a duration without minutes, a NAICS
+# code of "N/A" and a wind speed of "calm". Accident 3 repeats labels (the first value malformed,
+# the second valid), has lower-case labels and lets "Deaths:" match inside "Public Deaths:".
+SECTION_6 = """Section 6. Accident History
+Accident History ID: Accident 1
+Date of Accident: August 2016
+Time Accident Began (HH:MM): 08:30
+NAICS Code of Process Involved: 31171
+NAICS Description: Seafood Product Preparation and Packaging
+Release Duration: 000 Hours 05 Minutes
+Chemical(s)
+Chemical Name: Ammonia (anhydrous)
+Quantity Released (lbs): 39
+Release Event
+Gas Release: Yes
+Liquid Spill/Evaporation: No
+Fire: No
+Explosion: No
+Uncontrolled/Runaway Reaction: No
+Release Source
+Storage Vessel: No
+Piping: Yes
+Process Vessel: No
+Transfer Hose: No
+Valve: Yes
+Pump: No
+Joint: No
+Other Release Source: Relief valve header
+Weather Conditions at Time of Event
+Wind Speed: 4.5
+Units: Miles/Hour
+Direction: NW
+Temperature: 71
+Atmospheric Stability Class: D
+Precipitation Present: No
+Unknown Weather Conditions: N/A
+On-Site Impacts
+Employee or Contractor Deaths: 0
+Public Responder Deaths: 0
+Public Deaths: 0
+Employee or Contractor Injuries: 2
+Public Responder Injuries: 0
+Public Injuries: 0
+On-Site Property Damage ($): 1500
+Off-Site Impacts
+Deaths: 0
+Hospitalizations: 1
+Other Medical Treatments: 3
+Evacuated: 120
+Sheltered-in-Place: 0
+Off-Site Property Damage ($): 0
+Environmental Damage
+Fish or Animal Kills: No
+Tree, Lawn, Shrub, or Crop Damage: No
+Water Contamination: No
+Soil Contamination: No
+Other Environmental Damage: None
+Initiating Event: Equipment Failure
+Contributing Factors
+Equipment Failure: Yes
+Human Error: No
+Improper Procedures: No
+Overpressurization: No
+Upset Condition: No
+By-Pass Condition: No
+Maintenance Activity/Inactivity: No
+Process Design Failure: No
+Unsuitable Equipment: No
+Unusual Weather Condition: No
+Management Error: No
+Other Contributing Factor: Corroded gasket
+Off-Site Responders Notified: No, not notified
+Changes Introduced as a Result of the Accident
+Improved or Upgraded Equipment: Yes
+Revised Maintenance: Yes
+Revised Training: No
+Revised Operating Procedures: No
+New Process Controls: No
+New Mitigation Systems: No
+Revised Emergency Response Plan: No
+Changed Process: No
+Reduced Inventory: No
+None: No
+Other Changes Introduced: Replaced gaskets
+Accident History ID: Accident 2
+Date of Accident: 2016-08
+Time Accident Began (HH:MM): 8:30
+NAICS Code of Process Involved: N/A
+NAICS Description: Other Basic Organic Chemical Manufacturing
+Release Duration: 002 Hours
+Wind Speed: calm
+Temperature:
+Atmospheric Stability Class: 4
+Off-Site Responders Notified: Unknown
+Accident History ID: Accident 3
+date of accident: May   2020
+Date of Accident: Unknown
+Time Accident Began (HH:MM): 1000
+Time Accident Began (HH:MM): 10:00
+naics code of process involved: 32519
+Release Duration: 12 Hours 30 Minutes
+Release Duration: 012 Hours 30 Minutes
+Public Deaths: 4
+Deaths: 1
+Units:   Knots   
+Section 9. Emergency Response
+"""
+
+
+def test_parse_accidents_matches_the_per_field_regexes():
+    accidents = scraper.parse_accidents(SECTION_6, "100000013521")
+    assert accidents == old_parse_accidents(SECTION_6, "100000013521")
+    assert [list(accident) for accident in accidents] == [list(accident) for accident in old_parse_accidents(SECTION_6, "100000013521")]
+    assert [accident["release_duration"] for accident in accidents] == ["000 Hours 05 Minutes", None, "012 Hours 30 Minutes"]
+    assert "naics_description" not in accidents[1]
+
+
+def test_parse_accident_history_matches_the_per_field_regexes():
+    expected = old_parse_accident_history(SECTION_6)
+    parsed = parse_accident_history(SECTION_6)
+    assert parsed == expected
+    assert [list(accident) for accident in parsed["Accident Details"]] == [list(accident) for accident in expected["Accident Details"]]
+    assert parsed["Accident Details"][1]["Wind Speed"] is None
+    assert parsed["Accident Details"][2]["Off-Site Deaths"] == "4"
+
+    for text in ["Section 6. Accident History\nNo records found\n", "Section 6. Accident History\nSection 9. Emergency Response\n"]:
+        assert parse_accident_history(text) == old_parse_accident_history(text)
+        assert scraper.parse_accidents(text, "100000013521") == old_parse_accidents(text, "100000013521") == []
+
+
+def test_required_field_without_a_valid_value_fails_as_before():
+    text = "Accident History ID: Accident 1\nDate of Accident: August 2016\nGas Release: Maybe\n"
+    with pytest.raises(AttributeError):
+        old_parse_accident_history(text)
+    with pytest.raises(ValueError, match="Gas Release:"):
+        parse_accident_history(text)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Seeds the ID registry (script/stable_ids.py) from tables published with sequential IDs, then
+merges a re-scrape through scrap_pdf_rmp_reports_to_csv.py: the rows scraped again keep
+their published IDs, and only the new rows get derived ones.
+"""
+import csv
+import os
+import sqlite3
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "script"))
+import rmp_schema  # noqa: E402
+import scrap_pdf_rmp_reports_to_csv as scraper  # noqa: E402
+import stable_ids  # noqa: E402
+
+# The tables as the scraper published them before the IDs were derived: numbered in scrape order
+published = {
+    "rmp_chemical": [
+        {"chemical_id": 1, "chemical_name": "Ammonia (anhydrous)", "cas_number": "7664-41-7", "flammable_toxic": "Toxic"},
+        {"chemical_id": 2, "chemical_name": "Chlorine", "cas_number": "7782-50-5", "flammable_toxic": "Toxic"}
+    ],
+    "rmp_facility_chemicals": [
+        {"facility_chemical_id": 1, "facility_id": "100000000001", "chemical_id": 1, "program_level": "Program Level 3 process"},
+        {"facility_chemical_id": 2, "facility_id": "100000000001", "chemical_id": 2, "program_level": "Program Level 3 process"},
+        {"facility_chemical_id": 3, "facility_id": "100000000001", "chemical_id": 1, "program_level": "Program Level 3 process"}
+    ],
+    "rmp_facility_naics": [
+        {"facility_naics_id": 1, "facility_id": "100000000001", "naics_code": "31171"}
+    ],
+    "rmp_accident_chemicals": [
+        {"accident_chemical_id": 1, "facility_accident_chemical_id": "100000000001_1_1", "facility_accident_id": "100000000001_1",
+         "quantity_released_lbs": "39", "percent_weight": "100", "chemical_id": 2},
+        {"accident_chemical_id": 2, "facility_accident_chemical_id": "100000000001_1_2", "facility_accident_id": "100000000001_1",
+         "quantity_released_lbs": "12", "percent_weight": None, "chemical_id": 1}
+    ]
+}
+
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+
+    def close(self):
+        pass
+
+
+# Function to write the published tables as the scraper's CSV files into a directory
+def write_csvs(directory):
+    for table, rows in published.items():
+        with open(os.path.join(directory, f"{table}.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+# Function to write the published tables into a risk-management-plans.db
+def write_database(path):
+    conn = sqlite3.connect(path)
+    rmp_schema.recreate_tables(conn, list(rmp_schema.TABLE_SCHEMAS))
+    for table, rows in published.items():
+        columns = list(rows[0])
+        conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                         [[row[column] for column in columns] for row in rows])
+    conn.commit()
+    conn.close()
+
+# Function to scrape facility 100000000001 again, with one new chemical link, plus a new facility
+def rescrape(ids, monkeypatch):
+    sinks = {table: ListSink() for table in scraper.output_files}
+    monkeypatch.setattr(scraper, "ids", ids)
+    monkeypatch.setattr(scraper, "sinks", sinks)
+    monkeypatch.setattr(scraper, "unique_chemicals", {})
+    monkeypatch.setattr(scraper, "unique_naics", {})
+    monkeypatch.setattr(scraper, "accident_chemical_ids", set())
+    ammonia = {"chemical_name": "Ammonia (anhydrous)", "cas_number": "7664-41-7", "flammable_toxic": "Toxic", "program_level": "Program Level 3 process"}
+    chlorine = {"chemical_name": "Chlorine", "cas_number": "7782-50-5", "flammable_toxic": "Toxic", "program_level": "Program Level 3 process"}
+    propane = {"chemical_name": "Propane", "cas_number": "74-98-6", "flammable_toxic": "Flammable", "program_level": "Program Level 1 process"}
+    accident = {"facility_accident_id": "100000000001_1", "accident_id": "Accident 1", "facility_id": "100000000001",
+                "date_of_accident": "August 2016", "time_accident_began": "08:30", "release_duration": "000 Hours 05 Minutes",
+                "naics_code": "31171", "naics_description": "Seafood"}
+    accident_chemicals = [
+        {**chlorine, "facility_accident_chemical_id": "100000000001_1_1", "facility_accident_id": "100000000001_1",
+         "quantity_released_lbs": "39", "percent_weight": "100"},
+        {**ammonia, "facility_accident_chemical_id": "100000000001_1_2", "facility_accident_id": "100000000001_1",
+         "quantity_released_lbs": "12", "percent_weight": None}
+    ]
+    results = [
+        {"facility_id": "100000000001", "status": "ok", "pdf_time": None, "chemicals": [ammonia, chlorine, ammonia, propane],
+         "naics": [{"naics_code": "31171", "naics_description": "Seafood"}], "accidents": [accident], "accident_chemicals": [accident_chemicals]},
+        {"facility_id": "100000000002", "status": "ok", "pdf_time": None, "chemicals": [chlorine],
+         "naics": [{"naics_code": "31171", "naics_description": "Seafood"}], "accidents": [], "accident_chemicals": []}
+    ]
+    for result in results:
+        scraper.merge_facility_result(result)
+    return {table: sink.rows for table, sink in sinks.items()}
+
+# Function to check that the re-scraped rows kept their published IDs and the new ones got derived IDs
+def check_rescrape(tables):
+    assert [(row.chemical_id, row.cas_number) for row in tables["rmp_chemical"]] == [
+        (1, "7664-41-7"), (2, "7782-50-5"), (stable_ids.derive_id("chemical", "74-98-6"), "74-98-6")]
+    propane_id = tables["rmp_chemical"][2].chemical_id
+    assert [(row.facility_chemical_id, row.facility_id, row.chemical_id) for row in tables["rmp_facility_chemicals"]] == [
+        (1, "100000000001", 1),
+        (2, "100000000001", 2),
+        (3, "100000000001", 1),
+        (stable_ids.derive_id("facility_chemical", stable_ids.KEY_SEPARATOR.join(["100000000001", "74-98-6", "Program Level 1 process", "1"])), "100000000001", propane_id),
+        (stable_ids.derive_id("facility_chemical", stable_ids.KEY_SEPARATOR.join(["100000000002", "7782-50-5", "Program Level 3 process", "1"])), "100000000002", 2)]
+    assert [row.facility_naics_id for row in tables["rmp_facility_naics"]] == [
+        1, stable_ids.derive_id("facility_naics", stable_ids.KEY_SEPARATOR.join(["100000000002", "31171", "1"]))]
+    assert [(row.accident_chemical_id, row.chemical_id) for row in tables["rmp_accident_chemicals"]] == [(1, 2), (2, 1)]
+
+
+def test_rescrape_keeps_the_ids_seeded_from_the_csv_files(tmp_path, monkeypatch):
+    write_csvs(str(tmp_path))
+    registry_file = str(tmp_path / "rmp_id_registry.sqlite")
+    ids = stable_ids.IdRegistry(registry_file)
+    counts = stable_ids.seed_registry(ids, str(tmp_path))
+    assert counts == {"chemical": [2, 0], "facility_chemical": [3, 0], "facility_naics": [1, 0], "accident_chemical": [2, 0]}
+    ids.close()
+
+    # A later run reads the seeded IDs back from the registry file
+    ids = stable_ids.IdRegistry(registry_file)
+    check_rescrape(rescrape(ids, monkeypatch))
+    ids.close()
+
+    # Seeding again changes nothing: every key already has its ID
+    ids = stable_ids.IdRegistry(registry_file)
+    assert stable_ids.seed_registry(ids, str(tmp_path)) == {
+        "chemical": [0, 2], "facility_chemical": [0, 3], "facility_naics": [0, 1], "accident_chemical": [0, 2]}
+    ids.close()
+
+
+def test_rescrape_keeps_the_ids_seeded_from_the_database(tmp_path, monkeypatch):
+    db_file = str(tmp_path / "risk-management-plans.db")
+    write_database(db_file)
+    ids = stable_ids.IdRegistry()
+    stable_ids.seed_registry(ids, db_file)
+    check_rescrape(rescrape(ids, monkeypatch))
+
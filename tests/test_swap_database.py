@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Runs rmp/plugins/swap_database.py in Datasette (datasette==0.65.1, as in rmp/requirements.txt)
+against databases published with script/rmp_publish.py.
+
+    pip install -r rmp/requirements.txt pytest
+    python -m pytest tests
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "script"))
+import rmp_publish  # noqa: E402
+
+datasette_app = pytest.importorskip("datasette.app")
+from datasette.plugins import pm  # noqa: E402
+
+plugins_dir = os.path.join(root, "rmp", "plugins")
+
+
+# Function to write a database with a table t of the given values (and any extra tables) at path
+def write_database(path, values, extra_tables=()):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, value TEXT);")
+    conn.executemany("INSERT INTO t (value) VALUES (?)", [(value,) for value in values])
+    for table in extra_tables:
+        conn.execute(f"CREATE TABLE {table} (x TEXT);")
+    conn.commit()
+    conn.close()
+
+# Function to build a database in a staging file and publish it over db_file, as the build scripts do
+def publish_database(db_file, values, extra_tables=()):
+    staging = rmp_publish.start_staging(db_file)
+    write_database(staging, values, extra_tables)
+    rmp_publish.publish(staging, db_file)
+
+# Function to get the plugin module Datasette loaded from the plugins directory
+def swap_plugin():
+    for plugin in pm.get_plugins():
+        if getattr(plugin, "__file__", "").endswith("swap_database.py"):
+            return plugin
+    raise AssertionError("swap_database.py was not loaded")
+
+# Function to get the values of table t through Datasette's JSON API
+async def served_values(ds):
+    response = await ds.client.get("/risk-management-plans/t.json?_shape=array")
+    assert response.status_code == 200
+    return [row["value"] for row in response.json()]
+
+
+@pytest.fixture
+def served(tmp_path, monkeypatch):
+    db_file = str(tmp_path / "risk-management-plans.db")
+    publish_database(db_file, ["old"])
+    ds = datasette_app.Datasette([db_file], plugins_dir=plugins_dir)
+    plugin = swap_plugin()
+    monkeypatch.setattr(plugin, "check_interval", 0.0)
+    return ds, db_file, plugin
+
+
+def test_switches_to_the_published_file(served, caplog, capsys):
+    ds, db_file, plugin = served
+    caplog.set_level("INFO")
+
+    async def run():
+        await ds.invoke_startup()
+        assert await served_values(ds) == ["old"]
+        old_db = ds.databases["risk-management-plans"]
+        publish_database(db_file, ["new", "newer"], extra_tables=["added"])
+        assert await served_values(ds) == ["new", "newer"]
+        new_db = ds.databases["risk-management-plans"]
+        assert isinstance(new_db, plugin.PublishedDatabase) and new_db is not old_db
+        assert list(ds.databases) == ["_internal", "risk-management-plans"]  # Same name, route and order
+        # The catalog was refreshed: the new table has a page
+        response = await ds.client.get("/risk-management-plans/added.json")
+        assert response.status_code == 200
+        # And a second swap works on the swapped database
+        publish_database(db_file, ["newest"])
+        assert await served_values(ds) == ["newest"]
+
+    asyncio.run(run())
+    # The swaps are logged, not printed to the server's stdout
+    assert [record.getMessage() for record in caplog.records if record.name == plugin.logger.name] == [
+        f"Switched risk-management-plans to the file published at {db_file}"] * 2
+    assert "Switched" not in capsys.readouterr().out
+
+
+def test_keeps_serving_when_the_new_file_does_not_open(served, tmp_path):
+    ds, db_file, plugin = served
+
+    async def run():
+        await ds.invoke_startup()
+        assert await served_values(ds) == ["old"]
+        broken = str(tmp_path / "broken.db")
+        with open(broken, "wb") as f:
+            f.write(b"not a database" * 100)
+        os.replace(broken, db_file)
+        # The old file is still open, so the pages keep working from it
+        assert await served_values(ds) == ["old"]
+        assert not isinstance(ds.databases["risk-management-plans"], plugin.PublishedDatabase)
+
+    asyncio.run(run())
+
+
+def test_closes_the_replaced_connections(served, monkeypatch):
+    ds, db_file, plugin = served
+    monkeypatch.setattr(plugin, "close_after", 0.0)
+
+    async def run():
+        await ds.invoke_startup()
+        await served_values(ds)
+        old_db = ds.databases["risk-management-plans"]
+        publish_database(db_file, ["new"])
+        assert await served_values(ds) == ["new"]
+        await asyncio.sleep(0.01)  # Lets the scheduled close run
+        assert old_db._all_file_connections
+        for conn in old_db._all_file_connections:
+            with pytest.raises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+        assert await served_values(ds) == ["new"]
+
+    asyncio.run(run())